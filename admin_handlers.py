@@ -1,19 +1,27 @@
 import re
 from datetime import datetime
-from typing import Dict, Any
+from typing import Optional
 
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
 
+import profiling
+from conversation_store import ConversationStore
+from flood_control import FloodControl
+from location_index import LocationIndex
+
 # Conversation states for admin functions
 ADD_FOCAL_ID, ADD_FOCAL_NAME = range(2)
 REMOVE_FOCAL_ID = 0
 
 class AdminHandlers:
-    def __init__(self, db, user_data: Dict[int, Dict[str, Any]]):
+    def __init__(self, db, user_data: ConversationStore, flood_control: Optional[FloodControl] = None,
+                 location_index: Optional[LocationIndex] = None):
         self.db = db
         self.user_data = user_data
+        self.flood_control = flood_control
+        self.location_index = location_index
 
     async def add_focal_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Start the add focal person conversation."""
@@ -31,7 +39,7 @@ class AdminHandlers:
             return ConversationHandler.END
         
         # Initialize user data
-        self.user_data[user_id] = {}
+        self.user_data.set(user_id, {})
         
         await update.message.reply_text(
             "👥 **Add Focal Person**\n\n"
@@ -54,7 +62,7 @@ class AdminHandlers:
             return ADD_FOCAL_ID
         
         focal_id = int(focal_id_text)
-        self.user_data[user_id]['focal_id'] = focal_id
+        self.user_data.update(user_id, focal_id=focal_id)
         
         await update.message.reply_text(
             f"👤 User ID: {focal_id}\n\n"
@@ -75,7 +83,13 @@ class AdminHandlers:
             )
             return ADD_FOCAL_NAME
         
-        focal_id = self.user_data[user_id]['focal_id']
+        focal_id = (self.user_data.get(user_id) or {}).get('focal_id')
+        
+        if focal_id is None:
+            await update.message.reply_text(
+                "⌛ This session has expired. Please start again with /addfocal."
+            )
+            return ConversationHandler.END
         
         # Add focal person to database
         success = self.db.add_focal_person(focal_id, name, user_id)
@@ -95,8 +109,7 @@ class AdminHandlers:
             )
         
         # Clear user data
-        if user_id in self.user_data:
-            del self.user_data[user_id]
+        self.user_data.pop(user_id)
         
         return ConversationHandler.END
 
@@ -137,6 +150,240 @@ class AdminHandlers:
             parse_mode=ParseMode.MARKDOWN
         )
 
+    async def throttle_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Show flood control statistics."""
+        user_id = update.effective_user.id
+        
+        # Check if user is admin
+        if not self.db.is_admin(user_id):
+            await update.message.reply_text(
+                "🚫 Sorry, only administrators can view throttling statistics."
+            )
+            return
+        
+        if not self.flood_control:
+            await update.message.reply_text("ℹ️ Flood control is not enabled.")
+            return
+        
+        stats = self.flood_control.stats()
+        
+        message = "⏳ **Flood Control Statistics:**\n\n"
+        message += f"🚫 Throttled commands: {stats['throttled_total']}\n"
+        message += f"🌐 Dropped by global limit: {stats['global_throttled_total']}\n"
+        message += f"👥 Users tracked: {stats['tracked_users']}\n"
+        message += f"🧊 Users cooling down: {stats['cooling_down']}\n"
+        
+        if stats['top_users']:
+            message += "\n**Most throttled users:**\n"
+            for i, (throttled_id, count) in enumerate(stats['top_users'], 1):
+                message += f"{i}. `{throttled_id}` - {count}\n"
+        
+        await update.message.reply_text(
+            message,
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    async def db_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Show the slowest database statements since startup."""
+        user_id = update.effective_user.id
+        
+        # Check if user is admin
+        if not self.db.is_admin(user_id):
+            await update.message.reply_text(
+                "🚫 Sorry, only administrators can view database statistics."
+            )
+            return
+        
+        # Optional argument: how many statements to list
+        top = 10
+        if context.args and context.args[0].isdigit():
+            top = min(max(int(context.args[0]), 1), 25)
+        
+        stats = self.db.query_log.stats(top)
+        
+        message = "🗄 **Database Statistics:**\n\n"
+        message += f"⏱ Since: {stats['since'].replace('T', ' ')}\n"
+        message += f"🐢 Slow query threshold: {stats['threshold_ms']:g} ms\n"
+        
+        if stats['statements']:
+            message += "\n**Slowest statements (max / avg ms, calls):**\n"
+            for i, row in enumerate(stats['statements'], 1):
+                message += f"{i}. `{row['statement']}` - {row['max_ms']:g} / {row['avg_ms']:g} ms, {row['calls']}\n"
+        
+        if stats['slow_queries']:
+            message += "\n**Recent slow calls:**\n"
+            for slow in stats['slow_queries'][:3]:
+                message += f"`{slow['statement']}` {slow['ms']:g} ms, {slow['rows']} rows at {slow['at'][11:]}\n"
+                plan = [line for query in slow['queries'] for line in query['plan']]
+                if plan:
+                    message += "```\n" + '\n'.join(plan[:8]).replace('`', "'") + "\n```\n"
+        
+        # Stay under Telegram's message limit
+        if len(message) > 4000:
+            message = message[:message.rfind('\n', 0, 4000)]
+            if message.count('```') % 2:
+                message += "\n```"
+        
+        await update.message.reply_text(
+            message,
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    async def profile(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Start, stop or show on-demand profiling of the bot's update handlers."""
+        user_id = update.effective_user.id
+        
+        # Check if user is admin
+        if not self.db.is_admin(user_id):
+            await update.message.reply_text(
+                "🚫 Sorry, only administrators can profile the bot."
+            )
+            return
+        
+        usage = (
+            "🔬 **Profiling**\n\n"
+            "`/profile start [cprofile|sample] [seconds]s [updates]` - Profile updates for a time window, "
+            "stopping early after a number of updates (default: cprofile for 30s)\n"
+            "`/profile stop` - Stop early and show the results\n"
+            "`/profile` - Show the running profile or the last results"
+        )
+        args = [arg.lower() for arg in context.args or []]
+        
+        if args and args[0] == 'start':
+            mode, seconds, max_updates = 'cprofile', 30, None
+            for arg in args[1:]:
+                if arg in profiling.MODES:
+                    mode = arg
+                elif arg.endswith('s') and arg[:-1].isdigit():
+                    seconds = int(arg[:-1])
+                elif arg.isdigit():
+                    max_updates = int(arg)
+                else:
+                    await update.message.reply_text(usage, parse_mode=ParseMode.MARKDOWN)
+                    return
+            try:
+                status = profiling.PROFILER.start(mode, seconds, max_updates)
+            except ValueError as e:
+                await update.message.reply_text(f"❌ {e}.")
+                return
+            limit = f" or {max_updates} updates" if max_updates else ""
+            await update.message.reply_text(
+                f"🔬 Profiling ({mode}) until {status['ends_at'][11:]}{limit}.\n"
+                "Use /profile to check on it or /profile stop to end it early."
+            )
+            return
+        
+        if args and args[0] == 'stop':
+            result = profiling.PROFILER.stop()
+            if result is None:
+                await update.message.reply_text("ℹ️ No profile is running.")
+                return
+        elif args:
+            await update.message.reply_text(usage, parse_mode=ParseMode.MARKDOWN)
+            return
+        else:
+            result = profiling.PROFILER.status()
+            if result is None:
+                await update.message.reply_text(usage, parse_mode=ParseMode.MARKDOWN)
+                return
+            if result['running']:
+                limit = f" of {result['max_calls']}" if result['max_calls'] else ""
+                await update.message.reply_text(
+                    f"🔬 Profiling ({result['mode']}) since {result['started_at'][11:]}, "
+                    f"until {result['ends_at'][11:]}: {result['calls']}{limit} updates so far."
+                )
+                return
+        
+        message = f"🔬 **Profile ({result['mode']}):**\n\n"
+        message += f"⏱ {result['seconds']:g}s from {result['started_at'].replace('T', ' ')}\n"
+        message += f"📨 {result['calls']} updates, {result['profiled']} profiled"
+        message += f", {result['skipped']} overlapping skipped\n" if result['skipped'] else "\n"
+        
+        if result['functions']:
+            message += "\n**Top functions (self / total ms):**\n"
+            for i, row in enumerate(result['functions'][:15], 1):
+                message += f"{i}. `{row['function']}` - {row['self_ms']:g} / {row['total_ms']:g}\n"
+        else:
+            message += "\nNothing was profiled.\n"
+        if result.get('error'):
+            message += f"\n⚠️ {result['error']}\n"
+        
+        # Stay under Telegram's message limit
+        if len(message) > 4000:
+            message = message[:message.rfind('\n', 0, 4000)]
+        
+        await update.message.reply_text(
+            message,
+            parse_mode=ParseMode.MARKDOWN
+        )
+        
+        # The full profile, for pstats/snakeviz or flame graph tools
+        if result['file']:
+            with open(result['file'], 'rb') as f:
+                await update.message.reply_document(f)
+
+    async def alias(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Make one location name another spelling of a canonical one."""
+        user_id = update.effective_user.id
+        
+        # Check if user is admin
+        if not self.db.is_admin(user_id):
+            await update.message.reply_text(
+                "🚫 Sorry, only administrators can manage location names."
+            )
+            return
+        
+        # Names may contain spaces, so split on "=" rather than on arguments
+        alias, _, location = ' '.join(context.args or []).partition('=')
+        relinked = self.db.set_location_alias(alias, location) if location else None
+        if relinked is None:
+            await update.message.reply_text(
+                "Usage: /alias <other spelling> = <location name>\n"
+                "Reports under either name are then shown under the location name, "
+                "and /location finds them by either."
+            )
+            return
+        
+        # Old spellings would otherwise linger in inline query results
+        if self.location_index is not None:
+            self.location_index.clear()
+        
+        await update.message.reply_text(
+            f"✅ \"{alias.strip()}\" now refers to \"{location.strip()}\". "
+            f"{relinked} report(s) moved over from the merged location."
+        )
+
+    async def parent(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Place a location under a larger area, e.g. Bole under Addis Ababa."""
+        user_id = update.effective_user.id
+        
+        # Check if user is admin
+        if not self.db.is_admin(user_id):
+            await update.message.reply_text(
+                "🚫 Sorry, only administrators can manage location names."
+            )
+            return
+        
+        location, separator, parent = ' '.join(context.args or []).partition('=')
+        placed = self.db.set_location_parent(location, parent) if separator else None
+        if placed is None:
+            await update.message.reply_text(
+                "Usage: /parent <location> = <area it lies in>\n"
+                "Reports for the location then also show under the area, and the area's subscribers get its alerts. "
+                "Leave the area empty to move the location back to the top level."
+            )
+            return
+        if not placed:
+            await update.message.reply_text(
+                f"❌ \"{parent.strip()}\" lies within \"{location.strip()}\", so it cannot contain it."
+            )
+            return
+        
+        hierarchy = self.db.get_location_hierarchy(location)
+        await update.message.reply_text(
+            f"✅ {' › '.join(hierarchy['ancestors'] + [hierarchy['location']])}"
+        )
+
     async def remove_focal_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Start the remove focal person conversation."""
         user_id = update.effective_user.id
@@ -198,8 +445,7 @@ class AdminHandlers:
         user_id = update.effective_user.id
         
         # Clear user data
-        if user_id in self.user_data:
-            del self.user_data[user_id]
+        self.user_data.pop(user_id)
         
         await update.message.reply_text(
             "❌ Admin action cancelled."
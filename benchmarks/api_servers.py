@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency benchmark: Flask (gunicorn) vs ASGI (uvicorn) Mini App API
+
+Starts each server on a seeded database, drives GET /api/reports from a
+keep-alive asyncio HTTP client with a fixed number of concurrent connections,
+and reports requests/s and p50/p99 latency.
+
+Usage:
+    python benchmarks/api_servers.py [--reports 1000] [--concurrency 32] [--duration 10] [--output api.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from database import SecurityDatabase
+
+SERVERS = {
+    # Mirrors the startCommand in render.yaml
+    'flask-gunicorn': ['gunicorn', '--bind', '127.0.0.1:{port}', '--workers', '2', '--worker-class', 'gthread',
+                       '--threads', '16', '--timeout', '120', '--log-level', 'warning', 'webapp.app:app'],
+    'asgi-uvicorn': ['uvicorn', 'webapp.asgi:app', '--host', '127.0.0.1', '--port', '{port}',
+                     '--workers', '1', '--log-level', 'warning', '--no-access-log'],
+}
+
+PATH = '/api/reports'
+
+
+def seed_database(db_path: str, count: int):
+    """Fill a fresh database with synthetic reports"""
+    SecurityDatabase(db_path)
+    rng = random.Random(42)
+    locations = [f"Area {chr(65 + i % 26)}{i}" for i in range(200)]
+    statuses = ['Safe', 'Caution', 'Warning', 'Danger', 'Emergency']
+    rows = [
+        (rng.choice(locations), rng.choice(statuses), 'Avoid the main road and stay indoors ' * rng.randint(1, 4),
+         1000 + i % 50, f"Reporter {i % 50}")
+        for i in range(count)
+    ]
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany('''
+            INSERT INTO security_reports (location, status, recommended_action, reporter_id, reporter_name)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1):
+                return
+        except Exception:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not become ready')
+
+
+async def fetch(reader, writer, port):
+    """Send one GET and read the response; returns True if the server closed the connection"""
+    writer.write(f'GET {PATH} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n\r\n'.encode())
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line.startswith(b'HTTP/1.1 200') and not status_line.startswith(b'HTTP/1.0 200'):
+        raise RuntimeError(f'unexpected response: {status_line!r}')
+
+    length = 0
+    close = False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and 'close' in value.lower():
+            close = True
+    await reader.readexactly(length)
+    return close
+
+
+async def client(port: int, deadline: float, latencies: list):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        started = time.perf_counter()
+        close = await fetch(reader, writer, port)
+        latencies.append(time.perf_counter() - started)
+        if close:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port: int, concurrency: int, duration: float):
+    latencies = []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client(port, deadline, latencies) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def bench_server(name, command, env, args):
+    port = free_port()
+    process = subprocess.Popen(
+        [part.format(port=port) for part in command],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    try:
+        wait_until_ready(port)
+        # Warm up connections, caches and worker imports
+        asyncio.run(drive(port, args.concurrency, 1))
+        latencies, elapsed = asyncio.run(drive(port, args.concurrency, args.duration))
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=1000, help='reports to seed')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run each server')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        seed_database(db_path, args.reports)
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, DATABASE_PATH=db_path)
+        env.pop('BOT_TOKEN', None)
+
+        for name, command in SERVERS.items():
+            results[name] = bench_server(name, command, env, args)
+            r = results[name]
+            print(f"{name:16s} {r['requests_per_second']:9.1f} req/s  "
+                  f"p50 {r['p50_ms']:7.2f}ms  p99 {r['p99_ms']:7.2f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'api_servers',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'params': vars(args),
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Payload size benchmark: full report list vs delta sync
+
+Replays a month of report activity (a few reports per hour, occasional
+deactivations) while a client opens the Mini App several times a day. On each
+open the client either re-downloads the latest 20 reports, revalidated with
+If-None-Match, or sends its high-water marks to GET /api/reports?since_id=...
+Reports total response bytes, raw and gzip-compressed, for both strategies.
+
+Usage:
+    python benchmarks/delta_sync.py [--days 30] [--reports-per-day 60] [--opens-per-day 12] [--output delta.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+LOCATIONS = [f"{name} {suffix}" for name in ('North', 'South', 'East', 'West', 'Central', 'Old')
+             for suffix in ('Market', 'Bridge', 'Station', 'Camp', 'Road', 'District', 'Village')]
+# Severity level names, so a status's index is its level
+STATUSES = ['Safe', 'Caution', 'Warning', 'Danger', 'Emergency']
+ACTIONS = [
+    'Avoid the area until further notice.',
+    'Roads are open, travel with caution and keep to main routes.',
+    'Stay indoors and follow instructions from local authorities.',
+    'Checkpoint in place, expect delays of up to an hour.',
+    'Situation calm, normal movement has resumed.',
+]
+
+
+class Client:
+    """One Mini App session strategy and the bytes it downloaded"""
+
+    def __init__(self, name):
+        self.name = name
+        self.etag = None
+        self.marks = {'since_id': 0}
+        self.requests = 0
+        self.not_modified = 0
+        self.raw_bytes = 0
+        self.gzip_bytes = 0
+
+    def fetch(self, http, url):
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        response = http.get(url, headers=headers)
+        self.requests += 1
+        if response.status_code == 304:
+            self.not_modified += 1
+            return None
+        self.etag = response.headers.get('ETag')
+        self.raw_bytes += len(response.data)
+        self.gzip_bytes += len(gzip.compress(response.data))
+        return response.get_json()
+
+    def summary(self):
+        return {
+            'requests': self.requests,
+            'not_modified': self.not_modified,
+            'raw_bytes': self.raw_bytes,
+            'gzip_bytes': self.gzip_bytes,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=30, help='days of activity to replay')
+    parser.add_argument('--reports-per-day', type=int, default=60, help='average new reports per day')
+    parser.add_argument('--opens-per-day', type=int, default=12, help='times the client opens the Mini App per day')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        os.environ['DATABASE_PATH'] = db_path
+        os.environ.pop('BOT_TOKEN', None)
+        from webapp.app import app, db
+        http = app.test_client()
+
+        full = Client('full')
+        delta = Client('delta')
+        new_per_open = args.reports_per_day / args.opens_per_day
+
+        for _ in range(args.days * args.opens_per_day):
+            with sqlite3.connect(db_path) as conn:
+                for _ in range(int(rng.expovariate(1 / new_per_open))):
+                    location, status = rng.choice(LOCATIONS), rng.choice(STATUSES)
+                    conn.execute('''
+                        INSERT INTO security_reports
+                            (location, status, recommended_action, reporter_id, reporter_name, severity)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (location, status, rng.choice(ACTIONS),
+                          1000 + rng.randrange(40), f"Reporter {rng.randrange(40)}", STATUSES.index(status)))
+                if rng.random() < 0.05:
+                    conn.execute('''
+                        UPDATE security_reports SET is_active = 0
+                        WHERE id = (SELECT id FROM security_reports WHERE is_active = 1 ORDER BY RANDOM() LIMIT 1)
+                    ''')
+                conn.commit()
+
+            full.fetch(http, '/api/reports')
+            body = delta.fetch(http, '/api/reports?' + '&'.join(f'{k}={v}' for k, v in delta.marks.items()))
+            if body is not None:
+                delta.marks = {'since_id': body['high_water_mark'], 'removals_since': body['removal_mark']}
+
+        total_reports = len(db.get_reports_page(limit=10 ** 9))
+
+    results = {'reports': total_reports, 'full': full.summary(), 'delta': delta.summary()}
+    for key in ('raw_bytes', 'gzip_bytes'):
+        results[f'{key}_saved_pct'] = round(100 * (1 - delta.summary()[key] / max(1, full.summary()[key])), 1)
+
+    for client in (full, delta):
+        r = client.summary()
+        print(f"{client.name:6s} {r['requests']:5d} requests ({r['not_modified']} not modified)  "
+              f"{r['raw_bytes'] / 1024:9.1f} KiB raw  {r['gzip_bytes'] / 1024:8.1f} KiB gzip")
+    print(f"delta sync saves {results['raw_bytes_saved_pct']}% raw, {results['gzip_bytes_saved_pct']}% gzip "
+          f"over {total_reports} reports")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'delta_sync',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'params': vars(args),
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Response encoding benchmark for report list payloads
+
+For 1k and 10k synthetic reports, compares the default list-of-objects body
+with ?format=columnar, serialized with the standard json module (as Flask
+does by default) and with orjson, and reports body size raw, gzip- and
+brotli-compressed (brotli only when installed) and the time to serialize and
+compress.
+
+Usage:
+    python benchmarks/encoding.py [--sizes 1000 10000] [--repeat 20] [--output encoding.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from webapp.api import REPORT_FIELDS, columnar, report_to_dict
+from webapp.encoding import BROTLI_QUALITY, GZIP_LEVEL, brotli, orjson
+
+LOCATIONS = [f"{name} {suffix}" for name in ('North', 'South', 'East', 'West', 'Central', 'Old')
+             for suffix in ('Market', 'Bridge', 'Station', 'Camp', 'Road', 'District', 'Village')]
+# Severity level names, so a status's index is its level
+STATUSES = ['Safe', 'Caution', 'Warning', 'Danger', 'Emergency']
+ACTIONS = [
+    'Avoid the area until further notice.',
+    'Roads are open, travel with caution and keep to main routes.',
+    'Stay indoors and follow instructions from local authorities.',
+    'Checkpoint in place, expect delays of up to an hour.',
+    'Situation calm, normal movement has resumed.',
+]
+
+
+def report_rows(count):
+    """Rows shaped like SecurityDatabase.get_reports_page results"""
+    rng = random.Random(42)
+    rows = [
+        (count - i, rng.choice(LOCATIONS), rng.choice(STATUSES), rng.choice(ACTIONS),
+         f"Reporter {rng.randrange(40)}", f"2024-05-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00")
+        for i in range(count)
+    ]
+    return [row + (STATUSES.index(row[2]),) for row in rows]
+
+
+def json_dumps(body):
+    # Flask's default provider: sorted keys, compact separators
+    return json.dumps(body, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def orjson_dumps(body):
+    return orjson.dumps(body, option=orjson.OPT_SORT_KEYS)
+
+
+def best_ms(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def bench(count, repeat):
+    rows = report_rows(count)
+    formats = {
+        'objects': lambda: [report_to_dict(row) for row in rows],
+        'columnar': lambda: columnar(REPORT_FIELDS, rows),
+    }
+    encoders = {'json': json_dumps}
+    if orjson is not None:
+        encoders['orjson'] = orjson_dumps
+
+    results = {}
+    for format_name, build in formats.items():
+        body = build()
+        data = json_dumps(body)
+        result = {
+            'build_ms': round(best_ms(build, repeat), 3),
+            'raw_bytes': len(data),
+            'gzip_bytes': len(gzip.compress(data, compresslevel=GZIP_LEVEL)),
+            'gzip_ms': round(best_ms(lambda: gzip.compress(data, compresslevel=GZIP_LEVEL), repeat), 3),
+        }
+        if brotli is not None:
+            result['brotli_bytes'] = len(brotli.compress(data, quality=BROTLI_QUALITY))
+            result['brotli_ms'] = round(best_ms(lambda: brotli.compress(data, quality=BROTLI_QUALITY), repeat), 3)
+        for encoder_name, encode in encoders.items():
+            result[f'{encoder_name}_ms'] = round(best_ms(lambda: encode(body), repeat), 3)
+        results[format_name] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='report counts to encode')
+    parser.add_argument('--repeat', type=int, default=20, help='timing repetitions (best is kept)')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    if orjson is None:
+        print('orjson not installed: only the standard json encoder is timed')
+    if brotli is None:
+        print('brotli not installed: only gzip is measured')
+
+    results = {}
+    for count in args.sizes:
+        results[count] = bench(count, args.repeat)
+        for format_name, r in results[count].items():
+            line = (f"{count:6d} {format_name:9s} {r['raw_bytes'] / 1024:8.1f} KiB raw "
+                    f"{r['gzip_bytes'] / 1024:7.1f} KiB gzip ({r['gzip_ms']:6.2f}ms)")
+            if 'brotli_bytes' in r:
+                line += f" {r['brotli_bytes'] / 1024:7.1f} KiB br ({r['brotli_ms']:6.2f}ms)"
+            line += f"  json {r['json_ms']:6.2f}ms"
+            if 'orjson_ms' in r:
+                line += f"  orjson {r['orjson_ms']:6.2f}ms"
+            print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'encoding',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'params': vars(args),
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Seeded synthetic data for the benchmarks
+
+The same seed always yields the same rows, so runs on different commits
+measure the same data. seed_database() writes reports, subscribers and
+focal people into a database file and records what it seeded next to it,
+so a later run asking for the same data reuses the file instead of
+spending minutes re-seeding a million reports. Locations are arranged
+in a three-level hierarchy so roll-up queries have areas to cover.
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+from typing import Iterator, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import severity
+from database import SCHEMA_VERSION, SecurityDatabase
+
+PLACES = ['Bole', 'Piassa', 'Merkato', 'Kazanchis', 'Sarbet', 'Ayat', 'Gerji', 'Kality', 'Lebu', 'Megenagna',
+          'Arada', 'Gulele', 'Yeka', 'Akaki', 'Kolfe', 'Lideta', 'Mexico', 'Summit', 'Jemo', 'Tor Hailoch']
+SUFFIXES = ['Road', 'Market', 'Square', 'Station', 'Bridge', 'Camp', 'District', 'Village', 'Junction', 'Hill']
+STATUSES = ['Safe', 'Caution', 'Warning', 'Danger', 'Emergency']
+ACTION_PARTS = [
+    ['Avoid', 'Stay away from', 'Use caution near', 'Do not travel to', 'Leave'],
+    ['the main road', 'the market area', 'the bridge', 'the checkpoint', 'the bus terminal', 'the stadium'],
+    ['until further notice', 'after dark', 'during the protest', 'while police clear the area', 'today'],
+]
+FIRST_NAMES = ['Abebe', 'Almaz', 'Bekele', 'Hana', 'Dawit', 'Meron', 'Yonas', 'Selam', 'Tesfaye', 'Liya',
+               'Kebede', 'Tigist', 'Samuel', 'Ruth', 'Daniel', 'Mahlet', 'Henok', 'Saron', 'Biruk', 'Eden']
+LAST_NAMES = ['Tadesse', 'Girma', 'Haile', 'Alemu', 'Mekonnen', 'Wolde', 'Bekele', 'Desta', 'Kassa', 'Abera']
+
+# Top of the generated location hierarchy: city > place > "place suffix"; zones sit under ZONES
+CITY = 'Addis Ababa'
+ZONES = 'Outer Zones'
+
+# Telegram user IDs of generated people, clear of the reporter IDs below
+SUBSCRIBER_ID_BASE = 100_000_000
+FOCAL_PERSON_ID_BASE = 200_000_000
+REPORTER_ID_BASE = 1000
+REPORTERS = 500
+
+# Rows per executemany while seeding
+SEED_BATCH = 50000
+
+
+def report_rows(count: int, seed: int = 42) -> Iterator[Tuple[str, str, str, int, str, int]]:
+    """(location, status, recommended_action, reporter_id, reporter_name, severity) rows"""
+    rng = random.Random(seed)
+    names = [f"{place} {suffix}" for place in PLACES for suffix in SUFFIXES]
+    # Drawn from the same generator as the reports, so a seed fixes the whole sequence
+    names += [f"Zone {n} {rng.choice(SUFFIXES)}" for n in range(1, 400)]
+    for i in range(count):
+        action = ' '.join(rng.choice(part) for part in ACTION_PARTS) + '.'
+        status = rng.choice(STATUSES)
+        yield (rng.choice(names), status, action,
+               REPORTER_ID_BASE + i % REPORTERS, f"Reporter {i % REPORTERS}", severity.classify(status, action))
+
+
+def _people(count: int, id_base: int, seed: int) -> Iterator[Tuple[int, str]]:
+    rng = random.Random(seed)
+    for i in range(count):
+        yield id_base + i, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def subscriber_rows(count: int, seed: int = 43) -> Iterator[Tuple[int, str]]:
+    """(telegram_user_id, name) rows"""
+    return _people(count, SUBSCRIBER_ID_BASE, seed)
+
+
+def focal_people_rows(count: int, seed: int = 44) -> Iterator[Tuple[int, str]]:
+    """(telegram_user_id, name) rows; names are letters and spaces, as /addfocal requires"""
+    return _people(count, FOCAL_PERSON_ID_BASE, seed)
+
+
+def _batches(rows: Iterator, size: int = SEED_BATCH) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_reports(db_path: str, count: int, seed: int = 42, progress: bool = True):
+    """Append count generated reports, bypassing SecurityDatabase for speed, then link their locations"""
+    inserted = 0
+    with sqlite3.connect(db_path) as conn:
+        for batch in _batches(report_rows(count, seed)):
+            conn.executemany('''
+                INSERT INTO security_reports (location, status, recommended_action, reporter_id, reporter_name, severity)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', batch)
+            conn.commit()
+            inserted += len(batch)
+            if progress:
+                print(f"  seeded {inserted} reports", end='\r', flush=True)
+    if progress and count:
+        print()
+    SecurityDatabase(db_path).link_report_locations()
+
+
+def seed_hierarchy(db: SecurityDatabase):
+    """Place every reported location under its place (or ZONES), and those under the city"""
+    for _, location, _, _, _ in db.get_location_summaries():
+        place = ZONES if location.startswith('Zone ') else location.rsplit(' ', 1)[0]
+        db.set_location_parent(location, place)
+    for place in PLACES + [ZONES]:
+        db.set_location_parent(place, CITY)
+
+
+def seed_database(db_path: str, reports: int, subscribers: int = 0, focal_people: int = 0,
+                  seed: int = 42, admins: Tuple[int, ...] = ()) -> SecurityDatabase:
+    """
+    A database holding exactly the requested generated data
+
+    The file is reused when the manifest beside it matches the request and
+    the current schema version; otherwise it is deleted and seeded again.
+    """
+    manifest_path = db_path + '.seed.json'
+    wanted = {
+        'schema_version': SCHEMA_VERSION,
+        'reports': reports,
+        'subscribers': subscribers,
+        'focal_people': focal_people,
+        'seed': seed,
+        'admins': sorted(admins),
+    }
+    try:
+        with open(manifest_path) as f:
+            if json.load(f) == wanted and os.path.exists(db_path):
+                return SecurityDatabase(db_path)
+    except (OSError, ValueError):
+        pass
+
+    for suffix in ('', '-wal', '-shm', '.seed.json'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    print(f"Seeding {reports} reports, {subscribers} subscribers and {focal_people} focal people into {db_path}")
+    db = SecurityDatabase(db_path)
+    insert_reports(db_path, reports, seed)
+    seed_hierarchy(db)
+    for batch in _batches(subscriber_rows(subscribers, seed + 1)):
+        db.upsert_subscribers(batch)
+    for batch in _batches(focal_people_rows(focal_people, seed + 2)):
+        db.upsert_focal_people(batch, added_by=admins[0] if admins else 0)
+    db.ensure_admins(admins)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(wanted, f, indent=2)
+    return db
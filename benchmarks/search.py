@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Search latency benchmark for GET /api/search
+
+Seeds a database with synthetic reports (1M by default; the file is kept and
+reused across runs), then times ReportSearch for exact, prefix, misspelled,
+multi-term and very common queries, first pages and follow-up pages. The
+LIKE '%term%' scan the bot used for location search is timed for comparison.
+
+Usage:
+    python benchmarks/search.py [--reports 1000000] [--db /tmp/search_bench.db] [--repeat 50] [--output search.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from database import SecurityDatabase
+from report_search import ReportSearch
+from benchmarks.generators import insert_reports
+
+QUERIES = {
+    'exact location': 'merkato',
+    'two-term location': 'bole road',
+    'prefix': 'kaz',
+    'typo': 'merkatto',
+    'typo two-term': 'gerji brige',
+    'common status': 'safe',
+    'action phrase': 'checkpoint protest',
+    'no match': 'zanzibar',
+}
+
+
+def timings_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'p50': round(statistics.median(samples), 2),
+        'p99': round(samples[min(len(samples) - 1, int(0.99 * len(samples)))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=1000000, help='reports to seed')
+    parser.add_argument('--db', default='/tmp/search_bench.db', help='database file, reused when already seeded')
+    parser.add_argument('--repeat', type=int, default=50, help='timed runs per query')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    db = SecurityDatabase(args.db)
+    existing = len(db.get_reports_page(limit=1)) and db.get_reports_page(limit=1)[0][0]
+    if existing != args.reports:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        print(f"Seeding {args.reports} reports into {args.db}")
+        started = time.perf_counter()
+        SecurityDatabase(args.db)
+        insert_reports(args.db, args.reports)
+        print(f"  took {time.perf_counter() - started:.1f}s")
+        db = SecurityDatabase(args.db)
+
+    search = ReportSearch(db)
+    started = time.perf_counter()
+    search.vocabulary.build(db)
+    vocabulary_ms = (time.perf_counter() - started) * 1000
+    print(f"vocabulary: {len(search.vocabulary)} terms built in {vocabulary_ms:.0f}ms")
+
+    results = {'reports': args.reports, 'vocabulary_terms': len(search.vocabulary),
+               'vocabulary_build_ms': round(vocabulary_ms, 1), 'queries': {}}
+    for name, query in QUERIES.items():
+        first = search.search(query)
+        entry = {
+            'query': query,
+            'hits_on_first_page': len(first['results']),
+            'corrections': first['corrections'],
+            'first_page_ms': timings_ms(lambda: search.search(query), args.repeat),
+        }
+        if first['next_cursor']:
+            cursor = first['next_cursor']
+            entry['next_page_ms'] = timings_ms(lambda: search.search(query, cursor=cursor), args.repeat)
+        results['queries'][name] = entry
+
+        line = (f"{name:20s} {query!r:22s} {entry['hits_on_first_page']:3d} hits  "
+                f"p50 {entry['first_page_ms']['p50']:6.2f}ms  p99 {entry['first_page_ms']['p99']:6.2f}ms")
+        if 'next_page_ms' in entry:
+            line += f"  next page p50 {entry['next_page_ms']['p50']:6.2f}ms"
+        print(line)
+
+    # Baseline: the substring scan behind get_reports_by_location
+    baseline = timings_ms(lambda: db.get_reports_by_location('merkato', limit=20), max(3, args.repeat // 10))
+    results['like_scan_ms'] = baseline
+    print(f"{'LIKE scan baseline':20s} {'merkato':22s}       p50 {baseline['p50']:6.2f}ms  p99 {baseline['p99']:6.2f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'search',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'params': vars(args),
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the bot and the Mini App web service
+
+Spawns fresh interpreters and measures the wall time until each service has
+produced its first response, on a first boot (empty database) and on restarts
+(existing database). Also lists the slowest imports from `python -X importtime`.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each snippet starts a service and produces its first response
+TARGETS = {
+    'webapp': {
+        'imports': 'import webapp.app',
+        'first_response': '''
+from webapp.app import app
+assert app.test_client().get('/api/reports').status_code == 200
+''',
+    },
+    'bot': {
+        'imports': 'import bot',
+        'first_response': '''
+import asyncio
+from types import SimpleNamespace
+from telegram.ext import Application
+import bot
+
+security_bot = bot.SecurityBot()
+security_bot.application = (
+    Application.builder().token(security_bot.token).persistence(security_bot.persistence).build()
+)
+security_bot.setup_handlers()
+
+async def reply_text(text, **kwargs):
+    pass
+
+update = SimpleNamespace(message=SimpleNamespace(reply_text=reply_text), callback_query=None)
+asyncio.run(security_bot.send_reports_page(update, location=''))
+''',
+    },
+}
+
+
+def run_snippet(code: str, env: dict, extra_args=()) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *extra_args, '-c', code],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def time_snippet(code: str, env: dict) -> float:
+    """Wall time in milliseconds from spawning the interpreter to its exit"""
+    started = time.perf_counter()
+    run_snippet(code, env)
+    return (time.perf_counter() - started) * 1000
+
+
+def top_imports(code: str, env: dict, count: int = 10):
+    """Import time per top-level package, summing each module's own (self) time"""
+    stderr = run_snippet(code, env, ('-X', 'importtime')).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return [{'package': name, 'self_ms': round(ms, 1)} for name, ms in ranked[:count]]
+
+
+def summarize(samples):
+    return {
+        'median': round(statistics.median(samples), 1),
+        'min': round(min(samples), 1),
+        'max': round(max(samples), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='restarts to time per target')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, target in TARGETS.items():
+            env = dict(
+                os.environ,
+                PYTHONPATH=REPO_ROOT,
+                DATABASE_PATH=os.path.join(tmp, f'{name}.db'),
+                BOT_TOKEN='123456:benchmark',
+                ADMIN_USER_IDS='1,2,3',
+            )
+            first_boot = time_snippet(target['first_response'], env)
+            restarts = [time_snippet(target['first_response'], env) for _ in range(args.runs)]
+            results[name] = {
+                'first_boot_ms': round(first_boot, 1),
+                'restart_ms': summarize(restarts),
+                'top_imports': top_imports(target['imports'], env),
+            }
+
+            print(f"{name}: first boot {first_boot:.0f}ms, "
+                  f"restart median {results[name]['restart_ms']['median']:.0f}ms")
+            for item in results[name]['top_imports'][:5]:
+                print(f"    {item['self_ms']:8.1f}ms  {item['package']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'startup',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'runs': args.runs,
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: database queries, /status rendering, API endpoints and notification fanout
+
+Seeds a database from generators.py (cached beside --db and reused while the
+sizes and schema match) and runs each benchmark on a fresh copy of it:
+
+  db      every public SecurityDatabase method
+  status  the bot's /status, /location and paging handlers against a stub update
+  api     the Mini App endpoints through the Flask test client
+  fanout  security and admin alerts to every subscriber through a fake Bot
+
+Results are written as JSON with the git commit, so runs on two commits can
+be compared; --compare prints the change per case and exits with status 1
+when a case got slower by more than --threshold.
+
+Usage:
+    python benchmarks/suite.py [--reports 100000] [--subscribers 10000] [--focal-people 200]
+                               [--only db,status,api,fanout] [--repeat 30] [--db /tmp/bench_suite.db]
+                               [--output after.json] [--compare before.json]
+    python benchmarks/suite.py --compare before.json after.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import types
+import urllib.parse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+GROUPS = ('db', 'status', 'api', 'fanout')
+
+# Admin the suite acts as; the web app trusts it without a BOT_TOKEN
+ADMIN_ID = 994550828
+
+# Changes smaller than this are noise whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(func, repeat, budget=2.0):
+    """
+    Time func after one warm-up call
+
+    Stops after repeat runs, or once budget seconds are spent and at least
+    three runs are in, so a slow case does not hold up the suite.
+    """
+    func()
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeat and (len(samples) < 3 or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'runs': len(samples),
+        'min_ms': round(samples[0], 3),
+        'p50_ms': round(percentile(samples, 0.5), 3),
+        'p95_ms': round(percentile(samples, 0.95), 3),
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def bench_db(db, args):
+    import severity
+    from database import SecurityDatabase
+    from benchmarks.generators import CITY, FOCAL_PERSON_ID_BASE, SUBSCRIBER_ID_BASE
+
+    newest = db.get_reports_page(limit=1)[0][0]
+    subscribers = [(SUBSCRIBER_ID_BASE + i, 'Bench Subscriber') for i in range(min(500, args.subscribers))]
+    focal_people = [(FOCAL_PERSON_ID_BASE + i, 'Bench Reporter') for i in range(min(100, args.focal_people))]
+    new_ids = itertools.count(900_000_000)
+    added_focal, added_subscribers = [], []
+
+    def add_focal_person():
+        added_focal.append(next(new_ids))
+        db.add_focal_person(added_focal[-1], 'Bench Reporter', ADMIN_ID)
+
+    def add_subscriber():
+        added_subscribers.append(next(new_ids))
+        db.add_subscriber(added_subscribers[-1], 'Bench Subscriber')
+
+    cases = {
+        # Reads first, so writes below do not change what they see
+        'init_database': db.init_database,
+        'get_latest_reports': lambda: db.get_latest_reports(10),
+        'get_reports_by_location': lambda: db.get_reports_by_location('merkato', 5),
+        'get_reports_page': lambda: db.get_reports_page(limit=6),
+        'get_reports_page[older]': lambda: db.get_reports_page(limit=6, before_id=newest // 2),
+        'get_reports_page[location]': lambda: db.get_reports_page(limit=6, location='merkato'),
+        'get_reports_page[city]': lambda: db.get_reports_page(limit=6, location=CITY),
+        'get_reports_page[severe]': lambda: db.get_reports_page(limit=6, min_severity=severity.DANGER),
+        'get_reports_page[emergency]': lambda: db.get_reports_page(limit=6, min_severity=severity.EMERGENCY),
+        'get_report_delta': lambda: db.get_report_delta(newest - 10, removals_since=0),
+        'get_bootstrap_snapshot': lambda: db.get_bootstrap_snapshot(ADMIN_ID),
+        'get_location_summaries': db.get_location_summaries,
+        'get_location_summaries[recent]': lambda: db.get_location_summaries(after_id=newest - 100),
+        'get_location': lambda: db.get_location('Bole Road'),
+        'get_location_hierarchy': lambda: db.get_location_hierarchy('Bole'),
+        'get_worst_status': lambda: db.get_worst_status('Bole'),
+        'get_worst_status[city]': lambda: db.get_worst_status(CITY),
+        'search_reports': lambda: db.search_reports('"merkato"'),
+        'get_search_vocabulary': db.get_search_vocabulary,
+        'get_report_texts': lambda: db.get_report_texts(after_id=newest - 1000),
+        'is_focal_person': lambda: db.is_focal_person(FOCAL_PERSON_ID_BASE),
+        'is_admin': lambda: db.is_admin(ADMIN_ID),
+        'is_subscriber': lambda: db.is_subscriber(SUBSCRIBER_ID_BASE),
+        'get_all_focal_people': db.get_all_focal_people,
+        'get_all_subscribers': db.get_all_subscribers,
+        'get_subscribers_for_location': lambda: db.get_subscribers_for_location('Bole Road'),
+        'get_subscriber_areas': lambda: db.get_subscriber_areas(SUBSCRIBER_ID_BASE),
+        'get_all_admins': db.get_all_admins,
+        'get_data_generations': db.get_data_generations,
+        'ping': db.ping,
+        'link_report_locations': db.link_report_locations,
+        'iter_focal_people': lambda: sum(len(rows) for rows in db.iter_focal_people()),
+        'iter_subscribers': lambda: sum(len(rows) for rows in db.iter_subscribers()),
+        'get_report': lambda: db.get_report(newest),
+        # Distinct actions, or every call after the first would only find a duplicate
+        'add_security_report': lambda: db.add_security_report('Bole Road', 'Safe', f'Carry on {next(new_ids)}.',
+                                                              1000, 'Reporter 0'),
+        'add_security_report[duplicate]': lambda: db.add_security_report('Bole Road', 'Safe', 'Carry on.',
+                                                                         1000, 'Reporter 0'),
+        'add_security_report[retry]': lambda: db.add_security_report('Bole Road', 'Safe', 'Carry on.', 1000,
+                                                                     'Reporter 0', idempotency_key='bench-retry'),
+        'add_focal_person': add_focal_person,
+        'remove_focal_person': lambda: db.remove_focal_person(added_focal.pop() if added_focal else 1),
+        'add_admin': lambda: db.add_admin(next(new_ids)),
+        'ensure_admins': lambda: db.ensure_admins([ADMIN_ID]),
+        'add_subscriber': add_subscriber,
+        'remove_subscriber': lambda: db.remove_subscriber(added_subscribers.pop() if added_subscribers else 1),
+        'upsert_subscribers': lambda: db.upsert_subscribers(subscribers),
+        'upsert_focal_people': lambda: db.upsert_focal_people(focal_people, ADMIN_ID),
+        'set_location_alias': lambda: db.set_location_alias('bole rd', 'Bole Road'),
+        'set_location_parent': lambda: db.set_location_parent('Bole Road', 'Bole'),
+        'add_subscriber_area': lambda: db.add_subscriber_area(SUBSCRIBER_ID_BASE, 'Bole'),
+        'remove_subscriber_area': lambda: db.remove_subscriber_area(SUBSCRIBER_ID_BASE, 'Bole'),
+    }
+
+    public = {name for name in vars(SecurityDatabase) if not name.startswith('_') and callable(getattr(SecurityDatabase, name))}
+    missing = public - {name.split('[')[0] for name in cases}
+    if missing:
+        print(f"  not benchmarked: {', '.join(sorted(missing))}")
+
+    results = {}
+    for name, func in cases.items():
+        results[name] = measure(func, args.repeat)
+        print(f"  {name:34s} p50 {results[name]['p50_ms']:9.3f}ms  p95 {results[name]['p95_ms']:9.3f}ms")
+    return results
+
+
+def stub_update(user_id, callback_data=None):
+    """Just enough of a telegram Update for the report page handlers"""
+    async def reply(*args, **kwargs):
+        return None
+
+    user = types.SimpleNamespace(id=user_id, full_name='Bench User', username='bench')
+    query = None
+    if callback_data is not None:
+        query = types.SimpleNamespace(data=callback_data, answer=reply, edit_message_text=reply)
+    return types.SimpleNamespace(
+        effective_user=user,
+        message=types.SimpleNamespace(reply_text=reply),
+        callback_query=query,
+    )
+
+
+def bench_status(db, args):
+    import bot
+
+    # The page handlers only touch the database; skip the Telegram application setup
+    handler = bot.SecurityBot.__new__(bot.SecurityBot)
+    handler.db = db
+    newest = db.get_reports_page(limit=1)[0][0]
+    loop = asyncio.new_event_loop()
+
+    cases = {
+        '/status': lambda: handler.status_command(stub_update(ADMIN_ID), types.SimpleNamespace(args=[])),
+        '/location merkato': lambda: handler.location_command(stub_update(ADMIN_ID), types.SimpleNamespace(args=['merkato'])),
+        'older page': lambda: handler.report_page_callback(
+            stub_update(ADMIN_ID, bot.encode_page_cursor('older', newest // 2)), None
+        ),
+    }
+    rows = db.get_reports_page(limit=bot.REPORTS_PAGE_SIZE)
+    results = {'render_reports_page': measure(lambda: bot.render_reports_page('Latest\n\n', rows), args.repeat)}
+    try:
+        for name, make_call in cases.items():
+            results[name] = measure(lambda: loop.run_until_complete(make_call()), args.repeat)
+    finally:
+        loop.close()
+    for name, result in results.items():
+        print(f"  {name:34s} p50 {result['p50_ms']:9.3f}ms  p95 {result['p95_ms']:9.3f}ms")
+    return results
+
+
+def bench_api(db, args):
+    from webapp.app import app
+
+    client = app.test_client()
+    init_data = 'user=' + urllib.parse.quote(json.dumps({'id': ADMIN_ID, 'first_name': 'Bench'}))
+    headers = {'X-Telegram-Init-Data': init_data, 'Accept-Encoding': 'gzip'}
+    newest = db.get_reports_page(limit=1)[0][0]
+    etag = client.get('/api/reports', headers=headers).headers.get('ETag')
+    report = {'location': 'Bole Road', 'status': 'Safe', 'recommended_action': 'Carry on.', 'user_id': ADMIN_ID}
+    new_reports = itertools.count()
+
+    cases = {
+        'GET /': ('GET', '/', {}),
+        'GET /health': ('GET', '/health', {}),
+        'GET /api/bootstrap': ('GET', '/api/bootstrap', {}),
+        'GET /api/reports': ('GET', '/api/reports', {}),
+        'GET /api/reports (304)': ('GET', '/api/reports', {'If-None-Match': etag or '*'}),
+        'GET /api/reports columnar': ('GET', '/api/reports?format=columnar', {}),
+        'GET /api/reports delta': ('GET', f'/api/reports?since_id={newest - 10}&removals_since=0', {}),
+        'GET /api/reports location': ('GET', '/api/reports?location=merkato', {}),
+        'GET /api/reports severe': ('GET', '/api/reports?severity=danger', {}),
+        'GET /api/locations': ('GET', '/api/locations/Addis%20Ababa', {}),
+        'GET /api/search': ('GET', '/api/search?q=merkato', {}),
+        'GET /api/search typo': ('GET', '/api/search?q=merkatto', {}),
+        'GET /api/admin/focal-people': ('GET', '/api/admin/focal-people', {}),
+        'GET /api/admin/subscribers/export': ('GET', '/api/admin/subscribers/export', {}),
+        'POST /api/user/permissions': ('POST', '/api/user/permissions', {}),
+        'POST /api/reports': ('POST', '/api/reports', {}),
+        'POST /api/reports (retry)': ('POST', '/api/reports', {'Idempotency-Key': 'bench-retry'}),
+    }
+
+    def request(method, path, extra):
+        if method == 'GET':
+            response = client.get(path, headers={**headers, **extra})
+        elif path == '/api/reports' and extra:
+            response = client.post(path, headers={**headers, **extra}, json=report)
+        elif path == '/api/reports':
+            # A new report each time; repeating one would only time duplicate detection
+            response = client.post(path, headers=headers,
+                                   json=dict(report, recommended_action=f"Carry on {next(new_reports)}."))
+        else:
+            response = client.post(path, headers=headers, json={'user_id': ADMIN_ID})
+        response.get_data()  # Drain streamed bodies
+        return response.status_code
+
+    results = {}
+    for name, (method, path, extra) in cases.items():
+        status = request(method, path, extra)
+        if status >= 400:
+            raise RuntimeError(f"{name} answered {status}; the benchmark would only time an error")
+        results[name] = measure(lambda: request(method, path, extra), args.repeat)
+        print(f"  {name:34s} p50 {results[name]['p50_ms']:9.3f}ms  p95 {results[name]['p95_ms']:9.3f}ms")
+    return results
+
+
+class FakeBot:
+    """Stands in for telegram.Bot: accepts every message after an optional simulated round trip"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None, disable_notification=False):
+        await asyncio.sleep(self.latency)
+        self.sent += 1
+
+
+def bench_fanout(db, args):
+    from notifications import NotificationService
+
+    service = NotificationService('123456:benchmark', db)
+    service.bot = FakeBot(args.send_latency_ms)
+    subscribers = len(db.get_all_subscribers())
+    alert = {'location': 'Bole Road', 'status': 'Danger', 'recommended_action': 'Avoid the area.',
+             'reporter_name': 'Bench Reporter'}
+    loop = asyncio.new_event_loop()
+    try:
+        security = measure(lambda: loop.run_until_complete(service.send_security_alert(**alert)),
+                           max(1, args.repeat // 10), budget=10.0)
+        admin = measure(lambda: loop.run_until_complete(service.send_admin_alert(reporter_id=1000, **alert)),
+                        args.repeat)
+    finally:
+        loop.close()
+
+    security['recipients'] = subscribers
+    security['messages_per_second'] = round(subscribers / (security['p50_ms'] / 1000)) if subscribers else 0
+    print(f"  {'security alert':34s} p50 {security['p50_ms']:9.1f}ms for {subscribers} subscribers "
+          f"({security['messages_per_second']} msg/s)")
+    print(f"  {'admin alert':34s} p50 {admin['p50_ms']:9.3f}ms")
+    return {'send_security_alert': security, 'send_admin_alert': admin}
+
+
+def compare(baseline, current, threshold):
+    """Print the p50 change of every case in both runs; returns how many got slower than threshold"""
+    print(f"Comparing {baseline.get('git', {}).get('commit')} -> {current.get('git', {}).get('commit')}")
+    regressions = 0
+    for group, cases in current['results'].items():
+        for name, result in cases.items():
+            before = baseline['results'].get(group, {}).get(name)
+            if not before:
+                continue
+            old, new = before['p50_ms'], result['p50_ms']
+            change = (new - old) / old if old else 0.0
+            flag = ''
+            if change > threshold and new - old > NOISE_FLOOR_MS:
+                flag = '  REGRESSION'
+                regressions += 1
+            elif change < -threshold and old - new > NOISE_FLOOR_MS:
+                flag = '  faster'
+            print(f"  {group:6s} {name:34s} {old:9.3f} -> {new:9.3f}ms  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=100000, help='reports to seed (up to 1M)')
+    parser.add_argument('--subscribers', type=int, default=10000, help='subscribers to seed (up to 100k)')
+    parser.add_argument('--focal-people', type=int, default=200, help='focal people to seed')
+    parser.add_argument('--seed', type=int, default=42, help='generator seed')
+    parser.add_argument('--db', default='/tmp/bench_suite.db', help='seeded database, reused across runs')
+    parser.add_argument('--only', default=','.join(GROUPS), help='comma-separated groups to run')
+    parser.add_argument('--repeat', type=int, default=30, help='timed runs per case')
+    parser.add_argument('--send-latency-ms', type=float, default=0.0, help='simulated Telegram round trip per message')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                        help='baseline results to compare this run with, or a baseline and a later result file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown counted as a regression (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error('--compare takes a baseline, or a baseline and a later result file')
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            sys.exit(1 if compare(json.load(f), json.load(g), args.threshold) else 0)
+
+    groups = [group for group in args.only.split(',') if group]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+
+    # Runs use a copy, so writes never change the cached seed
+    work_db = args.db + '.run'
+    os.environ['DATABASE_PATH'] = work_db
+    # No traces, and no BOT_TOKEN from .env: the web app then trusts the admin's user ID
+    os.environ['TRACE_FILE'] = ''
+    os.environ['BOT_TOKEN'] = ''
+    logging.disable(logging.INFO)
+
+    from benchmarks.generators import seed_database
+    import database
+
+    started = time.perf_counter()
+    seed_database(args.db, args.reports, args.subscribers, args.focal_people, args.seed, admins=(ADMIN_ID,))
+    print(f"Database ready in {time.perf_counter() - started:.1f}s")
+    # Slow calls would be logged and explained inside the timed region
+    database.QUERY_LOG.threshold_ms = float('inf')
+
+    benches = {'db': bench_db, 'status': bench_status, 'api': bench_api, 'fanout': bench_fanout}
+    results = {}
+    for group in groups:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(work_db + suffix):
+                os.remove(work_db + suffix)
+        shutil.copyfile(args.db, work_db)
+        print(f"{group}:")
+        results[group] = benches[group](database.SecurityDatabase(work_db), args)
+
+    report = {
+        'benchmark': 'suite',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'git': git_revision(),
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            sys.exit(1 if compare(json.load(f), report, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
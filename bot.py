@@ -1,10 +1,23 @@
+from startup_profile import StartupProfile
+
+# Created before the heavy imports below so they show up in the profile
+startup_profile = StartupProfile('bot')
+
 import os
+import hashlib
 import logging
 import re
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, List, Optional, Tuple, Union
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from telegram import (
+    Update,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    WebAppInfo
+)
 from telegram.ext import (
     Application, 
     CommandHandler, 
@@ -12,14 +25,24 @@ from telegram.ext import (
     filters, 
     ContextTypes,
     ConversationHandler,
-    CallbackQueryHandler
+    CallbackQueryHandler,
+    InlineQueryHandler,
+    TypeHandler
 )
-from telegram.constants import ParseMode
+from telegram.constants import ParseMode, MessageLimit, InlineKeyboardButtonLimit
+from telegram.error import BadRequest
 from dotenv import load_dotenv
 
-from database import SecurityDatabase
+from database import SecurityDatabase, parse_admin_ids
+from flood_control import FloodControl
+from location_index import LocationIndex, normalize_location
+from conversation_store import ConversationStore, ConversationPersistence, DEFAULT_CONVERSATION_TTL
 from admin_handlers import AdminHandlers, ADD_FOCAL_ID, ADD_FOCAL_NAME, REMOVE_FOCAL_ID
 from notifications import NotificationService
+import metrics
+import profiling
+import severity
+import tracing
 
 # Load environment variables
 load_dotenv()
@@ -30,28 +53,185 @@ logging.basicConfig(
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
+startup_profile.mark('imports')
 
-# Conversation states
-REPORT_LOCATION, REPORT_STATUS, REPORT_ACTION = range(3)
+# Conversation states; REPORT_SEVERITY comes after REPORT_STATUS but is numbered
+# last so conversations persisted before it existed resume in the right state
+REPORT_LOCATION, REPORT_STATUS, REPORT_ACTION, REPORT_SEVERITY = range(4)
 ADD_FOCAL_LOCATION, ADD_FOCAL_NAME = range(2)
 
+
+# Reports shown per /status or /location page
+REPORTS_PAGE_SIZE = 5
+
+# Longest status or action shown in a report list before it is cut short
+MAX_REPORT_FIELD_LENGTH = 500
+
+# Areas named under a /location heading before the rest are counted instead
+MAX_AREAS_LISTED = 10
+
+PAGE_CURSOR_PREFIX = 'rp'
+# Longest search term a page cursor carries whole; the rest of the callback data
+# holds the prefix, the direction and a report ID of up to ten digits
+MAX_CURSOR_LOCATION_BYTES = InlineKeyboardButtonLimit.MAX_CALLBACK_DATA - len(f"{PAGE_CURSOR_PREFIX}:o::") - 10
+SEVERITY_CALLBACK_PREFIX = 'sev'
+
+# Per-handler latency and failures, labelled by the callback's name
+HANDLER_SECONDS = metrics.REGISTRY.histogram('bot_handler_seconds', 'Bot update handler latency', ['handler'])
+HANDLER_ERRORS = metrics.REGISTRY.counter('bot_handler_errors_total', 'Bot update handlers that raised', ['handler'])
+
+
+def instrument_handler(handler) -> None:
+    """Time and profile a handler's callback, and those of a conversation's entry points, states and fallbacks"""
+    if isinstance(handler, ConversationHandler):
+        for child in handler.entry_points + handler.fallbacks + [h for hs in handler.states.values() for h in hs]:
+            instrument_handler(child)
+        return
+    name = handler.callback.__name__
+    callback = profiling.PROFILER.wrap_async(handler.callback)
+    handler.callback = metrics.timed_async(callback, HANDLER_SECONDS.labels(name), HANDLER_ERRORS.labels(name))
+
+
+def encode_page_cursor(direction: str, report_id: int, location: Union[str, int] = '') -> str:
+    """
+    Pack a keyset cursor into callback data (at most 64 bytes)
+
+    location is the search term, or a location ID (marked by an upper-case
+    direction letter). A term longer than MAX_CURSOR_LOCATION_BYTES is cut to
+    fit, and as a shorter prefix it may match more locations than it did, so
+    send_reports_page passes the ID instead whenever the term means one location.
+    """
+    letter = 'o' if direction == 'older' else 'n'
+    if isinstance(location, int):
+        return f"{PAGE_CURSOR_PREFIX}:{letter.upper()}:{report_id}:{location}"
+    data = f"{PAGE_CURSOR_PREFIX}:{letter}:{report_id}:{location}"
+    return data.encode('utf-8')[:InlineKeyboardButtonLimit.MAX_CALLBACK_DATA].decode('utf-8', 'ignore')
+
+
+def decode_page_cursor(data: str) -> Optional[Tuple[str, int, Union[str, int]]]:
+    """Unpack callback data produced by encode_page_cursor"""
+    try:
+        prefix, direction, report_id, location = data.split(':', 3)
+        if prefix != PAGE_CURSOR_PREFIX or direction.lower() not in ('o', 'n'):
+            return None
+        if direction.isupper():
+            location = int(location)
+        return ('older' if direction.lower() == 'o' else 'newer'), int(report_id), location
+    except ValueError:
+        return None
+
+
+def severity_keyboard(suggested: int) -> InlineKeyboardMarkup:
+    """One button per severity level, most severe last, marking the level suggested for the status"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(
+            severity.label(level) + (" (suggested)" if level == suggested else ""),
+            callback_data=f"{SEVERITY_CALLBACK_PREFIX}:{level}"
+        )]
+        for level in range(len(severity.LEVELS))
+    ])
+
+
+def truncate_text(text: str, limit: int) -> str:
+    """Cut text to a maximum length, marking the cut with an ellipsis"""
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def utf16_length(text: str) -> int:
+    """Length of text as Telegram measures it"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def render_location_overview(hierarchy: Optional[Dict], worst: Optional[Tuple]) -> str:
+    """
+    Render where a location sits in the hierarchy and the worst current status under it
+
+    Args:
+        hierarchy: SecurityDatabase.get_location_hierarchy result, or None
+        worst: SecurityDatabase.get_worst_status row, or None
+    """
+    text = ''
+    if hierarchy and hierarchy['ancestors']:
+        text += f"🗺 {' › '.join(hierarchy['ancestors'] + [hierarchy['location']])}\n"
+    if hierarchy and hierarchy['children']:
+        areas = hierarchy['children']
+        text += f"🏘 Includes: {', '.join(areas[:MAX_AREAS_LISTED])}"
+        text += f" and {len(areas) - MAX_AREAS_LISTED} more\n" if len(areas) > MAX_AREAS_LISTED else "\n"
+    if worst:
+        _, location, status = worst[:3]
+        text += f"⚠️ Worst current status: {severity.EMOJI[worst[6]]} {truncate_text(status, 100)} at {location}\n"
+    return text + "\n" if text else text
+
+
+def render_reports_page(title: str, rows: List[Tuple]) -> Tuple[str, int]:
+    """
+    Render report rows into one message that fits Telegram's text limit
+
+    Returns:
+        The message text and how many rows fit into it
+    """
+    message = title
+    shown = 0
+    
+    for report_id, location, status, action, reporter, timestamp, level in rows:
+        # Parse timestamp
+        try:
+            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            time_str = dt.strftime('%Y-%m-%d %H:%M')
+        except:
+            time_str = timestamp
+        
+        entry = f"**📍 {location}**\n"
+        entry += f"{severity.EMOJI[level]} Severity: {severity.LEVELS[level]}\n"
+        entry += f"🚨 Status: {truncate_text(status, MAX_REPORT_FIELD_LENGTH)}\n"
+        entry += f"💡 Action: {truncate_text(action, MAX_REPORT_FIELD_LENGTH)}\n"
+        entry += f"👤 Reported by: {reporter}\n"
+        entry += f"🕐 Time: {time_str}\n\n"
+        
+        # Leave the remaining rows for the next page rather than overflowing.
+        # Telegram counts UTF-16 code units, so emoji take two.
+        if shown and utf16_length(message + entry) > MessageLimit.MAX_TEXT_LENGTH:
+            break
+        message += entry
+        shown += 1
+    
+    return message, shown
+
 class SecurityBot:
     def __init__(self):
         self.db = SecurityDatabase(os.getenv('DATABASE_PATH', 'security_reports.db'))
         self.token = os.getenv('BOT_TOKEN')
+        startup_profile.mark('database')
         
-        # Initialize admin users from environment
-        admin_ids = os.getenv('ADMIN_USER_IDS', '').split(',')
-        for admin_id in admin_ids:
-            if admin_id.strip().isdigit():
-                self.db.add_admin(int(admin_id.strip()))
+        # Initialize admin users from environment (no writes if they already exist)
+        self.db.ensure_admins(parse_admin_ids(os.getenv('ADMIN_USER_IDS', '')))
+        startup_profile.mark('admins')
         
         # Initialize notification service
         self.notification_service = NotificationService(self.token, self.db)
         
+        # Prefix index answering inline location queries without hitting SQLite.
+        # Built on the first inline query rather than at startup.
+        self.location_index = LocationIndex()
+        
         self.application = None
-        self.user_data: Dict[int, Dict[str, Any]] = {}
-        self.admin_handlers = AdminHandlers(self.db, self.user_data)
+        
+        # In-progress conversation data survives restarts and expires when abandoned
+        self.user_data = ConversationStore(
+            self.db.db_path,
+            ttl=float(os.getenv('CONVERSATION_TTL', DEFAULT_CONVERSATION_TTL))
+        )
+        self.persistence = ConversationPersistence(self.user_data)
+        
+        # Per-user and global command throttling
+        self.flood_control = FloodControl(
+            user_rate=float(os.getenv('RATE_LIMIT_USER_RATE', 0.5)),
+            user_burst=float(os.getenv('RATE_LIMIT_USER_BURST', 5)),
+            global_rate=float(os.getenv('RATE_LIMIT_GLOBAL_RATE', 20)),
+            global_burst=float(os.getenv('RATE_LIMIT_GLOBAL_BURST', 30))
+        )
+        self.admin_handlers = AdminHandlers(self.db, self.user_data, self.flood_control, self.location_index)
+        startup_profile.mark('services')
     
     async def auto_subscribe_user(self, update: Update) -> bool:
         """Automatically subscribe users when they first interact with the bot."""
@@ -92,10 +272,16 @@ Use /app to open the modern web interface with better features!
 📊 /status - View recent security reports
 🔍 /location <area> - Get security status for specific location
 📝 /report - Submit a security report (focal people only)
+🔔 /subscribe <area> - Only get alerts for an area and the places under it
 🔕 /unsubscribe - Unsubscribe from notifications
 👥 /addfocal - Add focal person (admins only)
 📋 /listfocal - List all focal people (admins only)
 ❌ /removefocal - Remove focal person (admins only)
+⏳ /throttlestats - View flood control statistics (admins only)
+🗄 /dbstats - View the slowest database statements (admins only)
+🔬 /profile - Profile the bot's update handlers (admins only)
+🔀 /alias - Merge another spelling into a location name (admins only)
+🗺 /parent - Place a location inside a larger area (admins only)
 ℹ️ /help - Show this help message
 
 **For Best Experience:**
@@ -152,34 +338,7 @@ Use the Mini App (/app) for enhanced interface, real-time updates, and better mo
         # Auto-subscribe the user
         await self.auto_subscribe_user(update)
         
-        reports = self.db.get_latest_reports(10)
-        
-        if not reports:
-            await update.message.reply_text(
-                "📋 No security reports available at the moment."
-            )
-            return
-
-        message = "🛡️ **Latest Security Reports:**\n\n"
-        
-        for i, (location, status, action, reporter, timestamp) in enumerate(reports, 1):
-            # Parse timestamp
-            try:
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                time_str = dt.strftime('%Y-%m-%d %H:%M')
-            except:
-                time_str = timestamp
-            
-            message += f"**{i}. {location}**\n"
-            message += f"🚨 Status: {status}\n"
-            message += f"💡 Action: {action}\n"
-            message += f"👤 Reported by: {reporter}\n"
-            message += f"🕐 Time: {time_str}\n\n"
-        
-        await update.message.reply_text(
-            message,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        await self.send_reports_page(update, location='')
 
     async def location_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Show security reports for a specific location."""
@@ -193,34 +352,143 @@ Use the Mini App (/app) for enhanced interface, real-time updates, and better mo
             return
         
         location = ' '.join(context.args)
-        reports = self.db.get_reports_by_location(location, 5)
+        await self.send_reports_page(update, location=location)
+
+    async def report_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle Prev/Next buttons under a page of reports."""
+        query = update.callback_query
         
-        if not reports:
-            await update.message.reply_text(
-                f"📍 No security reports found for '{location}'"
-            )
+        cursor = decode_page_cursor(query.data)
+        if cursor is None:
+            await query.answer()
+            return
+        
+        direction, report_id, location = cursor
+        if isinstance(location, int):
+            match = self.db.get_location(location)
+            if match is None:
+                await query.answer("This location no longer exists.")
+                return
+            # The canonical name matches exactly that location again
+            location = match[1]
+        if direction == 'older':
+            await self.send_reports_page(update, location=location, before_id=report_id)
+        else:
+            await self.send_reports_page(update, location=location, after_id=report_id)
+
+    async def send_reports_page(self, update: Update, location: str,
+                                before_id: Optional[int] = None, after_id: Optional[int] = None) -> None:
+        """Render one page of reports, replying to a command or editing the message in place."""
+        rows = self.db.get_reports_page(
+            limit=REPORTS_PAGE_SIZE + 1,
+            before_id=before_id,
+            after_id=after_id,
+            location=location or None
+        )
+        
+        # One extra row tells us whether there is another page in the paging direction
+        if after_id is not None:
+            has_newer = len(rows) > REPORTS_PAGE_SIZE
+            rows = rows[-REPORTS_PAGE_SIZE:]
+            has_older = True
+        else:
+            has_older = len(rows) > REPORTS_PAGE_SIZE
+            rows = rows[:REPORTS_PAGE_SIZE]
+            has_newer = before_id is not None
+        
+        if location:
+            title = f"🛡️ **Security Reports for '{location}':**\n\n"
+            # The first page also covers the area as a whole; reports under it are listed below
+            if before_id is None and after_id is None:
+                title += render_location_overview(self.db.get_location_hierarchy(location),
+                                                  self.db.get_worst_status(location))
+            empty = f"📍 No security reports found for '{location}'"
+        else:
+            title = "🛡️ **Latest Security Reports:**\n\n"
+            empty = "📋 No security reports available at the moment."
+        
+        message, shown = render_reports_page(title, rows)
+        if shown < len(rows):
+            has_older = True
+        rows = rows[:shown]
+        
+        # A term too long for the cursor is replaced by the ID of the location it means
+        cursor_location = location
+        if len(location.encode('utf-8')) > MAX_CURSOR_LOCATION_BYTES:
+            match = self.db.get_location(location)
+            if match is not None:
+                cursor_location = match[0]
+        
+        buttons = []
+        if rows and has_newer:
+            buttons.append(InlineKeyboardButton("⬅️ Newer", callback_data=encode_page_cursor('newer', rows[0][0], cursor_location)))
+        if rows and has_older:
+            buttons.append(InlineKeyboardButton("Older ➡️", callback_data=encode_page_cursor('older', rows[-1][0], cursor_location)))
+        reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
+        
+        if update.callback_query:
+            if not rows:
+                await update.callback_query.answer("No more reports.")
+                return
+            await update.callback_query.answer()
+            try:
+                await update.callback_query.edit_message_text(
+                    message,
+                    parse_mode=ParseMode.MARKDOWN,
+                    reply_markup=reply_markup
+                )
+            except BadRequest as e:
+                # Pressing a button twice re-renders the same page
+                if 'not modified' not in str(e).lower():
+                    raise
             return
+        
+        if not rows:
+            await update.message.reply_text(empty)
+            return
+        
+        await update.message.reply_text(
+            message,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=reply_markup
+        )
 
-        message = f"🛡️ **Security Reports for '{location}':**\n\n"
+    async def inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Suggest known locations and their latest status as the user types."""
+        query = update.inline_query.query
         
-        for i, (loc, status, action, reporter, timestamp) in enumerate(reports, 1):
-            # Parse timestamp
+        # Pick up reports submitted through the Mini App at most once per refresh interval
+        self.location_index.maybe_refresh(self.db)
+        matches = self.location_index.search(query)
+        
+        results = []
+        for location, status, timestamp, level in matches:
             try:
                 dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
                 time_str = dt.strftime('%Y-%m-%d %H:%M')
             except:
                 time_str = timestamp
             
-            message += f"**{i}. {loc}**\n"
-            message += f"🚨 Status: {status}\n"
-            message += f"💡 Action: {action}\n"
-            message += f"👤 Reported by: {reporter}\n"
-            message += f"🕐 Time: {time_str}\n\n"
+            # Result IDs are capped at 64 bytes; hash the normalized name so long and
+            # non-Latin names fit and differently cased spellings share one ID
+            result_id = hashlib.blake2b(normalize_location(location).encode(), digest_size=16).hexdigest()
+            # Sent as plain text: location and status are user input and may contain Markdown
+            results.append(
+                InlineQueryResultArticle(
+                    id=result_id,
+                    title=f"📍 {location}",
+                    description=f"{severity.EMOJI[level]} {status} • 🕐 {time_str}",
+                    input_message_content=InputTextMessageContent(
+                        f"📍 {location}\n"
+                        f"{severity.EMOJI[level]} Severity: {severity.LEVELS[level]}\n"
+                        f"🚨 Status: {status}\n"
+                        f"🕐 Last report: {time_str}\n\n"
+                        f"Use /location {location} for full details"
+                    )
+                )
+            )
         
-        await update.message.reply_text(
-            message,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        await update.inline_query.answer(results, cache_time=10, is_personal=False)
 
     # Security Report Conversation Handlers
     async def start_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -239,7 +507,7 @@ Use the Mini App (/app) for enhanced interface, real-time updates, and better mo
             return ConversationHandler.END
         
         # Initialize user data
-        self.user_data[user_id] = {}
+        self.user_data.set(user_id, {})
         
         await update.message.reply_text(
             "📝 **Submit Security Report**\n\n"
@@ -260,7 +528,7 @@ Use the Mini App (/app) for enhanced interface, real-time updates, and better mo
             )
             return REPORT_LOCATION
         
-        self.user_data[user_id]['location'] = location
+        self.user_data.update(user_id, location=location)
         
         await update.message.reply_text(
             f"📍 Location: {location}\n\n"
@@ -274,10 +542,41 @@ Use the Mini App (/app) for enhanced interface, real-time updates, and better mo
         user_id = update.effective_user.id
         status = update.message.text.strip()
         
-        self.user_data[user_id]['status'] = status
+        self.user_data.update(user_id, status=status)
         
         await update.message.reply_text(
             f"🚨 Status: {status}\n\n"
+            "How severe is the situation?",
+            reply_markup=severity_keyboard(severity.classify(status))
+        )
+        
+        return REPORT_SEVERITY
+
+    async def report_severity(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """Handle the severity level picked from the keyboard, or typed as its name or number."""
+        user_id = update.effective_user.id
+        query = update.callback_query
+        
+        if query:
+            await query.answer()
+            level = severity.parse(query.data.split(':', 1)[1])
+        else:
+            level = severity.parse(update.message.text)
+        
+        if level is None:
+            await update.effective_message.reply_text(
+                "❌ Please choose a severity level with the buttons above:"
+            )
+            return REPORT_SEVERITY
+        
+        self.user_data.update(user_id, severity=level)
+        
+        if query:
+            # Drop the buttons so the choice cannot be changed after moving on
+            await query.edit_message_text(f"{query.message.text}\n\n{severity.label(level)}")
+        
+        await update.effective_message.reply_text(
+            f"{severity.label(level)}\n\n"
             "Finally, please provide the recommended action:"
         )
         
@@ -293,69 +592,97 @@ Use the Mini App (/app) for enhanced interface, real-time updates, and better mo
         reporter_name = user.full_name or user.username or f"User{user_id}"
         
         # Save the report
-        location = self.user_data[user_id]['location']
-        status = self.user_data[user_id]['status']
-        
-        success = self.db.add_security_report(
-            location=location,
-            status=status,
-            recommended_action=action,
-            reporter_id=user_id,
-            reporter_name=reporter_name
-        )
+        report_data = self.user_data.get(user_id) or {}
+        location = report_data.get('location')
+        status = report_data.get('status')
+        severity_level = report_data.get('severity')
         
-        if success:
-            # Send confirmation
-            confirmation = f"""
+        if not location or not status:
+            await update.message.reply_text(
+                "⌛ Your report session has expired. Please start again with /report."
+            )
+            self.user_data.pop(user_id)
+            return ConversationHandler.END
+        
+        # Reports started before the severity step existed have none chosen
+        if severity_level is None:
+            severity_level = severity.classify(status, action)
+        
+        # One trace per report, from the focal person's last message to the last notification
+        with tracing.TRACER.span('report.submit', source='bot', location=location, reporter_id=user_id):
+            saved = self.db.add_security_report(
+                location=location,
+                status=status,
+                recommended_action=action,
+                reporter_id=user_id,
+                reporter_name=reporter_name,
+                severity_level=severity_level,
+                # Telegram redelivers an update it thinks went unanswered; its message is the same
+                idempotency_key=f"telegram:{update.message.chat_id}:{update.message.message_id}"
+            )
+        
+            if saved and not saved[1]:
+                await update.message.reply_text(
+                    "ℹ️ You already submitted this report, so subscribers were not alerted again. "
+                    f"Use /location {location} to see it."
+                )
+            elif saved:
+                self.location_index.add(location, status, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                                        severity_level)
+            
+                # Send confirmation
+                confirmation = f"""
 ✅ **Security Report Submitted Successfully!**
 
 📍 **Location:** {location}
+{severity.EMOJI[severity_level]} **Severity:** {severity.LEVELS[severity_level]}
 🚨 **Status:** {status}
 💡 **Recommended Action:** {action}
 👤 **Reporter:** {reporter_name}
 🕐 **Time:** {datetime.now().strftime('%Y-%m-%d %H:%M')}
 
 The report has been added to the database and is now visible to all group members.
-            """
+                """
             
-            await update.message.reply_text(
-                confirmation,
-                parse_mode=ParseMode.MARKDOWN
-            )
-            
-            # Send push notifications to subscribers and admins
-            try:
-                # Send to all subscribers
-                notification_result = await self.notification_service.send_security_alert(
-                    location=location,
-                    status=status,
-                    recommended_action=action,
-                    reporter_name=reporter_name
+                await update.message.reply_text(
+                    confirmation,
+                    parse_mode=ParseMode.MARKDOWN
                 )
+            
+                # Send push notifications to subscribers and admins
+                try:
+                    # Send to all subscribers
+                    notification_result = await self.notification_service.send_security_alert(
+                        location=location,
+                        status=status,
+                        recommended_action=action,
+                        reporter_name=reporter_name,
+                        severity_level=severity_level
+                    )
                 
-                # Send to admins
-                admin_result = await self.notification_service.send_admin_alert(
-                    location=location,
-                    status=status,
-                    recommended_action=action,
-                    reporter_name=reporter_name,
-                    reporter_id=user_id
-                )
+                    # Send to admins
+                    admin_result = await self.notification_service.send_admin_alert(
+                        location=location,
+                        status=status,
+                        recommended_action=action,
+                        reporter_name=reporter_name,
+                        reporter_id=user_id,
+                        severity_level=severity_level
+                    )
                 
-                logger.info(
-                    f"Notifications sent: {notification_result['success']} subscribers, "
-                    f"{admin_result['success']} admins"
+                    logger.info(
+                        f"Notifications sent: {notification_result['success']} subscribers, "
+                        f"{admin_result['success']} admins"
+                    )
+                except Exception as e:
+                    logger.error(f"Error sending notifications: {e}")
+            else:
+                await update.message.reply_text(
+                    "❌ There was an error saving your report. Please try again later."
                 )
-            except Exception as e:
-                logger.error(f"Error sending notifications: {e}")
-        else:
-            await update.message.reply_text(
-                "❌ There was an error saving your report. Please try again later."
-            )
         
         # Clear user data
-        if user_id in self.user_data:
-            del self.user_data[user_id]
+        self.user_data.pop(user_id)
         
         return ConversationHandler.END
 
@@ -364,8 +691,7 @@ The report has been added to the database and is now visible to all group member
         user_id = update.effective_user.id
         
         # Clear user data
-        if user_id in self.user_data:
-            del self.user_data[user_id]
+        self.user_data.pop(user_id)
         
         await update.message.reply_text(
             "❌ Security report submission cancelled."
@@ -379,13 +705,36 @@ The report has been added to the database and is now visible to all group member
         user = update.effective_user
         user_name = user.full_name or user.username or f"User{user_id}"
         
+        # /subscribe <area> limits alerts to that area and everything under it
+        if context.args:
+            area = ' '.join(context.args)
+            name = self.db.add_subscriber_area(user_id, area)
+            if name is None:
+                await update.message.reply_text(
+                    f"❌ No location is called '{area}'. Use /location to look up area names."
+                )
+                return
+            if not self.db.is_subscriber(user_id):
+                self.db.add_subscriber(user_id, user_name)
+            await update.message.reply_text(
+                f"🔔 You will now get alerts for {name} and every place under it.\n\n"
+                f"📍 Your alert areas: {', '.join(self.db.get_subscriber_areas(user_id))}\n\n"
+                "Use /unsubscribe <area> to drop an area, or /unsubscribe to stop all alerts."
+            )
+            return
+        
         # Check if already subscribed
         if self.db.is_subscriber(user_id):
+            areas = self.db.get_subscriber_areas(user_id)
+            if areas:
+                coverage = f"You receive alerts for reports in: {', '.join(areas)}.\n\n"
+            else:
+                coverage = "You will receive push notifications whenever a new security report is submitted.\n\n"
             await update.message.reply_text(
                 "✅ You are already subscribed to security alerts!\n\n"
                 "📱 All bot users are automatically subscribed to receive security notifications.\n\n"
-                "You will receive push notifications whenever a new security report is submitted.\n\n"
-                "Use /unsubscribe to stop receiving notifications."
+                f"{coverage}"
+                "Use /subscribe <area> to only hear about an area, or /unsubscribe to stop receiving notifications."
             )
             return
         
@@ -419,6 +768,20 @@ The report has been added to the database and is now visible to all group member
         """Unsubscribe from security alert notifications."""
         user_id = update.effective_user.id
         
+        # /unsubscribe <area> drops one alert area and keeps the subscription
+        if context.args:
+            area = ' '.join(context.args)
+            if not self.db.remove_subscriber_area(user_id, area):
+                await update.message.reply_text(f"❌ '{area}' is not one of your alert areas.")
+                return
+            areas = self.db.get_subscriber_areas(user_id)
+            if areas:
+                remaining = f"📍 Your alert areas: {', '.join(areas)}"
+            else:
+                remaining = "You have no alert areas left, so you will get alerts for every location again."
+            await update.message.reply_text(f"🔕 Stopped alerts for '{area}'.\n\n{remaining}")
+            return
+        
         # Check if subscribed
         if not self.db.is_subscriber(user_id):
             await update.message.reply_text(
@@ -443,12 +806,17 @@ The report has been added to the database and is now visible to all group member
 
     def setup_handlers(self):
         """Set up all command and message handlers."""
+        # Flood control runs before every other handler group
+        self.application.add_handler(TypeHandler(Update, self.flood_control.check), group=-1)
+        
         # Basic commands
         self.application.add_handler(CommandHandler("start", self.start))
         self.application.add_handler(CommandHandler("app", self.app_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("status", self.status_command))
         self.application.add_handler(CommandHandler("location", self.location_command))
+        self.application.add_handler(InlineQueryHandler(self.inline_query))
+        self.application.add_handler(CallbackQueryHandler(self.report_page_callback, pattern=f"^{PAGE_CURSOR_PREFIX}:"))
         
         # Subscription commands
         self.application.add_handler(CommandHandler("subscribe", self.subscribe_command))
@@ -460,15 +828,26 @@ The report has been added to the database and is now visible to all group member
             states={
                 REPORT_LOCATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.report_location)],
                 REPORT_STATUS: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.report_status)],
+                REPORT_SEVERITY: [
+                    CallbackQueryHandler(self.report_severity, pattern=f"^{SEVERITY_CALLBACK_PREFIX}:"),
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, self.report_severity),
+                ],
                 REPORT_ACTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.report_action)],
             },
             fallbacks=[CommandHandler("cancel", self.cancel_report)],
+            name="report_conversation",
+            persistent=True,
         )
         
         self.application.add_handler(report_conv_handler)
         
         # Admin commands
         self.application.add_handler(CommandHandler("listfocal", self.admin_handlers.list_focal))
+        self.application.add_handler(CommandHandler("throttlestats", self.admin_handlers.throttle_stats))
+        self.application.add_handler(CommandHandler("dbstats", self.admin_handlers.db_stats))
+        self.application.add_handler(CommandHandler("profile", self.admin_handlers.profile))
+        self.application.add_handler(CommandHandler("alias", self.admin_handlers.alias))
+        self.application.add_handler(CommandHandler("parent", self.admin_handlers.parent))
         
         # Add focal person conversation
         add_focal_conv_handler = ConversationHandler(
@@ -478,6 +857,8 @@ The report has been added to the database and is now visible to all group member
                 ADD_FOCAL_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.admin_handlers.add_focal_name)],
             },
             fallbacks=[CommandHandler("cancel", self.admin_handlers.cancel_admin_action)],
+            name="add_focal_conversation",
+            persistent=True,
         )
         
         self.application.add_handler(add_focal_conv_handler)
@@ -489,9 +870,17 @@ The report has been added to the database and is now visible to all group member
                 REMOVE_FOCAL_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.admin_handlers.remove_focal_id)],
             },
             fallbacks=[CommandHandler("cancel", self.admin_handlers.cancel_admin_action)],
+            name="remove_focal_conversation",
+            persistent=True,
         )
         
         self.application.add_handler(remove_focal_conv_handler)
+        
+        # Flood control (group -1) stops updates by raising, so only the handlers proper are timed
+        for group, handlers in self.application.handlers.items():
+            if group >= 0:
+                for handler in handlers:
+                    instrument_handler(handler)
 
     def run(self):
         """Start the bot."""
@@ -500,10 +889,24 @@ The report has been added to the database and is now visible to all group member
             return
         
         # Create the Application
-        self.application = Application.builder().token(self.token).build()
+        self.application = (
+            Application.builder()
+            .token(self.token)
+            .persistence(self.persistence)
+            .build()
+        )
         
         # Set up handlers
         self.setup_handlers()
+        startup_profile.mark('handlers')
+        
+        logger.info(startup_profile.summary())
+        
+        # The bot has no web server of its own; expose its metrics on a side port when asked
+        metrics_port = os.getenv('METRICS_PORT')
+        if metrics_port:
+            metrics.start_http_server(int(metrics_port))
+            logger.info(f"Serving metrics on port {metrics_port} at /metrics")
         
         logger.info("Starting Security Status Bot...")
         
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Bulk import and export of focal people and subscribers as CSV or JSONL
+
+Usage:
+    python bulk_io.py import focal-people reporters.csv [--added-by 994550828]
+    python bulk_io.py import subscribers subscribers.jsonl
+    python bulk_io.py export focal-people [--output reporters.csv] [--format csv|jsonl]
+
+Imports need a user_id and name per row (telegram_user_id is accepted for
+user_id). Valid rows are upserted in chunked transactions; invalid rows are
+reported with their line number and skipped. Both directions stream, so
+neither the file nor the table is held in memory.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+FORMATS = ('csv', 'jsonl')
+
+# Column order of exports, matching the API's field names
+EXPORT_FIELDS = {
+    'focal_people': ['user_id', 'name', 'added_date'],
+    'subscribers': ['user_id', 'name', 'subscribed_date'],
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Rows written per transaction, and rows read per export query
+DEFAULT_CHUNK_SIZE = 500
+
+# Per-row errors listed in an import summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+MAX_NAME_LENGTH = 100
+
+# Same rule as POST /api/admin/focal-people and /addfocal
+_FOCAL_PERSON_NAME = re.compile(r'^[a-zA-Z\s]+$')
+
+
+def detect_format(hint: Optional[str]) -> Optional[str]:
+    """'csv' or 'jsonl' from a file name or content type, or None if it names neither"""
+    hint = (hint or '').lower()
+    if hint.endswith('.csv') or 'csv' in hint:
+        return 'csv'
+    if hint.endswith(('.jsonl', '.ndjson')) or 'ndjson' in hint or 'jsonl' in hint:
+        return 'jsonl'
+    return None
+
+
+def text_lines(binary_stream) -> io.TextIOWrapper:
+    """Decode an uploaded byte stream line by line, dropping a spreadsheet's UTF-8 BOM"""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """Yield (line number, record, error) for each row; exactly one of record and error is set"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        while True:
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield reader.line_num, None, f"Malformed CSV: {e}"
+                continue
+            yield reader.line_num, record, None
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Malformed JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, record, None
+
+
+def validate_record(roster: str, record: Dict[str, Any]) -> Tuple[Optional[Tuple[int, str]], Optional[str]]:
+    """((user_id, name), None) for a valid record, else (None, error)"""
+    user_id = record.get('user_id', record.get('telegram_user_id'))
+    try:
+        user_id = int(str(user_id).strip())
+    except (TypeError, ValueError):
+        return None, "user_id must be a number"
+    if user_id <= 0:
+        return None, "user_id must be positive"
+
+    name = record.get('name')
+    name = name.strip() if isinstance(name, str) else ''
+    if not name:
+        return None, "name is required"
+    if len(name) > MAX_NAME_LENGTH:
+        return None, f"name is longer than {MAX_NAME_LENGTH} characters"
+    if roster == 'focal_people' and not _FOCAL_PERSON_NAME.match(name):
+        return None, "name must contain only letters and spaces"
+    return (user_id, name), None
+
+
+def import_roster(db, roster: str, lines: Iterable[str], fmt: str, added_by: int = 0,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Validate rows and upsert them into focal_people or subscribers
+
+    Each chunk of valid rows is written with one executemany in its own
+    transaction, so a failed chunk does not undo the ones before it.
+
+    Returns:
+        dict with rows read, rows imported, rows failed and the first
+        MAX_REPORTED_ERRORS errors as {'line', 'error'}
+    """
+    summary = {'rows': 0, 'imported': 0, 'failed': 0, 'errors': []}
+
+    def fail(line_number, error):
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line_number, 'error': error})
+
+    def flush(chunk):
+        if roster == 'focal_people':
+            saved = db.upsert_focal_people([row for _, row in chunk], added_by)
+        else:
+            saved = db.upsert_subscribers([row for _, row in chunk])
+        if saved:
+            summary['imported'] += len(chunk)
+        else:
+            for line_number, _ in chunk:
+                fail(line_number, "Could not be saved")
+
+    chunk: List[Tuple[int, Tuple[int, str]]] = []
+    for line_number, record, error in read_records(lines, fmt):
+        summary['rows'] += 1
+        if record is not None:
+            row, error = validate_record(roster, record)
+        if error is not None:
+            fail(line_number, error)
+            continue
+        chunk.append((line_number, row))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return summary
+
+
+def export_roster(db, roster: str, fmt: str, batch_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Yield an export of active focal people or subscribers, one batch of rows per chunk"""
+    fields = EXPORT_FIELDS[roster]
+    batches = db.iter_focal_people(batch_size) if roster == 'focal_people' else db.iter_subscribers(batch_size)
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(fields)
+        yield buffer.getvalue()
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    else:
+        for rows in batches:
+            yield ''.join(json.dumps(dict(zip(fields, row)), ensure_ascii=False) + '\n' for row in rows)
+
+
+def main():
+    from dotenv import load_dotenv
+    from database import SecurityDatabase, parse_admin_ids
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', 'security_reports.db'), help='database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importer = commands.add_parser('import', help='import rows from a CSV or JSONL file')
+    importer.add_argument('roster', choices=['focal-people', 'subscribers'])
+    importer.add_argument('file', help="file to import, or - for stdin")
+    importer.add_argument('--format', choices=FORMATS, help='defaults to the file extension')
+    importer.add_argument('--added-by', type=int, help='admin recorded as adding new focal people '
+                                                       '(default: first of ADMIN_USER_IDS)')
+    importer.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='rows per transaction')
+
+    exporter = commands.add_parser('export', help='export active rows as CSV or JSONL')
+    exporter.add_argument('roster', choices=['focal-people', 'subscribers'])
+    exporter.add_argument('--output', help='file to write (default: stdout)')
+    exporter.add_argument('--format', choices=FORMATS, help='defaults to the output extension, else csv')
+
+    args = parser.parse_args()
+    roster = args.roster.replace('-', '_')
+
+    if args.command == 'import':
+        fmt = args.format or detect_format(args.file)
+        if fmt is None:
+            parser.error('cannot tell the format from the file name; pass --format')
+        db = SecurityDatabase(args.db)
+        added_by = args.added_by
+        if added_by is None:
+            admin_ids = parse_admin_ids(os.getenv('ADMIN_USER_IDS', ''))
+            added_by = admin_ids[0] if admin_ids else 0
+
+        if args.file == '-':
+            summary = import_roster(db, roster, text_lines(sys.stdin.buffer), fmt, added_by, args.chunk_size)
+        else:
+            with open(args.file, 'rb') as f:
+                summary = import_roster(db, roster, text_lines(f), fmt, added_by, args.chunk_size)
+
+        print(f"Imported {summary['imported']} of {summary['rows']} rows into {roster}")
+        for error in summary['errors']:
+            print(f"  line {error['line']}: {error['error']}", file=sys.stderr)
+        if summary['failed'] > len(summary['errors']):
+            print(f"  ... and {summary['failed'] - len(summary['errors'])} more errors", file=sys.stderr)
+        sys.exit(1 if summary['failed'] else 0)
+
+    fmt = args.format or detect_format(args.output) or 'csv'
+    db = SecurityDatabase(args.db)
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for chunk in export_roster(db, roster, fmt):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+# Abandoned /report or /addfocal conversations are dropped after this many seconds
+DEFAULT_CONVERSATION_TTL = 3600
+
+# Pending writes are flushed once this many entries are dirty or this many seconds have passed
+DEFAULT_FLUSH_THRESHOLD = 50
+DEFAULT_FLUSH_INTERVAL = 10
+
+
+class ConversationStore:
+    """SQLite-backed store for in-progress conversation data, keyed by Telegram user ID.
+
+    Entries live in memory for fast access and are written back in bulk. Each entry
+    is stored as a single compact JSON blob together with its last-touched time so
+    stale entries can be evicted with one indexed DELETE.
+    """
+
+    def __init__(self, db_path: str = "security_reports.db",
+                 ttl: float = DEFAULT_CONVERSATION_TTL,
+                 flush_threshold: int = DEFAULT_FLUSH_THRESHOLD,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+
+        self._entries: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self._dirty: Set[int] = set()
+        self._deleted: Set[int] = set()
+        self._last_flush = time.monotonic()
+
+        self.init_tables()
+        self.load()
+
+    def init_tables(self):
+        """Create the conversation state table if it doesn't exist"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_state (
+                    user_id INTEGER PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_conversation_state_updated
+                ON conversation_state (updated_at)
+            ''')
+            conn.commit()
+
+    def load(self):
+        """Load all non-expired entries from the database into memory"""
+        cutoff = time.time() - self.ttl
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM conversation_state WHERE updated_at < ?', (cutoff,))
+            cursor.execute('SELECT user_id, data, updated_at FROM conversation_state')
+            rows = cursor.fetchall()
+            conn.commit()
+
+        self._entries = {
+            user_id: (updated_at, json.loads(data))
+            for user_id, data, updated_at in rows
+        }
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.get(user_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get the conversation data for a user, or None if missing or expired"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        updated_at, data = entry
+        if updated_at < time.time() - self.ttl:
+            self.pop(user_id)
+            return None
+        return data
+
+    def set(self, user_id: int, data: Dict[str, Any]):
+        """Replace the conversation data for a user"""
+        self._entries[user_id] = (time.time(), dict(data))
+        self._deleted.discard(user_id)
+        self._dirty.add(user_id)
+        self._maybe_flush()
+
+    def update(self, user_id: int, **fields: Any) -> Dict[str, Any]:
+        """Merge fields into the conversation data for a user, creating it if needed"""
+        data = dict(self.get(user_id) or {})
+        data.update(fields)
+        self.set(user_id, data)
+        return data
+
+    def pop(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Remove and return the conversation data for a user"""
+        entry = self._entries.pop(user_id, None)
+        self._dirty.discard(user_id)
+        self._deleted.add(user_id)
+        self._maybe_flush()
+        return entry[1] if entry else None
+
+    def evict_expired(self) -> int:
+        """Drop entries that haven't been touched within the TTL"""
+        cutoff = time.time() - self.ttl
+        expired = [user_id for user_id, (updated_at, _) in self._entries.items() if updated_at < cutoff]
+        for user_id in expired:
+            del self._entries[user_id]
+            self._dirty.discard(user_id)
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM conversation_state WHERE updated_at < ?', (cutoff,))
+                conn.commit()
+        except Exception as e:
+            print(f"Error evicting conversation state: {e}")
+
+        return len(expired)
+
+    def flush(self) -> bool:
+        """Write all pending changes to the database in a single transaction"""
+        upserts = [
+            (user_id, json.dumps(self._entries[user_id][1], separators=(',', ':')), self._entries[user_id][0])
+            for user_id in self._dirty if user_id in self._entries
+        ]
+        deletes = [(user_id,) for user_id in self._deleted]
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                if upserts:
+                    cursor.executemany('''
+                        INSERT OR REPLACE INTO conversation_state (user_id, data, updated_at)
+                        VALUES (?, ?, ?)
+                    ''', upserts)
+                if deletes:
+                    cursor.executemany('DELETE FROM conversation_state WHERE user_id = ?', deletes)
+                conn.commit()
+        except Exception as e:
+            print(f"Error flushing conversation state: {e}")
+            return False
+
+        self._dirty.clear()
+        self._deleted.clear()
+        self._last_flush = time.monotonic()
+        return True
+
+    def _maybe_flush(self):
+        """Flush if enough changes are pending or the flush interval has passed"""
+        pending = len(self._dirty) + len(self._deleted)
+        if pending >= self.flush_threshold or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.evict_expired()
+            self.flush()
+
+
+class ConversationPersistence(BasePersistence):
+    """Persistence adapter that keeps ConversationHandler states in SQLite.
+
+    Only conversation states are persisted; user, chat and bot data are handled by
+    ConversationStore. States older than the store's TTL are discarded on load.
+    """
+
+    def __init__(self, store: ConversationStore, update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=False, callback_data=False),
+            update_interval=update_interval
+        )
+        self.store = store
+        self.init_tables()
+
+    def init_tables(self):
+        """Create the conversation handler state table if it doesn't exist"""
+        with sqlite3.connect(self.store.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_handlers (
+                    name TEXT NOT NULL,
+                    conv_key TEXT NOT NULL,
+                    state INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (name, conv_key)
+                ) WITHOUT ROWID
+            ''')
+            conn.commit()
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        """Load the non-expired states for one ConversationHandler"""
+        cutoff = time.time() - self.store.ttl
+        with sqlite3.connect(self.store.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM conversation_handlers
+                WHERE name = ? AND updated_at < ?
+            ''', (name, cutoff))
+            cursor.execute('''
+                SELECT conv_key, state FROM conversation_handlers
+                WHERE name = ?
+            ''', (name,))
+            rows = cursor.fetchall()
+            conn.commit()
+        return {tuple(json.loads(conv_key)): state for conv_key, state in rows}
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        """Store or clear the state of one conversation"""
+        conv_key = json.dumps(list(key), separators=(',', ':'))
+        with sqlite3.connect(self.store.db_path) as conn:
+            cursor = conn.cursor()
+            if new_state is None:
+                cursor.execute('''
+                    DELETE FROM conversation_handlers
+                    WHERE name = ? AND conv_key = ?
+                ''', (name, conv_key))
+            else:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO conversation_handlers (name, conv_key, state, updated_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (name, conv_key, new_state, time.time()))
+            conn.commit()
+
+        # Keep conversation data in step with the persisted state
+        self.store.flush()
+
+    async def flush(self) -> None:
+        """Write out any pending conversation data on shutdown"""
+        self.store.flush()
+
+    # User, chat, bot and callback data are not persisted by this adapter
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Seconds after which the counters are re-read even though the files look unchanged.
+# A write changes the database or WAL stamp, so this only matters where that misses it.
+MAX_STALE_SECONDS = float(os.getenv('DATA_VERSION_MAX_STALE', 30))
+
+
+class DataVersions:
+    """Cheap, cross-process change detection for the versioned tables.
+
+    Triggers bump a generation counter in data_generations on every write, from any
+    process. The counters are cached here and only re-read when the database file or
+    its WAL changed on disk, or after max_stale seconds as a backstop for filesystems
+    with coarse timestamps. Most lookups are two stat() calls and no query.
+    """
+
+    def __init__(self, database, max_stale: float = MAX_STALE_SECONDS):
+        self.db = database
+        self.max_stale = max_stale
+
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple] = None
+        self._read_at = 0.0
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._memo: Dict[str, Tuple[int, Any]] = {}
+
+    def _file_stamp(self) -> Tuple:
+        """Modification time and size of the database and its WAL file"""
+        stamp = []
+        for path in (self.db.db_path, self.db.db_path + '-wal'):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _current(self) -> Dict[str, Tuple[int, float]]:
+        stamp = self._file_stamp()
+        now = time.monotonic()
+        if stamp != self._stamp or now - self._read_at >= self.max_stale:
+            generations = self.db.get_data_generations()
+            with self._lock:
+                self._generations = generations
+                self._stamp = stamp
+                self._read_at = now
+        return self._generations
+
+    def generation(self, name: str) -> int:
+        """Current generation counter of a versioned table"""
+        return self._current().get(name, (0, 0.0))[0]
+
+    def last_modified(self, name: str) -> float:
+        """Unix time of the last write to a versioned table"""
+        return self._current().get(name, (0, 0.0))[1]
+
+    def cached(self, name: str, loader: Callable[[], Any]) -> Any:
+        """Return loader() memoized until the named table's generation changes"""
+        generation = self.generation(name)
+        memo = self._memo.get(name)
+        if memo is not None and memo[0] == generation:
+            return memo[1]
+
+        value = loader()
+        self._memo[name] = (generation, value)
+        return value
@@ -1,18 +1,69 @@
+import hashlib
 import sqlite3
 import os
+import re
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
+import metrics
+import query_log
+import severity
+from location_index import normalize_location
+
+# Bump whenever init_database changes the schema, so existing databases pick it up
+SCHEMA_VERSION = 8
+
+# Tables whose writes bump a generation counter in data_generations
+VERSIONED_TABLES = {
+    'reports': 'security_reports',
+    'focal_people': 'focal_people',
+    'admins': 'admins',
+}
+
+def parse_admin_ids(value: str) -> List[int]:
+    """Parse a comma-separated ADMIN_USER_IDS value, ignoring blanks and junk"""
+    return [int(part.strip()) for part in value.split(',') if part.strip().isdigit()]
+
+def tidy_location_name(name: str) -> str:
+    """A location name as shown: trimmed, with runs of whitespace collapsed ("  Bole   Road " -> "Bole Road")"""
+    return ' '.join(name.split())
+
+# A report repeating one its reporter sent this recently is not saved again
+DUPLICATE_WINDOW_MINUTES = 10
+
+def report_content_hash(reporter_id: int, location_id: int, status: str, recommended_action: str) -> int:
+    """64-bit hash of who reported what where, ignoring case, punctuation and spacing in the text"""
+    words = [' '.join(re.findall(r'\w+', text.casefold())) for text in (status, recommended_action)]
+    content = '\x1f'.join([str(reporter_id), str(location_id)] + words)
+    return int.from_bytes(hashlib.blake2b(content.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+# Latency of every public SecurityDatabase call, labelled by method
+DB_QUERY_SECONDS = metrics.REGISTRY.histogram('db_query_seconds', 'SecurityDatabase call latency', ['method'])
+
+# Per-method totals since startup; calls over SLOW_QUERY_MS are logged with their query plans
+QUERY_LOG = query_log.QueryLog(threshold_ms=float(os.getenv('SLOW_QUERY_MS', 100)))
+
+@query_log.instrument(QUERY_LOG, DB_QUERY_SECONDS, exclude=('iter_focal_people', 'iter_subscribers'))
 class SecurityDatabase:
     def __init__(self, db_path: str = "security_reports.db"):
         self.db_path = db_path
+        self.query_log = QUERY_LOG
         self.init_database()
+
+    def _connect(self, timeout: float = 5.0) -> sqlite3.Connection:
+        """Open a connection whose statements and rows count towards the running method"""
+        return sqlite3.connect(self.db_path, timeout=timeout, factory=query_log.InstrumentedConnection)
     
     def init_database(self):
         """Initialize the database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
+            # Skip the DDL entirely when the schema is already current
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] >= SCHEMA_VERSION:
+                return
+            
             # Create security reports table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS security_reports (
@@ -59,28 +110,585 @@ class SecurityDatabase:
                 )
             ''')
             
+            # Canonical locations; each report points at one. location_aliases maps every
+            # normalized spelling (the canonical one included) to its location, so
+            # "Bole", "bole " and "BOLE" are one place and a lookup is one indexed match
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS locations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    normalized_key TEXT UNIQUE NOT NULL,
+                    created_date DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS location_aliases (
+                    normalized_key TEXT PRIMARY KEY,
+                    location_id INTEGER NOT NULL REFERENCES locations(id)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('PRAGMA table_info(security_reports)')
+            if 'location_id' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE security_reports ADD COLUMN location_id INTEGER REFERENCES locations(id)')
+            # Per-location pages read this newest first
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_security_reports_location_id
+                ON security_reports (location_id, id)
+            ''')
+            
+            # Severity level (severity.py), chosen by the reporter; older reports get
+            # one from the keyword classifier
+            cursor.execute('PRAGMA table_info(security_reports)')
+            report_columns = [row[1] for row in cursor.fetchall()]
+            if 'severity' not in report_columns:
+                cursor.execute('ALTER TABLE security_reports ADD COLUMN severity INTEGER')
+            conn.create_function('classify_severity', 2, severity.classify, deterministic=True)
+            cursor.execute('''
+                UPDATE security_reports SET severity = classify_severity(status, recommended_action)
+                WHERE severity IS NULL
+            ''')
+            # Severity filters read each level newest first
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_security_reports_severity
+                ON security_reports (severity, id)
+            ''')
+            
+            # Duplicate detection (add_security_report): a hash of each report's content,
+            # and the idempotency key a client sent it with. Older reports have neither,
+            # so the indexes only hold reports that can still be matched.
+            if 'content_hash' not in report_columns:
+                cursor.execute('ALTER TABLE security_reports ADD COLUMN content_hash INTEGER')
+            if 'idempotency_key' not in report_columns:
+                cursor.execute('ALTER TABLE security_reports ADD COLUMN idempotency_key TEXT')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_security_reports_content_hash
+                ON security_reports (content_hash, id)
+                WHERE content_hash IS NOT NULL
+            ''')
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_security_reports_idempotency_key
+                ON security_reports (reporter_id, idempotency_key)
+                WHERE idempotency_key IS NOT NULL
+            ''')
+            
+            # Closure table of the location hierarchy (region > city > area): one row per
+            # ancestor of every location, itself included at depth 0, so everything
+            # under a place is one indexed range rather than a recursive walk
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS location_tree (
+                    ancestor_id INTEGER NOT NULL REFERENCES locations(id),
+                    descendant_id INTEGER NOT NULL REFERENCES locations(id),
+                    depth INTEGER NOT NULL,
+                    PRIMARY KEY (ancestor_id, descendant_id)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_location_tree_descendant
+                ON location_tree (descendant_id, depth)
+            ''')
+            cursor.execute('''
+                INSERT OR IGNORE INTO location_tree (ancestor_id, descendant_id, depth)
+                SELECT id, id, 0 FROM locations
+            ''')
+            
+            # Areas a subscriber limited their alerts to; none means every alert
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS subscriber_areas (
+                    telegram_user_id INTEGER NOT NULL,
+                    location_id INTEGER NOT NULL REFERENCES locations(id),
+                    PRIMARY KEY (telegram_user_id, location_id)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_subscriber_areas_location
+                ON subscriber_areas (location_id)
+            ''')
+            
+            # Per-table generation counters, bumped by triggers on every write so any
+            # process can cheaply tell whether data changed (used for HTTP ETags)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS data_generations (
+                    name TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            
+            for name, table in VERSIONED_TABLES.items():
+                cursor.execute('''
+                    INSERT OR IGNORE INTO data_generations (name, generation, updated_at)
+                    VALUES (?, 0, (julianday('now') - 2440587.5) * 86400.0)
+                ''', (name,))
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS bump_{table}_{event.lower()}
+                        AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE data_generations
+                            SET generation = generation + 1,
+                                updated_at = (julianday('now') - 2440587.5) * 86400.0
+                            WHERE name = '{name}';
+                        END
+                    ''')
+            # Which reports a location query returns also depends on these
+            for table in ('location_aliases', 'location_tree'):
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS bump_{table}_{event.lower()}
+                        AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE data_generations
+                            SET generation = generation + 1,
+                                updated_at = (julianday('now') - 2440587.5) * 86400.0
+                            WHERE name = 'reports';
+                        END
+                    ''')
+            
+            # Tombstones for reports that were deactivated or deleted, so delta sync
+            # clients can drop them; seq is the removal high-water mark
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS report_removals (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    report_id INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS record_security_reports_deactivation
+                AFTER UPDATE OF is_active ON security_reports
+                WHEN OLD.is_active = 1 AND NEW.is_active = 0
+                BEGIN
+                    INSERT INTO report_removals (report_id) VALUES (OLD.id);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS record_security_reports_deletion
+                AFTER DELETE ON security_reports
+                WHEN OLD.is_active = 1
+                BEGIN
+                    INSERT INTO report_removals (report_id) VALUES (OLD.id);
+                END
+            ''')
+            
+            # Full-text index over active reports for /api/search; external content,
+            # so only the index is stored. Prefix indexes keep search-as-you-type fast.
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'reports_fts'")
+            fts_exists = cursor.fetchone() is not None
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+                    location, status, recommended_action,
+                    content='security_reports', content_rowid='id', prefix='2 3'
+                )
+            ''')
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts_vocab USING fts5vocab(reports_fts, 'col')
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS index_security_reports_insert
+                AFTER INSERT ON security_reports
+                WHEN NEW.is_active = 1
+                BEGIN
+                    INSERT INTO reports_fts (rowid, location, status, recommended_action)
+                    VALUES (NEW.id, NEW.location, NEW.status, NEW.recommended_action);
+                END
+            ''')
+            # One trigger, so the old entry is always removed before the new one is added.
+            # Only indexed columns and is_active count: linking locations must not re-index.
+            cursor.execute('DROP TRIGGER IF EXISTS index_security_reports_update')
+            cursor.execute('''
+                CREATE TRIGGER index_security_reports_update
+                AFTER UPDATE OF location, status, recommended_action, is_active ON security_reports
+                BEGIN
+                    INSERT INTO reports_fts (reports_fts, rowid, location, status, recommended_action)
+                    SELECT 'delete', OLD.id, OLD.location, OLD.status, OLD.recommended_action
+                    WHERE OLD.is_active = 1;
+                    INSERT INTO reports_fts (rowid, location, status, recommended_action)
+                    SELECT NEW.id, NEW.location, NEW.status, NEW.recommended_action
+                    WHERE NEW.is_active = 1;
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS index_security_reports_delete
+                AFTER DELETE ON security_reports
+                WHEN OLD.is_active = 1
+                BEGIN
+                    INSERT INTO reports_fts (reports_fts, rowid, location, status, recommended_action)
+                    VALUES ('delete', OLD.id, OLD.location, OLD.status, OLD.recommended_action);
+                END
+            ''')
+            if not fts_exists:
+                cursor.execute('''
+                    INSERT INTO reports_fts (rowid, location, status, recommended_action)
+                    SELECT id, location, status, recommended_action
+                    FROM security_reports
+                    WHERE is_active = 1
+                ''')
+            
+            # Backfill: reports from before the locations table get theirs now
+            self._link_report_locations(cursor)
+            
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
             conn.commit()
     
+    def _resolve_location(self, cursor, name: str) -> Tuple[int, str]:
+        """(location ID, canonical name) for a spelling, creating the location if it is new"""
+        key = normalize_location(name)
+        cursor.execute('''
+            SELECT l.id, l.name
+            FROM location_aliases a
+            JOIN locations l ON l.id = a.location_id
+            WHERE a.normalized_key = ?
+        ''', (key,))
+        row = cursor.fetchone()
+        if row is not None:
+            return row
+        
+        # OR IGNORE: another process may have created it since the lookup
+        cursor.execute('''
+            INSERT OR IGNORE INTO locations (name, normalized_key) VALUES (?, ?)
+        ''', (tidy_location_name(name), key))
+        cursor.execute('SELECT id, name FROM locations WHERE normalized_key = ?', (key,))
+        location_id, canonical = cursor.fetchone()
+        cursor.execute('''
+            INSERT OR IGNORE INTO location_aliases (normalized_key, location_id) VALUES (?, ?)
+        ''', (key, location_id))
+        cursor.execute('''
+            INSERT OR IGNORE INTO location_tree (ancestor_id, descendant_id, depth) VALUES (?, ?, 0)
+        ''', (location_id, location_id))
+        return location_id, canonical
+    
+    def _matched_location_ids(self, cursor, name: str) -> List[int]:
+        # An exact match on the normalized key wins; otherwise every location
+        # with a spelling starting with the key ("merkato" finds "Merkato Market")
+        key = normalize_location(name)
+        if not key:
+            return []
+        cursor.execute('SELECT location_id FROM location_aliases WHERE normalized_key = ?', (key,))
+        row = cursor.fetchone()
+        if row is not None:
+            return [row[0]]
+        cursor.execute('''
+            SELECT DISTINCT location_id FROM location_aliases
+            WHERE normalized_key >= ? AND normalized_key < ?
+        ''', (key, key + '\U0010ffff'))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _location_ids(self, cursor, name: str) -> List[int]:
+        """
+        IDs of the locations a searched name means, and of every location under them
+        
+        An exact match on the normalized key wins. Otherwise every location with
+        a spelling starting with the key matches ("merkato" finds "Merkato
+        Market"). Both are index lookups on location_aliases, and the areas
+        below come from one range of location_tree per match.
+        """
+        matched = self._matched_location_ids(cursor, name)
+        if not matched:
+            return []
+        cursor.execute(f'''
+            SELECT DISTINCT descendant_id FROM location_tree
+            WHERE ancestor_id IN ({', '.join('?' * len(matched))})
+        ''', matched)
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _move_location(self, cursor, location_id: int, parent_id: Optional[int]):
+        # Detach the subtree from the ancestors above it, keeping the paths inside it
+        cursor.execute('''
+            DELETE FROM location_tree
+            WHERE descendant_id IN (SELECT descendant_id FROM location_tree WHERE ancestor_id = ?)
+              AND ancestor_id NOT IN (SELECT descendant_id FROM location_tree WHERE ancestor_id = ?)
+        ''', (location_id, location_id))
+        if parent_id is None:
+            return
+        # Every ancestor of the parent (itself included) gains every node of the subtree
+        cursor.execute('''
+            INSERT INTO location_tree (ancestor_id, descendant_id, depth)
+            SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+            FROM location_tree above, location_tree below
+            WHERE above.descendant_id = ? AND below.ancestor_id = ?
+        ''', (parent_id, location_id))
+    
+    def _parent_id(self, cursor, location_id: int) -> Optional[int]:
+        cursor.execute('''
+            SELECT ancestor_id FROM location_tree WHERE descendant_id = ? AND depth = 1
+        ''', (location_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def set_location_parent(self, location: str, parent: Optional[str]) -> Optional[bool]:
+        """
+        Place location under parent in the hierarchy, or at the top level when parent is empty
+        
+        Either location is created if it is new, and the location's own areas
+        move with it. Returns False when parent is location itself or lies
+        under it, and None for an empty location name.
+        """
+        if not normalize_location(location):
+            return None
+        
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            location_id, _ = self._resolve_location(cursor, location)
+            parent_id = None
+            if parent and normalize_location(parent):
+                parent_id, _ = self._resolve_location(cursor, parent)
+                cursor.execute('''
+                    SELECT 1 FROM location_tree WHERE ancestor_id = ? AND descendant_id = ?
+                ''', (location_id, parent_id))
+                if cursor.fetchone() is not None:
+                    return False
+            if self._parent_id(cursor, location_id) != parent_id:
+                self._move_location(cursor, location_id, parent_id)
+            conn.commit()
+            return True
+    
+    def get_location(self, location: Union[str, int]) -> Optional[Tuple[int, str]]:
+        """
+        (ID, canonical name) of the one location a searched name or an ID means
+        
+        Names match as in get_reports_page. Returns None when a name matches no
+        location or several, or no location has the ID.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            if isinstance(location, int):
+                location_id = location
+            else:
+                matched = self._matched_location_ids(cursor, location)
+                if len(matched) != 1:
+                    return None
+                location_id = matched[0]
+            cursor.execute('SELECT id, name FROM locations WHERE id = ?', (location_id,))
+            return cursor.fetchone()
+    
+    def get_location_hierarchy(self, location: str) -> Optional[Dict[str, Any]]:
+        """
+        Where a location sits in the hierarchy: its canonical name, the names of
+        its ancestors from the top down and of the areas directly under it
+        
+        Only an exact match counts here; returns None for an unknown location.
+        """
+        key = normalize_location(location)
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT l.id, l.name
+                FROM location_aliases a
+                JOIN locations l ON l.id = a.location_id
+                WHERE a.normalized_key = ?
+            ''', (key,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            location_id, name = row
+            cursor.execute('''
+                SELECT l.name
+                FROM location_tree t
+                JOIN locations l ON l.id = t.ancestor_id
+                WHERE t.descendant_id = ? AND t.depth > 0
+                ORDER BY t.depth DESC
+            ''', (location_id,))
+            ancestors = [ancestor for ancestor, in cursor.fetchall()]
+            cursor.execute('''
+                SELECT l.name
+                FROM location_tree t
+                JOIN locations l ON l.id = t.descendant_id
+                WHERE t.ancestor_id = ? AND t.depth = 1
+                ORDER BY l.name
+            ''', (location_id,))
+            children = [child for child, in cursor.fetchall()]
+            return {'location': name, 'ancestors': ancestors, 'children': children}
+    
+    def get_worst_status(self, location: str) -> Optional[Tuple]:
+        """
+        The most severe current report under a location, matched as in get_reports_by_location
+        
+        Each location's current report is its newest active one, ranked by
+        severity level with ties going to the newest. Returns (id, location,
+        status, recommended_action, reporter_name, timestamp, severity), or
+        None when nothing is reported there.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            location_ids = self._location_ids(cursor, location)
+            cursor.execute(f'''
+                SELECT r.id, l.name, r.status, r.recommended_action, r.reporter_name, r.timestamp, r.severity
+                FROM locations l
+                JOIN security_reports r ON r.id = (
+                    SELECT id FROM security_reports
+                    WHERE location_id = l.id AND is_active = 1
+                    ORDER BY id DESC
+                    LIMIT 1
+                )
+                WHERE l.id IN ({', '.join('?' * len(location_ids))})
+                ORDER BY r.severity DESC, r.id DESC
+                LIMIT 1
+            ''', location_ids)
+            return cursor.fetchone()
+    
+    def _link_report_locations(self, cursor) -> int:
+        # Each distinct spelling is resolved once; the most common spelling of a
+        # new location becomes its canonical name, ties going to the one used first.
+        # Reports keep the text they were filed with and are linked by ID only.
+        cursor.execute('''
+            SELECT location, COUNT(*) FROM security_reports
+            WHERE location_id IS NULL
+            GROUP BY location
+            ORDER BY COUNT(*) DESC, MIN(id) ASC
+        ''')
+        spellings = cursor.fetchall()
+        if not spellings:
+            return 0
+        
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS location_links (
+                spelling TEXT PRIMARY KEY,
+                location_id INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('DELETE FROM temp.location_links')
+        cursor.executemany(
+            'INSERT INTO temp.location_links (spelling, location_id) VALUES (?, ?)',
+            [(spelling, self._resolve_location(cursor, spelling)[0]) for spelling, _ in spellings]
+        )
+        cursor.execute('''
+            UPDATE security_reports
+            SET location_id = (SELECT location_id FROM temp.location_links WHERE spelling = location)
+            WHERE location_id IS NULL
+        ''')
+        linked = cursor.rowcount
+        cursor.execute('DROP TABLE temp.location_links')
+        return linked
+    
+    def link_report_locations(self) -> int:
+        """
+        Point reports without a location ID at their canonical location, returning how many were linked
+        
+        Reports inserted by add_security_report are linked already; this is for
+        rows loaded with plain SQL, e.g. by the benchmarks.
+        """
+        with self._connect() as conn:
+            linked = self._link_report_locations(conn.cursor())
+            conn.commit()
+            return linked
+    
+    def _merge_location(self, cursor, source: int, target: int) -> int:
+        # The target cannot adopt the source's areas while it is one of them
+        cursor.execute('''
+            SELECT 1 FROM location_tree WHERE ancestor_id = ? AND descendant_id = ? AND depth > 0
+        ''', (source, target))
+        if cursor.fetchone() is not None:
+            self._move_location(cursor, target, self._parent_id(cursor, source))
+        cursor.execute('''
+            SELECT descendant_id FROM location_tree WHERE ancestor_id = ? AND depth = 1
+        ''', (source,))
+        for child, in cursor.fetchall():
+            self._move_location(cursor, child, target)
+        cursor.execute('DELETE FROM location_tree WHERE ancestor_id = ? OR descendant_id = ?', (source, source))
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO subscriber_areas (telegram_user_id, location_id)
+            SELECT telegram_user_id, ? FROM subscriber_areas WHERE location_id = ?
+        ''', (target, source))
+        cursor.execute('DELETE FROM subscriber_areas WHERE location_id = ?', (source,))
+        cursor.execute('UPDATE location_aliases SET location_id = ? WHERE location_id = ?', (target, source))
+        cursor.execute('UPDATE security_reports SET location_id = ? WHERE location_id = ?', (target, source))
+        relinked = cursor.rowcount
+        cursor.execute('DELETE FROM locations WHERE id = ?', (source,))
+        return relinked
+    
+    def set_location_alias(self, alias: str, location: str) -> Optional[int]:
+        """
+        Make alias another spelling of location, and location's spelling its canonical name
+        
+        If alias already named a different location, that location is merged
+        into this one: its spellings, reports, sub-areas and area subscriptions
+        move over. Reports keep the text they were filed with and are linked
+        by location ID only. Returns how many reports were relinked from a
+        merged location (0 if nothing was merged), or None for an empty name.
+        """
+        alias_key = normalize_location(alias)
+        if not alias_key or not normalize_location(location):
+            return None
+        name = tidy_location_name(location)
+        
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            target, _ = self._resolve_location(cursor, location)
+            cursor.execute('UPDATE locations SET name = ? WHERE id = ?', (name, target))
+            
+            cursor.execute('SELECT location_id FROM location_aliases WHERE normalized_key = ?', (alias_key,))
+            row = cursor.fetchone()
+            relinked = 0
+            if row is None:
+                cursor.execute('''
+                    INSERT INTO location_aliases (normalized_key, location_id) VALUES (?, ?)
+                ''', (alias_key, target))
+            elif row[0] != target:
+                relinked = self._merge_location(cursor, row[0], target)
+            conn.commit()
+            return relinked
+    
     def add_security_report(self, location: str, status: str, recommended_action: str, 
-                           reporter_id: int, reporter_name: str) -> bool:
-        """Add a new security report"""
+                           reporter_id: int, reporter_name: str, severity_level: Optional[int] = None,
+                           idempotency_key: Optional[str] = None) -> Optional[Tuple[int, bool]]:
+        """
+        Add a new security report, unless it repeats one already saved
+        
+        A report repeats an earlier one from the same reporter sent with the
+        same idempotency key, or one still active that has the same location,
+        status and recommended action (ignoring case, punctuation and spacing)
+        and was sent within DUPLICATE_WINDOW_MINUTES. Without a severity level,
+        one is inferred from the status.
+        
+        Returns:
+            (report ID, True) for a new report, (ID of the earlier report, False)
+            for a repeat, or None when the report could not be saved
+        """
+        if severity_level is None:
+            severity_level = severity.classify(status, recommended_action)
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
+                # Take the write lock before looking, so a double submission cannot pass both checks
+                cursor.execute('BEGIN IMMEDIATE')
+                if idempotency_key is not None:
+                    cursor.execute('''
+                        SELECT id FROM security_reports WHERE reporter_id = ? AND idempotency_key = ?
+                    ''', (reporter_id, idempotency_key))
+                    row = cursor.fetchone()
+                    if row is not None:
+                        return row[0], False
+                
+                # Stored under the canonical spelling, so every report of a place reads the same
+                location_id, canonical = self._resolve_location(cursor, location)
+                content_hash = report_content_hash(reporter_id, location_id, status, recommended_action)
+                cursor.execute('''
+                    SELECT id FROM security_reports
+                    WHERE content_hash = ? AND is_active = 1 AND timestamp >= datetime('now', ?)
+                    ORDER BY id DESC
+                    LIMIT 1
+                ''', (content_hash, f'-{DUPLICATE_WINDOW_MINUTES} minutes'))
+                row = cursor.fetchone()
+                if row is not None:
+                    return row[0], False
+                
                 cursor.execute('''
                     INSERT INTO security_reports 
-                    (location, status, recommended_action, reporter_id, reporter_name)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (location, status, recommended_action, reporter_id, reporter_name))
+                    (location, location_id, status, recommended_action, reporter_id, reporter_name, severity,
+                     content_hash, idempotency_key)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (canonical, location_id, status, recommended_action, reporter_id, reporter_name,
+                      severity_level, content_hash, idempotency_key))
+                report_id = cursor.lastrowid
                 conn.commit()
-                return True
+                return report_id, True
         except Exception as e:
             print(f"Error adding security report: {e}")
-            return False
+            return None
     
     def get_latest_reports(self, limit: int = 10) -> List[Tuple]:
         """Get the latest security reports"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT location, status, recommended_action, reporter_name, timestamp 
@@ -93,21 +701,250 @@ class SecurityDatabase:
     
     def get_reports_by_location(self, location: str, limit: int = 5) -> List[Tuple]:
         """Get security reports for a specific location"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
+            location_ids = self._location_ids(cursor, location)
+            # Newest first by ID, which follows insertion order; ordering by timestamp
+            # would sort every report under a large area before applying the limit
+            cursor.execute(f'''
                 SELECT location, status, recommended_action, reporter_name, timestamp 
                 FROM security_reports 
-                WHERE is_active = 1 AND location LIKE ?
-                ORDER BY timestamp DESC 
+                WHERE is_active = 1 AND location_id IN ({', '.join('?' * len(location_ids))})
+                ORDER BY id DESC 
                 LIMIT ?
-            ''', (f'%{location}%', limit))
+            ''', (*location_ids, limit))
             return cursor.fetchall()
-    
+
+    def get_report(self, report_id: int) -> Optional[Tuple]:
+        """
+        Get one report by ID, active or not
+        
+        The row is as in get_reports_page: (id, location, status,
+        recommended_action, reporter_name, timestamp, severity).
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, location, status, recommended_action, reporter_name, timestamp, severity
+                FROM security_reports
+                WHERE id = ?
+            ''', (report_id,))
+            return cursor.fetchone()
+
+    def get_reports_page(self, limit: int = 5, before_id: Optional[int] = None,
+                         after_id: Optional[int] = None, location: Optional[str] = None,
+                         min_severity: Optional[int] = None) -> List[Tuple]:
+        """
+        Get one page of security reports using keyset pagination on the report ID
+
+        Pass before_id to page towards older reports and after_id to page back
+        towards newer ones. Rows are always returned newest first and include the ID.
+        A location matches its normalized key exactly, or else as a prefix of known spellings.
+        With min_severity, only reports at that severity level or worse are returned.
+        """
+        conditions = ['is_active = 1']
+        params = []
+
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            if location:
+                location_ids = self._location_ids(cursor, location)
+                conditions.append(f"location_id IN ({', '.join('?' * len(location_ids))})")
+                params.extend(location_ids)
+            if before_id is not None:
+                conditions.append('id < ?')
+                params.append(before_id)
+            if after_id is not None:
+                conditions.append('id > ?')
+                params.append(after_id)
+
+            # Paging towards newer reports reads upwards from the cursor, then flips
+            order = 'ASC' if after_id is not None and before_id is None else 'DESC'
+            rows = self._select_reports(cursor, conditions, params, order, limit, min_severity)
+
+        if order == 'ASC':
+            rows.reverse()
+        return rows
+
+    def _select_reports(self, cursor, conditions: List[str], params: List[Any], order: str, limit: int,
+                        min_severity: Optional[int] = None) -> List[Tuple]:
+        columns = 'id, location, status, recommended_action, reporter_name, timestamp, severity'
+        where = ' AND '.join(conditions)
+        if min_severity is None:
+            cursor.execute(f'''
+                SELECT {columns}
+                FROM security_reports
+                WHERE {where}
+                ORDER BY id {order}
+                LIMIT ?
+            ''', (*params, limit))
+            return cursor.fetchall()
+        
+        # One walk of the (severity, id) index per level, merged: a rare level is
+        # found without scanning past every report of the common ones
+        levels = range(max(min_severity, severity.SAFE), severity.EMERGENCY + 1)
+        per_level = f'''
+            SELECT * FROM (
+                SELECT {columns}
+                FROM security_reports
+                WHERE severity = ? AND {where}
+                ORDER BY id {order}
+                LIMIT ?
+            )
+        '''
+        cursor.execute(
+            ' UNION ALL '.join([per_level] * len(levels)) + f' ORDER BY id {order} LIMIT ?',
+            [value for level in levels for value in (level, *params, limit)] + [limit]
+        )
+        return cursor.fetchall()
+
+    def _report_delta(self, cursor, since_id: int, removals_since: Optional[int], limit: int,
+                      location: Optional[str], min_severity: Optional[int] = None) -> Tuple[List[Tuple], List[int], int, int]:
+        cursor.execute('''
+            SELECT (SELECT COALESCE(MAX(id), 0) FROM security_reports),
+                   (SELECT COALESCE(MAX(seq), 0) FROM report_removals)
+        ''')
+        high_water_mark, removal_mark = cursor.fetchone()
+
+        conditions = ['id > ?', 'id <= ?', 'is_active = 1']
+        params = [since_id, high_water_mark]
+        if location:
+            location_ids = self._location_ids(cursor, location)
+            conditions.append(f"location_id IN ({', '.join('?' * len(location_ids))})")
+            params.extend(location_ids)
+        rows = self._select_reports(cursor, conditions, params, 'DESC', limit, min_severity)
+
+        removed_ids = []
+        if removals_since is not None:
+            cursor.execute('''
+                SELECT DISTINCT report_id
+                FROM report_removals
+                WHERE seq > ? AND seq <= ? AND report_id <= ?
+            ''', (removals_since, removal_mark, since_id))
+            removed_ids = [row[0] for row in cursor.fetchall()]
+
+        return rows, removed_ids, high_water_mark, removal_mark
+
+    def get_report_delta(self, since_id: int, removals_since: Optional[int] = None, limit: int = 20,
+                         location: Optional[str] = None,
+                         min_severity: Optional[int] = None) -> Tuple[List[Tuple], List[int], int, int]:
+        """
+        Get what changed since a client's high-water marks, for delta sync
+
+        Returns (rows, removed_ids, high_water_mark, removal_mark). rows are up to
+        limit active reports with an ID above since_id, newest first; removed_ids
+        are reports removed after the removal mark removals_since (none when it is
+        not given). Both lookups are range scans on the primary key, bounded by
+        marks read first so the result is consistent.
+        """
+        with self._connect() as conn:
+            return self._report_delta(conn.cursor(), since_id, removals_since, limit, location, min_severity)
+
+    def get_bootstrap_snapshot(self, user_id: int, since_id: int = 0, removals_since: Optional[int] = None,
+                               limit: int = 20) -> Dict[str, Any]:
+        """
+        Get everything the Mini App shows on startup from one connection and read transaction
+
+        Returns a dict with is_admin, is_focal_person, the report delta tuple (as
+        get_report_delta), the latest report per location (as
+        get_location_summaries) and, for admins, focal people (else None).
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
+            try:
+                cursor.execute('''
+                    SELECT EXISTS(SELECT 1 FROM admins WHERE telegram_user_id = ?),
+                           EXISTS(SELECT 1 FROM focal_people WHERE telegram_user_id = ? AND is_active = 1)
+                ''', (user_id, user_id))
+                is_admin, is_focal_person = (bool(value) for value in cursor.fetchone())
+
+                snapshot = {
+                    'is_admin': is_admin,
+                    'is_focal_person': is_focal_person,
+                    'reports': self._report_delta(cursor, since_id, removals_since, limit, None),
+                    'locations': self._location_summaries(cursor, 0),
+                    'focal_people': self._focal_people(cursor) if is_admin else None,
+                }
+            finally:
+                conn.rollback()
+        return snapshot
+
+    def _location_summaries(self, cursor, after_id: int) -> List[Tuple]:
+        # One backwards probe of the (location_id, id) index per location
+        cursor.execute('''
+            SELECT r.id, l.name, r.status, r.timestamp, r.severity
+            FROM locations l
+            JOIN security_reports r ON r.id = (
+                SELECT id FROM security_reports
+                WHERE location_id = l.id AND is_active = 1 AND id > ?
+                ORDER BY id DESC
+                LIMIT 1
+            )
+            ORDER BY l.name
+        ''', (after_id,))
+        return cursor.fetchall()
+
+    def get_location_summaries(self, after_id: int = 0) -> List[Tuple]:
+        """
+        Get the latest report per location, optionally only for reports after a given ID
+        
+        Rows are (id, location, status, timestamp, severity), with the location's canonical name.
+        """
+        with self._connect() as conn:
+            return self._location_summaries(conn.cursor(), after_id)
+
+    def search_reports(self, match: str, before_id: Optional[int] = None, limit: int = 20) -> List[Tuple]:
+        """
+        Get active reports matching an FTS5 query, newest first
+
+        Rows are (id, location, status, recommended_action, reporter_name, timestamp, severity).
+        FTS5 walks its index in rowid order, so the LIMIT stops the scan early.
+        """
+        conditions = ['reports_fts MATCH ?']
+        params: List[Any] = [match]
+        if before_id is not None:
+            conditions.append('reports_fts.rowid < ?')
+            params.append(before_id)
+        params.append(limit)
+
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT r.id, r.location, r.status, r.recommended_action, r.reporter_name, r.timestamp, r.severity
+                FROM reports_fts
+                JOIN security_reports r ON r.id = reports_fts.rowid
+                WHERE {' AND '.join(conditions)}
+                ORDER BY reports_fts.rowid DESC
+                LIMIT ?
+            ''', params)
+            return cursor.fetchall()
+
+    def get_search_vocabulary(self) -> Tuple[List[Tuple[str, str, int]], int]:
+        """Get every indexed (term, column, report count), and the highest report ID covered"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM security_reports')
+            last_id = cursor.fetchone()[0]
+            cursor.execute('SELECT term, col, doc FROM reports_fts_vocab')
+            return cursor.fetchall(), last_id
+
+    def get_report_texts(self, after_id: int) -> List[Tuple]:
+        """Get (id, location, status, recommended_action) of active reports after a given ID"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, location, status, recommended_action
+                FROM security_reports
+                WHERE is_active = 1 AND id > ?
+                ORDER BY id
+            ''', (after_id,))
+            return cursor.fetchall()
+
     def add_focal_person(self, telegram_user_id: int, name: str, added_by: int) -> bool:
         """Add a new focal person (authorized reporter)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT OR REPLACE INTO focal_people 
@@ -122,7 +959,7 @@ class SecurityDatabase:
     
     def is_focal_person(self, telegram_user_id: int) -> bool:
         """Check if a user is an authorized focal person"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT 1 FROM focal_people 
@@ -133,7 +970,7 @@ class SecurityDatabase:
     def add_admin(self, telegram_user_id: int) -> bool:
         """Add an admin user"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT OR REPLACE INTO admins (telegram_user_id)
@@ -145,9 +982,35 @@ class SecurityDatabase:
             print(f"Error adding admin: {e}")
             return False
     
+    def ensure_admins(self, telegram_user_ids: Iterable[int]) -> int:
+        """Add any of the given admins that don't exist yet, returning how many were added"""
+        wanted = set(telegram_user_ids)
+        if not wanted:
+            return 0
+        
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT telegram_user_id FROM admins')
+                missing = wanted - {row[0] for row in cursor.fetchall()}
+                
+                # Nothing changed since the last boot: no write transaction at all
+                if not missing:
+                    return 0
+                
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO admins (telegram_user_id)
+                    VALUES (?)
+                ''', [(admin_id,) for admin_id in sorted(missing)])
+                conn.commit()
+                return len(missing)
+        except Exception as e:
+            print(f"Error ensuring admins: {e}")
+            return 0
+    
     def is_admin(self, telegram_user_id: int) -> bool:
         """Check if a user is an admin"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT 1 FROM admins 
@@ -155,22 +1018,24 @@ class SecurityDatabase:
             ''', (telegram_user_id,))
             return cursor.fetchone() is not None
     
+    def _focal_people(self, cursor) -> List[Tuple]:
+        cursor.execute('''
+            SELECT telegram_user_id, name, added_date 
+            FROM focal_people 
+            WHERE is_active = 1
+            ORDER BY added_date DESC
+        ''')
+        return cursor.fetchall()
+    
     def get_all_focal_people(self) -> List[Tuple]:
         """Get all active focal people"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT telegram_user_id, name, added_date 
-                FROM focal_people 
-                WHERE is_active = 1
-                ORDER BY added_date DESC
-            ''')
-            return cursor.fetchall()
+        with self._connect() as conn:
+            return self._focal_people(conn.cursor())
     
     def remove_focal_person(self, telegram_user_id: int) -> bool:
         """Remove a focal person (deactivate)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE focal_people 
@@ -186,7 +1051,7 @@ class SecurityDatabase:
     def add_subscriber(self, telegram_user_id: int, name: str) -> bool:
         """Add a new subscriber for push notifications"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT OR REPLACE INTO subscribers 
@@ -202,7 +1067,7 @@ class SecurityDatabase:
     def remove_subscriber(self, telegram_user_id: int) -> bool:
         """Remove a subscriber (deactivate)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE subscribers 
@@ -217,7 +1082,7 @@ class SecurityDatabase:
     
     def is_subscriber(self, telegram_user_id: int) -> bool:
         """Check if a user is subscribed to notifications"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT 1 FROM subscribers 
@@ -227,7 +1092,7 @@ class SecurityDatabase:
     
     def get_all_subscribers(self) -> List[Tuple]:
         """Get all active subscribers"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT telegram_user_id, name 
@@ -237,12 +1102,164 @@ class SecurityDatabase:
             ''')
             return cursor.fetchall()
     
+    def get_subscribers_for_location(self, location: str) -> List[Tuple]:
+        """
+        Get the active subscribers to alert about a report at location
+        
+        Those who limited their alerts to areas get it when one of their areas
+        is the location or lies above it; everyone else always gets it.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT telegram_user_id, name FROM subscribers s
+                WHERE is_active = 1
+                  AND NOT EXISTS (SELECT 1 FROM subscriber_areas a WHERE a.telegram_user_id = s.telegram_user_id)
+                UNION
+                SELECT s.telegram_user_id, s.name
+                FROM location_aliases k
+                JOIN location_tree t ON t.descendant_id = k.location_id
+                JOIN subscriber_areas a ON a.location_id = t.ancestor_id
+                JOIN subscribers s ON s.telegram_user_id = a.telegram_user_id
+                WHERE k.normalized_key = ? AND s.is_active = 1
+            ''', (normalize_location(location),))
+            return cursor.fetchall()
+    
+    def add_subscriber_area(self, telegram_user_id: int, area: str) -> Optional[str]:
+        """
+        Add an area to those a subscriber limited their alerts to; everything under it counts too
+        
+        Returns the area's canonical name, or None when no location has that name.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT l.id, l.name
+                FROM location_aliases a
+                JOIN locations l ON l.id = a.location_id
+                WHERE a.normalized_key = ?
+            ''', (normalize_location(area),))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute('''
+                INSERT OR IGNORE INTO subscriber_areas (telegram_user_id, location_id) VALUES (?, ?)
+            ''', (telegram_user_id, row[0]))
+            conn.commit()
+            return row[1]
+    
+    def remove_subscriber_area(self, telegram_user_id: int, area: str) -> bool:
+        """Stop limiting a subscriber's alerts to an area; with no areas left they get every alert"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM subscriber_areas
+                WHERE telegram_user_id = ? AND location_id = (
+                    SELECT location_id FROM location_aliases WHERE normalized_key = ?
+                )
+            ''', (telegram_user_id, normalize_location(area)))
+            conn.commit()
+            return cursor.rowcount > 0
+    
+    def get_subscriber_areas(self, telegram_user_id: int) -> List[str]:
+        """Get the names of the areas a subscriber limited their alerts to"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT l.name
+                FROM subscriber_areas a
+                JOIN locations l ON l.id = a.location_id
+                WHERE a.telegram_user_id = ?
+                ORDER BY l.name
+            ''', (telegram_user_id,))
+            return [name for name, in cursor.fetchall()]
+    
+    def upsert_focal_people(self, people: Sequence[Tuple[int, str]], added_by: int) -> bool:
+        """
+        Add or reactivate many focal people in one transaction
+        
+        Existing focal people keep their original added_by and added_date;
+        their name is updated and they are reactivated.
+        """
+        try:
+            with self._connect() as conn:
+                conn.executemany('''
+                    INSERT INTO focal_people (telegram_user_id, name, added_by)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(telegram_user_id) DO UPDATE SET name = excluded.name, is_active = 1
+                ''', [(user_id, name, added_by) for user_id, name in people])
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error importing focal people: {e}")
+            return False
+    
+    def upsert_subscribers(self, subscribers: Sequence[Tuple[int, str]]) -> bool:
+        """Add or reactivate many subscribers in one transaction, keeping existing subscription dates"""
+        try:
+            with self._connect() as conn:
+                conn.executemany('''
+                    INSERT INTO subscribers (telegram_user_id, name, is_active)
+                    VALUES (?, ?, 1)
+                    ON CONFLICT(telegram_user_id) DO UPDATE SET name = excluded.name, is_active = 1
+                ''', subscribers)
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error importing subscribers: {e}")
+            return False
+    
+    def _iter_active(self, table: str, date_column: str, batch_size: int) -> Iterator[List[Tuple]]:
+        # Keyset pages on the unique user ID: each batch is one short query on
+        # its own connection, so nothing is held open between batches
+        after_id = -2 ** 63
+        while True:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT telegram_user_id, name, {date_column}
+                    FROM {table}
+                    WHERE telegram_user_id > ? AND is_active = 1
+                    ORDER BY telegram_user_id
+                    LIMIT ?
+                ''', (after_id, batch_size))
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+    
+    def iter_focal_people(self, batch_size: int = 500) -> Iterator[List[Tuple]]:
+        """Yield active focal people as batches of (telegram_user_id, name, added_date), by user ID"""
+        return self._iter_active('focal_people', 'added_date', batch_size)
+    
+    def iter_subscribers(self, batch_size: int = 500) -> Iterator[List[Tuple]]:
+        """Yield active subscribers as batches of (telegram_user_id, name, subscribed_date), by user ID"""
+        return self._iter_active('subscribers', 'subscribed_date', batch_size)
+    
+    def get_data_generations(self) -> Dict[str, Tuple[int, float]]:
+        """Get the generation counter and last change time (Unix seconds) of each versioned table"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT name, generation, updated_at
+                FROM data_generations
+            ''')
+            return {name: (generation, updated_at) for name, generation, updated_at in cursor.fetchall()}
+    
     def get_all_admins(self) -> List[int]:
         """Get all admin user IDs"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT telegram_user_id 
                 FROM admins
             ''')
             return [row[0] for row in cursor.fetchall()]
+    
+    def ping(self, timeout: float = 1.0) -> None:
+        """Run a trivial read; raises sqlite3.Error if the database is locked or unreadable for timeout seconds"""
+        with self._connect(timeout) as conn:
+            conn.execute('SELECT 1 FROM security_reports LIMIT 1').fetchall()
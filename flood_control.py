@@ -0,0 +1,168 @@
+import logging
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# Commands that read from the database and are cheap to spam
+DEFAULT_THROTTLED_COMMANDS = frozenset({
+    'start', 'help', 'app', 'status', 'location', 'subscribe', 'unsubscribe'
+})
+
+# Users whose throttled counts are kept for /throttlestats; the least throttled are
+# dropped once twice as many are counted, so the counts of those are approximate
+MAX_THROTTLED_USERS = 1000
+
+
+class FloodControl:
+    """Per-user and global token buckets applied before any command handler runs.
+
+    Each user's bucket is a two-slot list ``[tokens, last_refill]`` in a single dict,
+    and buckets that have fully refilled are pruned, so memory only grows with the
+    number of recently active users.
+    """
+
+    def __init__(self, user_rate: float = 0.5, user_burst: float = 5,
+                 global_rate: float = 20, global_burst: float = 30,
+                 commands: Iterable[str] = DEFAULT_THROTTLED_COMMANDS,
+                 prune_interval: float = 300):
+        """
+        Initialize flood control
+
+        Args:
+            user_rate: Commands per second each user regains
+            user_burst: Maximum commands a user can send back to back
+            global_rate: Commands per second the whole bot accepts
+            global_burst: Maximum global burst
+            commands: Command names (without slash) that are throttled
+            prune_interval: Seconds between sweeps of idle user buckets
+        """
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.commands: FrozenSet[str] = frozenset(commands)
+        self.prune_interval = prune_interval
+
+        self._buckets: Dict[int, List[float]] = {}
+        self._global = [float(global_burst), time.monotonic()]
+        self._warned: Dict[int, float] = {}
+        self._last_prune = time.monotonic()
+
+        self.throttled_total = 0
+        self.global_throttled_total = 0
+        self.throttled_by_user: Counter = Counter()
+
+    @staticmethod
+    def _take(bucket: List[float], rate: float, burst: float, now: float) -> bool:
+        """Refill a bucket for the elapsed time and try to take one token"""
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True
+        bucket[0] = tokens
+        return False
+
+    def allow(self, user_id: int, now: Optional[float] = None) -> Tuple[bool, bool]:
+        """
+        Check whether a user may run a throttled command now
+
+        Returns:
+            (allowed, global_limited) - global_limited is True when the global
+            bucket, rather than the user's own bucket, rejected the command
+        """
+        now = time.monotonic() if now is None else now
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [float(self.user_burst), now]
+        if not self._take(bucket, self.user_rate, self.user_burst, now):
+            return False, False
+
+        if not self._take(self._global, self.global_rate, self.global_burst, now):
+            # Give the user their token back; the rejection wasn't their fault
+            bucket[0] += 1
+            return False, True
+
+        if now - self._last_prune >= self.prune_interval:
+            self.prune(now)
+        return True, False
+
+    def retry_after(self, user_id: int) -> float:
+        """Seconds until the user regains one token"""
+        bucket = self._buckets.get(user_id)
+        if bucket is None or self.user_rate <= 0:
+            return 0.0
+        return max(0.0, (1 - bucket[0]) / self.user_rate)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop buckets that would be full again, and expired cooldown warnings"""
+        now = time.monotonic() if now is None else now
+        refill_time = self.user_burst / self.user_rate if self.user_rate > 0 else float('inf')
+
+        idle = [user_id for user_id, (_, last) in self._buckets.items() if now - last >= refill_time]
+        for user_id in idle:
+            del self._buckets[user_id]
+        for user_id in [u for u, until in self._warned.items() if until <= now]:
+            del self._warned[user_id]
+
+        self._last_prune = now
+        return len(idle)
+
+    def _command_name(self, update: Update) -> Optional[str]:
+        """Return the command name of a message like /status@bot args, if any"""
+        message = update.effective_message
+        if message is None or not message.text or not message.text.startswith('/'):
+            return None
+        parts = message.text[1:].split(maxsplit=1)
+        if not parts:
+            return None
+        return parts[0].split('@', 1)[0].lower()
+
+    async def check(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Middleware callback: stop handling of throttled commands"""
+        user = update.effective_user
+        command = self._command_name(update)
+        if user is None or command not in self.commands:
+            return
+
+        allowed, global_limited = self.allow(user.id)
+        if allowed:
+            self._warned.pop(user.id, None)
+            return
+
+        if global_limited:
+            self.global_throttled_total += 1
+            logger.warning(f"Global command rate exceeded, dropped /{command} from user {user.id}")
+            raise ApplicationHandlerStop
+
+        self.throttled_total += 1
+        self.throttled_by_user[user.id] += 1
+        if len(self.throttled_by_user) > 2 * MAX_THROTTLED_USERS:
+            self.throttled_by_user = Counter(dict(self.throttled_by_user.most_common(MAX_THROTTLED_USERS)))
+
+        # Reply once per cooldown period rather than to every throttled command
+        now = time.monotonic()
+        if self._warned.get(user.id, 0) <= now:
+            retry_after = self.retry_after(user.id)
+            self._warned[user.id] = now + max(retry_after, 1.0)
+            await update.effective_message.reply_text(
+                f"⏳ You're sending commands too quickly. Please wait {int(retry_after) + 1}s and try again."
+            )
+
+        raise ApplicationHandlerStop
+
+    def stats(self, top: int = 10) -> Dict:
+        """Throttling statistics for admins"""
+        return {
+            'throttled_total': self.throttled_total,
+            'global_throttled_total': self.global_throttled_total,
+            'tracked_users': len(self._buckets),
+            'cooling_down': len(self._warned),
+            'top_users': self.throttled_by_user.most_common(top),
+        }
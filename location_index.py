@@ -0,0 +1,119 @@
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_location(name: str) -> str:
+    """Normalize a location name for matching ("  BOLE  road" -> "bole road")"""
+    return _WHITESPACE.sub(' ', name).strip().lower()
+
+
+class _TrieNode:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        # Most recently reported location keys under this prefix, newest first
+        self.top: List[str] = []
+
+
+class LocationIndex:
+    """In-memory prefix trie over normalized location names.
+
+    Every node caches the keys of the most recently reported locations below it,
+    so a lookup is a walk of len(prefix) nodes plus a slice - no database access.
+    Names are indexed from the start of each word, so "aba" also finds "Addis Ababa".
+    """
+
+    def __init__(self, max_results: int = 10, refresh_interval: float = 60):
+        """
+        Initialize the location index
+
+        Args:
+            max_results: Completions cached per trie node
+            refresh_interval: Seconds between pulls of reports inserted by other processes
+        """
+        self.max_results = max_results
+        self.refresh_interval = refresh_interval
+
+        self._root = _TrieNode()
+        # normalized key -> (display name, latest status, latest timestamp, latest severity level)
+        self._locations: Dict[str, Tuple[str, str, str, int]] = {}
+        self._last_report_id = 0
+        self._last_refresh: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def build(self, database):
+        """Load the latest status of every known location from the database"""
+        self.refresh(database)
+
+    def clear(self):
+        """Forget every location, so the next refresh rebuilds from scratch"""
+        self._root = _TrieNode()
+        self._locations = {}
+        self._last_report_id = 0
+        self._last_refresh = None
+
+    def refresh(self, database):
+        """Apply reports inserted since the last build or refresh"""
+        summaries = database.get_location_summaries(after_id=self._last_report_id)
+        # Oldest first, so the newest locations end up at the front of each node
+        for report_id, location, status, timestamp, severity_level in sorted(summaries, key=lambda row: row[0]):
+            self.add(location, status, timestamp, severity_level)
+            self._last_report_id = max(self._last_report_id, report_id)
+        self._last_refresh = time.monotonic()
+
+    def maybe_refresh(self, database):
+        """Build on first use, then refresh whenever the refresh interval has passed"""
+        if self._last_refresh is None or time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh(database)
+
+    def add(self, location: str, status: str, timestamp: str, severity_level: int):
+        """Record a new report for a location, moving it to the front of its prefixes"""
+        key = normalize_location(location)
+        if not key:
+            return
+
+        self._locations[key] = (location.strip(), status, timestamp, severity_level)
+
+        # Index from the start of each word
+        starts = [0] + [m.end() for m in re.finditer(' ', key)]
+        for start in starts:
+            node = self._root
+            self._promote(node, key)
+            for char in key[start:]:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _TrieNode()
+                node = child
+                self._promote(node, key)
+
+    def _promote(self, node: _TrieNode, key: str):
+        """Move a key to the front of a node's cached completions"""
+        top = node.top
+        if top and top[0] == key:
+            return
+        if key in top:
+            top.remove(key)
+        top.insert(0, key)
+        del top[self.max_results:]
+
+    def search(self, prefix: str, limit: Optional[int] = None) -> List[Tuple[str, str, str, int]]:
+        """
+        Find locations matching a prefix, most recently reported first
+
+        Returns:
+            List of (location, status, timestamp, severity level) tuples
+        """
+        node = self._root
+        for char in normalize_location(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        keys = node.top[:limit or self.max_results]
+        return [self._locations[key] for key in keys]
@@ -1,11 +1,78 @@
+import asyncio
 import logging
-from typing import List, Optional
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import List, Optional, Tuple
 from telegram import Bot
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, NetworkError, RetryAfter
 from datetime import datetime
 
+import metrics
+import severity
+import tracing
+
 logger = logging.getLogger(__name__)
 
+# Attempts per message; Telegram flood waits and network errors are retried
+MAX_SEND_ATTEMPTS = 3
+
+# Seconds before retrying after a network error, doubled on each attempt
+RETRY_BACKOFF = 1.0
+
+# Alerts at or below this severity level arrive without a sound
+SILENT_MAX_SEVERITY = severity.CAUTION
+
+# Seconds a held-back fanout waits before checking again for more severe ones
+PREEMPT_POLL_SECONDS = 0.05
+
+# kind is 'security', 'admin' or 'test'
+MESSAGES_SENT = metrics.REGISTRY.counter('notifications_sent_total', 'Notification messages delivered', ['kind'])
+MESSAGES_FAILED = metrics.REGISTRY.counter('notifications_failed_total', 'Notification messages given up on', ['kind'])
+MESSAGES_RETRIED = metrics.REGISTRY.counter('notifications_retried_total', 'Notification send attempts retried', ['kind'])
+FANOUT_SECONDS = metrics.REGISTRY.histogram('notification_fanout_seconds', 'Time to notify every recipient of one alert', ['kind'])
+OUTBOX_DEPTH = metrics.REGISTRY.gauge('notification_outbox_depth', 'Messages waiting to be sent by fanouts in progress')
+# Heartbeat of fanouts in progress: a backlog with no recent progress means delivery is stuck
+LAST_PROGRESS = metrics.REGISTRY.gauge(
+    'notification_last_progress_timestamp_seconds', 'When a fanout last started or finished a send attempt'
+)
+
+class FanoutPriority:
+    """Severity levels of the security fanouts in progress in this process.
+
+    Fanouts run in the bot's event loop, in the ASGI app's tasks and in the
+    Flask app's notification threads, so this is guarded by a thread lock
+    rather than an asyncio primitive. Between batches, a fanout waits while a
+    more severe one is still sending.
+    """
+
+    def __init__(self):
+        self._active: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def running(self, level: int):
+        with self._lock:
+            self._active[level] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[level] -= 1
+                if not self._active[level]:
+                    del self._active[level]
+
+    def outranked(self, level: int) -> bool:
+        """Whether a fanout more severe than level is in progress"""
+        with self._lock:
+            return any(active > level for active in self._active)
+
+
+# Shared by every NotificationService in this process
+PRIORITY = FanoutPriority()
+
 class NotificationService:
     """Service for sending push notifications about security updates"""
     
@@ -20,16 +87,90 @@ class NotificationService:
         self.bot = Bot(token=bot_token)
         self.db = database
     
+    async def _send(self, chat_id: int, text: str, kind: str, silent: bool = False):
+        """Send one message, retrying flood waits and network errors; raises once attempts run out"""
+        for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.MARKDOWN,
+                                            disable_notification=silent)
+                MESSAGES_SENT.labels(kind).inc()
+                return
+            except RetryAfter as e:
+                if attempt == MAX_SEND_ATTEMPTS:
+                    raise
+                retry_after = e.retry_after
+                delay = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+            except BadRequest:
+                raise  # A NetworkError subclass, but retrying the same request cannot help
+            except NetworkError:
+                # Includes TimedOut; Forbidden (bot blocked) is not a NetworkError
+                if attempt == MAX_SEND_ATTEMPTS:
+                    raise
+                delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+            MESSAGES_RETRIED.labels(kind).inc()
+            await asyncio.sleep(delay)
+    
+    async def _deliver(self, recipients: List[Tuple[int, str]], text: str, kind: str,
+                       severity_level: Optional[int] = None) -> List[Tuple[int, str]]:
+        """
+        Send a message to each (chat ID, name) recipient in turn, traced in batches
+        
+        With a severity level, low levels are sent silently and each batch
+        waits while a more severe fanout is in progress.
+        
+        Returns:
+            The recipients that could not be reached
+        """
+        failed = []
+        silent = severity_level is not None and severity_level <= SILENT_MAX_SEVERITY
+        OUTBOX_DEPTH.inc(len(recipients))
+        LAST_PROGRESS.set(time.time())
+        with FANOUT_SECONDS.labels(kind).time(), \
+                PRIORITY.running(severity_level) if severity_level is not None else nullcontext(), \
+                tracing.TRACER.span('notify.fanout', kind=kind, recipients=len(recipients)) as fanout:
+            for start in range(0, len(recipients), tracing.SEND_BATCH_SIZE):
+                batch = recipients[start:start + tracing.SEND_BATCH_SIZE]
+                if severity_level is not None:
+                    while PRIORITY.outranked(severity_level):
+                        await asyncio.sleep(PREEMPT_POLL_SECONDS)
+                with tracing.TRACER.span('notify.send_batch', kind=kind, offset=start, size=len(batch)) as span:
+                    sent = 0
+                    for chat_id, name in batch:
+                        try:
+                            await self._send(chat_id, text, kind, silent)
+                            sent += 1
+                            # Wall clock, like span start times, so time to deliver can be measured from submission
+                            delivered_at = round(time.time(), 6)
+                            if sent == 1:
+                                span.set('first_delivery_at', delivered_at)
+                            span.set('last_delivery_at', delivered_at)
+                            logger.info(f"{kind.capitalize()} alert sent to {name} (ID: {chat_id})")
+                        except Exception as e:
+                            failed.append((chat_id, name))
+                            MESSAGES_FAILED.labels(kind).inc()
+                            logger.error(f"Failed to send {kind} alert to {name} (ID: {chat_id}): {e}")
+                        finally:
+                            OUTBOX_DEPTH.dec()
+                            LAST_PROGRESS.set(time.time())
+                    span.set('sent', sent)
+                    span.set('failed', len(batch) - sent)
+            fanout.set('failed', len(failed))
+        return failed
+    
     async def send_security_alert(
         self, 
         location: str, 
         status: str, 
         recommended_action: str,
         reporter_name: str,
-        report_id: Optional[int] = None
+        report_id: Optional[int] = None,
+        severity_level: Optional[int] = None,
+        subscribers: Optional[List[Tuple[int, str]]] = None
     ) -> dict:
         """
-        Send push notification to all subscribers about a new security report
+        Send push notification about a new security report to every subscriber
+        following the location: all of them, except those who limited their
+        alerts to areas elsewhere
         
         Args:
             location: Location of the security incident
@@ -37,12 +178,20 @@ class NotificationService:
             recommended_action: Recommended action to take
             reporter_name: Name of the person who reported
             report_id: Database ID of the report (optional)
+            severity_level: The report's severity level; inferred from the status when not given
+            subscribers: (chat ID, name) recipients, as from get_subscribers_for_location;
+                looked up when not given. Callers on an event loop pass them in, so
+                the database is not queried on the loop.
         
         Returns:
             dict with success count and failed deliveries
         """
-        # Get all subscribers
-        subscribers = self.db.get_all_subscribers()
+        if severity_level is None:
+            severity_level = severity.classify(status, recommended_action)
+        
+        # Subscribers limited to areas hear only about locations within them
+        if subscribers is None:
+            subscribers = self.db.get_subscribers_for_location(location)
         
         if not subscribers:
             logger.info("No subscribers to notify")
@@ -54,6 +203,7 @@ class NotificationService:
 🚨 **SECURITY ALERT**
 
 📍 **Location:** {location}
+{severity.EMOJI[severity_level]} **Severity:** {severity.LEVELS[severity_level]}
 ⚠️ **Status:** {status}
 💡 **Recommended Action:** {recommended_action}
 👤 **Reported by:** {reporter_name}
@@ -65,24 +215,10 @@ Use /status to view all recent reports
 Use /location {location} for updates on this location
         """
         
-        success_count = 0
-        failed_count = 0
-        failed_users = []
-        
-        # Send notification to each subscriber
-        for subscriber_id, subscriber_name in subscribers:
-            try:
-                await self.bot.send_message(
-                    chat_id=subscriber_id,
-                    text=alert_message,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                success_count += 1
-                logger.info(f"Security alert sent to {subscriber_name} (ID: {subscriber_id})")
-            except Exception as e:
-                failed_count += 1
-                failed_users.append((subscriber_id, subscriber_name))
-                logger.error(f"Failed to send alert to {subscriber_name} (ID: {subscriber_id}): {e}")
+        # Send notification to each subscriber, more severe alerts first
+        failed_users = await self._deliver(subscribers, alert_message, 'security', severity_level)
+        success_count = len(subscribers) - len(failed_users)
+        failed_count = len(failed_users)
         
         # Log summary
         logger.info(
@@ -107,7 +243,9 @@ Use /location {location} for updates on this location
         status: str,
         recommended_action: str,
         reporter_name: str,
-        reporter_id: int
+        reporter_id: int,
+        severity_level: Optional[int] = None,
+        admins: Optional[List[int]] = None
     ) -> dict:
         """
         Send push notification specifically to admins about a new security report
@@ -118,12 +256,18 @@ Use /location {location} for updates on this location
             recommended_action: Recommended action to take
             reporter_name: Name of the person who reported
             reporter_id: Telegram ID of the reporter
+            severity_level: The report's severity level; inferred from the status when not given
+            admins: Admin chat IDs, as from get_all_admins; looked up when not given
         
         Returns:
             dict with success count and failed deliveries
         """
+        if severity_level is None:
+            severity_level = severity.classify(status, recommended_action)
+        
         # Get all admins
-        admins = self.db.get_all_admins()
+        if admins is None:
+            admins = self.db.get_all_admins()
         
         if not admins:
             logger.info("No admins to notify")
@@ -135,6 +279,7 @@ Use /location {location} for updates on this location
 🔔 **ADMIN NOTIFICATION: New Security Report**
 
 📍 **Location:** {location}
+{severity.EMOJI[severity_level]} **Severity:** {severity.LEVELS[severity_level]}
 ⚠️ **Status:** {status}
 💡 **Recommended Action:** {recommended_action}
 👤 **Reported by:** {reporter_name} (ID: {reporter_id})
@@ -143,22 +288,10 @@ Use /location {location} for updates on this location
 This report has been automatically distributed to all subscribers.
         """
         
-        success_count = 0
-        failed_count = 0
-        
         # Send notification to each admin
-        for admin_id in admins:
-            try:
-                await self.bot.send_message(
-                    chat_id=admin_id,
-                    text=admin_message,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                success_count += 1
-                logger.info(f"Admin alert sent to admin ID: {admin_id}")
-            except Exception as e:
-                failed_count += 1
-                logger.error(f"Failed to send admin alert to ID {admin_id}: {e}")
+        failed_admins = await self._deliver([(admin_id, 'admin') for admin_id in admins], admin_message, 'admin')
+        success_count = len(admins) - len(failed_admins)
+        failed_count = len(failed_admins)
         
         return {
             "success": success_count,
@@ -184,13 +317,10 @@ You will now receive security alerts for new reports.
 This is a test message to confirm your subscription is active.
             """
             
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=test_message,
-                parse_mode=ParseMode.MARKDOWN
-            )
+            await self._send(user_id, test_message, 'test')
             return True
         except Exception as e:
+            MESSAGES_FAILED.labels('test').inc()
             logger.error(f"Failed to send test notification to {user_id}: {e}")
             return False
 
@@ -0,0 +1,295 @@
+import cProfile
+import functools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MODES = ('cprofile', 'sample')
+
+# Bounds on what an admin can ask for
+MAX_SECONDS = 600
+MAX_CALLS = 100000
+
+# Functions kept in a finished profile's summary
+SUMMARY_SIZE = 25
+
+
+def _describe(filename: str, line: int, function: str) -> str:
+    if filename == '~':
+        # Built-ins, e.g. <method 'execute' of 'sqlite3.Cursor' objects>
+        return re.sub(r' at 0x[0-9a-f]+', '', function)
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+class ProfileSession:
+    """One profiling window: its bounds, the calls it has seen and what it collected."""
+
+    def __init__(self, mode: str, seconds: float, max_calls: Optional[int], interval_ms: float):
+        self.mode = mode
+        self.max_calls = max_calls
+        self.interval = interval_ms / 1000
+        self.started_at = time.time()
+        self.ends_at = self.started_at + seconds
+        self._started = time.perf_counter()
+
+        self.calls = 0
+        self.profiled = 0
+        self.skipped = 0
+        self.closed = False
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+
+        # cprofile: per-call profiles merged into one Stats; only one call is profiled at a time,
+        # because a profiler only sees its own thread and Python 3.12+ allows one at a time
+        self.stats: Optional[pstats.Stats] = None
+        self._profiling = threading.Lock()
+        # sample: collapsed stacks of the threads with a call in flight
+        self.stacks: Counter = Counter()
+        self.active_threads: Counter = Counter()
+
+    def begin(self):
+        if self.mode == 'cprofile':
+            if not self._profiling.acquire(blocking=False):
+                with self._lock:
+                    self.skipped += 1
+                return None
+            profile = cProfile.Profile()
+            profile.enable()
+            return profile
+        ident = threading.get_ident()
+        with self._lock:
+            self.active_threads[ident] += 1
+        return ident
+
+    def end(self, token):
+        if self.mode == 'cprofile':
+            token.disable()
+            self._profiling.release()
+            with self._lock:
+                if self.closed:
+                    return
+                if self.stats is None:
+                    self.stats = pstats.Stats(token)
+                else:
+                    self.stats.add(token)
+                self.profiled += 1
+            return
+        with self._lock:
+            self.active_threads[token] -= 1
+            if not self.active_threads[token]:
+                del self.active_threads[token]
+            self.profiled += 1
+
+    def count_call(self) -> bool:
+        """Count one request or update; True once the session has seen all it was asked for"""
+        with self._lock:
+            self.calls += 1
+            return self.max_calls is not None and self.calls >= self.max_calls
+
+    def sample(self):
+        """Record the current stack of every thread with a call in flight; runs on its own thread"""
+        while not self.stopped.wait(self.interval):
+            with self._lock:
+                threads = list(self.active_threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(_describe(code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def status(self) -> Dict:
+        return {
+            'running': not self.closed,
+            'mode': self.mode,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'ends_at': datetime.fromtimestamp(self.ends_at).isoformat(timespec='seconds'),
+            'calls': self.calls,
+            'max_calls': self.max_calls,
+        }
+
+    def finish(self, directory: str) -> Dict:
+        """Close the session, write its profile file and summarize the hottest functions"""
+        with self._lock:
+            self.closed = True
+        self.stopped.set()
+
+        result = self.status()
+        result.update({
+            'seconds': round(time.perf_counter() - self._started, 1),
+            'profiled': self.profiled,
+            'skipped': self.skipped,
+            'file': None,
+            'functions': self._top_functions(),
+        })
+        if self.stats is None and not self.stacks:
+            return result
+
+        stamp = datetime.fromtimestamp(self.started_at).strftime('%Y%m%d-%H%M%S')
+        extension = 'pstats' if self.mode == 'cprofile' else 'folded'
+        path = os.path.join(directory, f"{self.mode}-{stamp}-{os.getpid()}.{extension}")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if self.mode == 'cprofile':
+                self.stats.dump_stats(path)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    for stack, count in self.stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+            result['file'] = path
+        except OSError as e:
+            result['error'] = f"Could not write the profile: {e}"
+        return result
+
+    def _top_functions(self) -> List[Dict]:
+        functions = []
+        if self.mode == 'cprofile':
+            if self.stats is None:
+                return functions
+            for (filename, line, function), (_, calls, own, total, _) in self.stats.stats.items():
+                functions.append({
+                    'function': _describe(filename, line, function),
+                    'calls': calls,
+                    'self_ms': round(own * 1000, 2),
+                    'total_ms': round(total * 1000, 2),
+                })
+        else:
+            own, total = Counter(), Counter()
+            for stack, count in self.stacks.items():
+                frames = stack.split(';')
+                own[frames[-1]] += count
+                for frame in set(frames):
+                    total[frame] += count
+            interval_ms = self.interval * 1000
+            for function, samples in total.items():
+                functions.append({
+                    'function': function,
+                    'samples': samples,
+                    'self_ms': round(own[function] * interval_ms, 2),
+                    'total_ms': round(samples * interval_ms, 2),
+                })
+        functions.sort(key=lambda f: f['self_ms'], reverse=True)
+        return functions[:SUMMARY_SIZE]
+
+
+class Profiler:
+    """On-demand profiling of the requests or updates a process handles.
+
+    An admin starts a session for a time window, optionally ending early after
+    a number of calls. In cprofile mode each call is profiled with cProfile and
+    the results merged into a pstats file; in sample mode a thread records the
+    stacks of threads with a call in flight every few milliseconds, written as
+    collapsed stacks for flame graph tools. With no session running, the hooks
+    return after a single attribute check.
+    """
+
+    def __init__(self, directory: str = 'profiles'):
+        """
+        Initialize the profiler
+
+        Args:
+            directory: Where finished profiles are written
+        """
+        self.directory = directory
+        self.session: Optional[ProfileSession] = None
+        self.last_result: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def start(self, mode: str = 'cprofile', seconds: float = 30, max_calls: Optional[int] = None,
+              interval_ms: float = 5) -> Dict:
+        """Start a session; raises ValueError for bad bounds or when one is already running"""
+        if mode not in MODES:
+            raise ValueError(f"Mode must be {' or '.join(MODES)}")
+        if not 0 < seconds <= MAX_SECONDS:
+            raise ValueError(f"Seconds must be between 1 and {MAX_SECONDS}")
+        if max_calls is not None and not 0 < max_calls <= MAX_CALLS:
+            raise ValueError(f"Calls must be between 1 and {MAX_CALLS}")
+
+        with self._lock:
+            if self.session is not None:
+                raise ValueError('A profile is already running')
+            session = ProfileSession(mode, seconds, max_calls, interval_ms)
+            if mode == 'sample':
+                threading.Thread(target=session.sample, name='profile-sampler', daemon=True).start()
+            self._timer = threading.Timer(seconds, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+            self.session = session
+        return session.status()
+
+    def stop(self) -> Optional[Dict]:
+        """End the running session and return its result, or None if none was running"""
+        with self._lock:
+            session, self.session = self.session, None
+            if session is None:
+                return None
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+        self.last_result = session.finish(self.directory)
+        return self.last_result
+
+    def status(self) -> Optional[Dict]:
+        """The running session, else the last result, else None"""
+        session = self.session
+        return session.status() if session is not None else self.last_result
+
+    def begin(self):
+        """Start profiling the current thread's call; returns a token for end(), None when idle"""
+        session = self.session
+        if session is None:
+            return None
+        token = session.begin()
+        return (session, token) if token is not None else None
+
+    def end(self, token, count: bool = True):
+        """Stop profiling a call begun with begin(), and count it towards the session's calls"""
+        if token is not None:
+            token[0].end(token[1])
+        if count:
+            self.count_call()
+
+    def count_call(self):
+        session = self.session
+        if session is not None and session.count_call():
+            self.stop()
+
+    def run(self, func, *args):
+        """Call func(*args) profiled, without counting it as a request"""
+        if self.session is None:
+            return func(*args)
+        token = self.begin()
+        try:
+            return func(*args)
+        finally:
+            self.end(token, count=False)
+
+    def wrap_async(self, func):
+        """Wrap a coroutine function so each call is profiled and counted while a session runs"""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if self.session is None:
+                return await func(*args, **kwargs)
+            token = self.begin()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.end(token)
+        return wrapper
+
+
+# Shared by every module in this process
+PROFILER = Profiler(os.getenv('PROFILE_DIR', 'profiles'))
@@ -0,0 +1,282 @@
+import functools
+import inspect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Statements with a query plan worth showing; BEGIN, COMMIT, PRAGMA and DDL have none
+_EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'replace', 'with')
+
+# Distinct statements explained per slow call, and characters of SQL kept per statement
+MAX_EXPLAINED = 5
+MAX_SQL_LENGTH = 500
+
+# String literals, skipped when counting a statement's ? placeholders
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+# The instrumented call running on this thread, if any
+_local = threading.local()
+
+
+class _Call:
+    """Statements run and rows touched by one instrumented call"""
+    __slots__ = ('statements', 'rows')
+
+    def __init__(self):
+        self.statements: List[str] = []
+        self.rows = 0
+
+
+def _record_sql(call: Optional[_Call], sql: str):
+    # The statement as written, with ? placeholders: bound values are user data
+    if call is not None:
+        call.statements.append(sql)
+
+
+def _count_changes(call: Optional[_Call], cursor: sqlite3.Cursor) -> sqlite3.Cursor:
+    # rowcount is -1 for queries; their rows are counted as they are fetched
+    if call is not None and cursor.rowcount > 0:
+        call.rows += cursor.rowcount
+    return cursor
+
+
+class CountingCursor(sqlite3.Cursor):
+    """Cursor that adds the rows it changes or fetches to the running call"""
+
+    def execute(self, sql, *args, **kwargs):
+        _record_sql(self.connection.call, sql)
+        return _count_changes(self.connection.call, super().execute(sql, *args, **kwargs))
+
+    def executemany(self, sql, *args, **kwargs):
+        _record_sql(self.connection.call, sql)
+        return _count_changes(self.connection.call, super().executemany(sql, *args, **kwargs))
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self.connection.call is not None:
+            self.connection.call.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        if self.connection.call is not None:
+            self.connection.call.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self.connection.call is not None:
+            self.connection.call.rows += len(rows)
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements and rows are attributed to the instrumented call that opened it.
+
+    Pass as the factory to sqlite3.connect. Outside an instrumented call it
+    behaves like a plain connection and records nothing. Rows changed by
+    triggers are not counted, only those the statements themselves touch.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.call: Optional[_Call] = getattr(_local, 'call', None)
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    # The shortcuts run on a cursor made in C, bypassing CountingCursor.execute
+    def execute(self, sql, *args, **kwargs):
+        _record_sql(self.call, sql)
+        return _count_changes(self.call, super().execute(sql, *args, **kwargs))
+
+    def executemany(self, sql, *args, **kwargs):
+        _record_sql(self.call, sql)
+        return _count_changes(self.call, super().executemany(sql, *args, **kwargs))
+
+
+def explain(db_path: str, statements: Iterable[str]) -> List[Dict]:
+    """
+    EXPLAIN QUERY PLAN for each explainable statement, as {'sql', 'plan'} with indented plan lines
+
+    Statements keep their ? placeholders and are planned with NULL bound to
+    each; SQLite picks the plan before it sees the values.
+    """
+    explained = []
+    seen = set()
+    with closing(sqlite3.connect(db_path)) as conn:
+        for sql in statements:
+            if len(explained) == MAX_EXPLAINED:
+                break
+            if sql in seen or not sql.lstrip().lower().startswith(_EXPLAINABLE):
+                continue
+            seen.add(sql)
+            placeholders = _LITERAL.sub('', sql).count('?')
+            try:
+                rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, (None,) * placeholders).fetchall()
+            except sqlite3.Error as e:
+                plan = [f"(no plan: {e})"]
+            else:
+                depths = {0: -1}
+                plan = []
+                for node_id, parent_id, _, detail in rows:
+                    depths[node_id] = depths.get(parent_id, -1) + 1
+                    plan.append('  ' * depths[node_id] + detail)
+            explained.append({'sql': ' '.join(sql.split())[:MAX_SQL_LENGTH], 'plan': plan})
+    return explained
+
+
+class StatementStats:
+    __slots__ = ('calls', 'total_seconds', 'max_seconds', 'rows')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+
+
+class QueryLog:
+    """Timing, row counts and a slow-query log for SecurityDatabase calls.
+
+    Each public database method is a named statement. Every call adds to that
+    statement's totals; a call over the threshold is also logged, with the SQL
+    it ran and the query plan of each statement, and kept in a short history.
+    Plans are only computed for slow calls, so the common path is a few adds.
+    """
+
+    def __init__(self, threshold_ms: float = 100, history: int = 50):
+        """
+        Initialize the log
+
+        Args:
+            threshold_ms: Calls taking at least this long are logged with their query plans
+            history: Slow calls kept for dbstats
+        """
+        self.threshold_ms = threshold_ms
+        self.started_at = datetime.now()
+
+        self._stats: Dict[str, StatementStats] = {}
+        self._slow = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float, rows: int,
+               db_path: Optional[str] = None, sql: Iterable[str] = ()):
+        """Add one call to a statement's totals and log it if it was slow"""
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                stats = self._stats[statement] = StatementStats()
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.rows += rows
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+
+        if seconds * 1000 >= self.threshold_ms:
+            self._log_slow(statement, seconds, rows, db_path, sql)
+
+    def _log_slow(self, statement: str, seconds: float, rows: int, db_path: Optional[str], sql: Iterable[str]):
+        try:
+            plans = explain(db_path, sql) if db_path else []
+        except sqlite3.Error as e:
+            plans = [{'sql': '', 'plan': [f"(no plan: {e})"]}]
+
+        self._slow.append({
+            'statement': statement,
+            'ms': round(seconds * 1000, 2),
+            'rows': rows,
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'queries': plans,
+        })
+
+        lines = [f"Slow query: {statement} took {seconds * 1000:.1f} ms, {rows} rows"]
+        for query in plans:
+            lines.append(f"  {query['sql']}")
+            lines.extend(f"    {line}" for line in query['plan'])
+        logger.warning('\n'.join(lines))
+
+    def slowest(self, top: int = 10, order: str = 'max') -> List[Dict]:
+        """Statement totals, slowest first by their max, total or average time"""
+        with self._lock:
+            items = [(name, stats.calls, stats.total_seconds, stats.max_seconds, stats.rows)
+                     for name, stats in self._stats.items()]
+
+        keys = {
+            'max': lambda item: item[3],
+            'total': lambda item: item[2],
+            'avg': lambda item: item[2] / item[1],
+        }
+        items.sort(key=keys[order], reverse=True)
+        return [{
+            'statement': name,
+            'calls': calls,
+            'total_ms': round(total * 1000, 2),
+            'avg_ms': round(total * 1000 / calls, 3),
+            'max_ms': round(longest * 1000, 2),
+            'rows': rows,
+        } for name, calls, total, longest, rows in items[:top]]
+
+    def stats(self, top: int = 10, order: str = 'max') -> Dict:
+        """Slowest statements and most recent slow calls since startup, for admins"""
+        return {
+            'since': self.started_at.isoformat(timespec='seconds'),
+            'threshold_ms': self.threshold_ms,
+            'statements': self.slowest(top, order),
+            'slow_queries': list(reversed(self._slow))[:top],
+        }
+
+
+def instrument(log: QueryLog, histogram=None, exclude: Iterable[str] = ()):
+    """
+    Class decorator recording every public method of a database class into log
+
+    The class must open its connections with InstrumentedConnection as the
+    factory and have a db_path attribute. When histogram is given, each call's
+    duration is also observed under the method name. Generator methods are
+    left alone: calling one only creates the generator.
+    """
+    def decorate(cls):
+        for name, func in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude or not inspect.isfunction(func):
+                continue
+            if inspect.isgeneratorfunction(func):
+                continue
+            child = histogram.labels(name) if histogram is not None else None
+            setattr(cls, name, _instrumented(func, name, log, child))
+        return cls
+    return decorate
+
+
+def _instrumented(func, statement: str, log: QueryLog, child):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        call = _Call()
+        previous = getattr(_local, 'call', None)
+        _local.call = call
+        # Calls made while a trace is active become spans in it
+        trace = tracing.current_span()
+        wall_start = time.time() if trace is not None else 0
+        started = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            _local.call = previous
+
+            if child is not None:
+                child.observe(seconds)
+            if trace is not None:
+                tracing.TRACER.record('db.' + statement, trace, wall_start, seconds, rows=call.rows)
+            log.record(statement, seconds, call.rows, getattr(self, 'db_path', None), call.statements)
+    return wrapper
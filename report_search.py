@@ -0,0 +1,308 @@
+import bisect
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Roughly what FTS5's unicode61 tokenizer treats as a token
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a search query or report field"""
+    return _TOKEN.findall(text.lower())
+
+
+def _trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(term: str) -> int:
+    """Typos tolerated for a query term of this length"""
+    if len(term) <= 3:
+        return 0
+    if len(term) <= 5:
+        return 1
+    return 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, giving up with limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+class SearchVocabulary:
+    """Every term in the search index, with a trigram index for typo-tolerant lookup.
+
+    Built once from the FTS5 vocabulary, then kept current by tokenizing reports
+    inserted since, so a lookup never touches the database. Candidates sharing
+    trigrams with the query term are confirmed with a bounded edit distance.
+    Terms are also kept sorted for prefix completion, and those seen in a
+    location are remembered so location-only matching can be skipped early.
+    """
+
+    def __init__(self, refresh_interval: float = 60, max_expansions: int = 8, max_completions: int = 16):
+        """
+        Initialize the vocabulary
+
+        Args:
+            refresh_interval: Seconds between pulls of reports inserted by other processes
+            max_expansions: Most vocabulary terms a misspelled query term expands to
+            max_completions: Most vocabulary terms a prefix expands to
+        """
+        self.refresh_interval = refresh_interval
+        self.max_expansions = max_expansions
+        self.max_completions = max_completions
+
+        self._terms: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        self._counts: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._sorted: List[str] = []
+        self._location_terms = set()
+        self._last_report_id = 0
+        self._last_refresh: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._term_ids
+
+    def add(self, term: str, count: int = 1, in_location: bool = False):
+        if in_location:
+            self._location_terms.add(term)
+
+        term_id = self._term_ids.get(term)
+        if term_id is not None:
+            self._counts[term_id] += count
+            return
+
+        term_id = len(self._terms)
+        self._terms.append(term)
+        self._counts.append(count)
+        self._term_ids[term] = term_id
+        bisect.insort(self._sorted, term)
+        for trigram in _trigrams(term):
+            self._postings.setdefault(trigram, []).append(term_id)
+
+    def build(self, database):
+        """Load all indexed terms from the database"""
+        terms, last_id = database.get_search_vocabulary()
+        with self._lock:
+            for term, column, count in terms:
+                self.add(term, count, in_location=column == 'location')
+            self._last_report_id = last_id
+            self._last_refresh = time.monotonic()
+
+    def refresh(self, database):
+        """Add terms from reports inserted since the last build or refresh"""
+        rows = database.get_report_texts(after_id=self._last_report_id)
+        with self._lock:
+            for report_id, location, status, recommended_action in rows:
+                location_terms = set(tokenize(location))
+                for term in location_terms | set(tokenize(f"{status} {recommended_action}")):
+                    self.add(term, in_location=term in location_terms)
+                self._last_report_id = max(self._last_report_id, report_id)
+            self._last_refresh = time.monotonic()
+
+    def maybe_refresh(self, database):
+        """Build on first use, then refresh whenever the refresh interval has passed"""
+        if self._last_refresh is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        with self._refresh_lock:
+            # Another thread may have got here first
+            if self._last_refresh is None:
+                self.build(database)
+            elif time.monotonic() - self._last_refresh >= self.refresh_interval:
+                self.refresh(database)
+
+    def in_location(self, term: str, prefix: bool = False) -> bool:
+        """Whether a term (or, with prefix, any term starting with it) occurs in some location"""
+        if not prefix:
+            return term in self._location_terms
+        return any(candidate in self._location_terms for candidate in self._iter_prefix(term))
+
+    def _iter_prefix(self, prefix: str):
+        for i in range(bisect.bisect_left(self._sorted, prefix), len(self._sorted)):
+            if not self._sorted[i].startswith(prefix):
+                return
+            yield self._sorted[i]
+
+    def completions(self, prefix: str) -> Optional[List[str]]:
+        """Vocabulary terms starting with a prefix, or None if there are more than max_completions"""
+        matches = []
+        for candidate in self._iter_prefix(prefix):
+            if len(matches) == self.max_completions:
+                return None
+            matches.append(candidate)
+        return matches
+
+    def expand(self, term: str) -> List[str]:
+        """Vocabulary terms within max_edits(term) of a query term, closest and most common first"""
+        limit = max_edits(term)
+        if limit == 0:
+            return [term] if term in self._term_ids else []
+
+        query_trigrams = _trigrams(term)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._postings.get(trigram, ()))
+
+        # A substitution, insertion or deletion changes at most three trigrams;
+        # an adjacent transposition, one edit to edit_distance, can change four
+        min_shared = max(1, len(query_trigrams) - 4 * limit)
+        matches = []
+        for term_id, count in shared.items():
+            if count < min_shared:
+                continue
+            candidate = self._terms[term_id]
+            distance = edit_distance(term, candidate, limit)
+            if distance <= limit:
+                matches.append((distance, -self._counts[term_id], candidate))
+
+        matches.sort()
+        return [candidate for _, _, candidate in matches[:self.max_expansions]]
+
+
+class ReportSearch:
+    """Typo-tolerant, ranked search over security reports.
+
+    Query terms are matched against the FTS5 index in three tiers: all terms
+    in the location, all terms anywhere, then all terms after expanding typos
+    against the vocabulary. Each tier excludes the ones before it and is read
+    newest first, so a page costs a few index range scans with an early LIMIT.
+    The last query term also matches as a prefix, for search-as-you-type.
+    """
+
+    def __init__(self, database, vocabulary: Optional[SearchVocabulary] = None, max_terms: int = 6):
+        self.db = database
+        self.vocabulary = vocabulary or SearchVocabulary()
+        self.max_terms = max_terms
+
+    def _exact_terms(self, terms: List[str]) -> List[str]:
+        """FTS5 expression per query term; the last one also matches as a prefix"""
+        exact = [_quote(term) for term in terms]
+        last = terms[-1]
+        if len(last) <= 3:
+            # Covered by the prefix indexes ('2 3'); single characters are not worth it
+            if len(last) >= 2:
+                exact[-1] += '*'
+        else:
+            # Longer prefixes are not indexed and FTS5 would merge every matching
+            # doclist; spell out the completions instead when there are few
+            completions = self.vocabulary.completions(last)
+            if completions is None:
+                exact[-1] += '*'
+            elif len(completions) > 1 or completions != [last]:
+                options = [_quote(candidate) for candidate in sorted(set(completions) | {last})]
+                exact[-1] = f"({' OR '.join(options)})"
+        return exact
+
+    def _tier_queries(self, terms: List[str]) -> Tuple[List[Tuple[str, str]], Dict[str, List[str]]]:
+        """(tier, FTS5 MATCH expression) pairs to run in order, and the typo corrections used"""
+        exact = self._exact_terms(terms)
+        exact_query = ' AND '.join(exact)
+        queries = []
+
+        # Only worth a pass when every term can occur in a location
+        last = len(terms) - 1
+        if all(self.vocabulary.in_location(term, prefix=i == last) for i, term in enumerate(terms)):
+            location_query = f"location : ({exact_query})"
+            queries.append(('location', location_query))
+            queries.append(('exact', f"({exact_query}) NOT ({location_query})"))
+        else:
+            queries.append(('exact', exact_query))
+
+        corrections = {}
+        fuzzy = []
+        for i, term in enumerate(terms):
+            alternatives = [candidate for candidate in self.vocabulary.expand(term) if candidate != term]
+            if i == last:
+                # Completions of the prefix already match exactly
+                alternatives = [candidate for candidate in alternatives if not candidate.startswith(term)]
+            if alternatives:
+                corrections[term] = alternatives
+            options = [exact[i]] + [_quote(candidate) for candidate in alternatives]
+            fuzzy.append(f"({' OR '.join(options)})" if len(options) > 1 else options[0])
+
+        if corrections:
+            queries.append(('fuzzy', f"({' AND '.join(fuzzy)}) NOT ({exact_query})"))
+        return queries, corrections
+
+    def search(self, query: str, limit: int = 20, cursor: Optional[str] = None) -> Dict:
+        """
+        Search reports
+
+        Args:
+            query: Free text; matched against location, status and recommended action
+            limit: Results per page
+            cursor: next_cursor from the previous page
+
+        Returns:
+            dict with results as (tier, row) pairs, next_cursor (None on the last
+            page) and the typo corrections applied
+
+        Raises:
+            ValueError: If cursor was not produced by this search
+        """
+        terms = tokenize(query)[:self.max_terms]
+        if not terms:
+            return {'results': [], 'next_cursor': None, 'corrections': {}}
+
+        self.vocabulary.maybe_refresh(self.db)
+        queries, corrections = self._tier_queries(terms)
+
+        tier, before_id = 0, None
+        if cursor:
+            # Cursors name their tier: which tiers run can change as the vocabulary grows
+            tier_name, _, before_text = cursor.partition('.')
+            names = [name for name, _ in queries]
+            if tier_name not in names:
+                raise ValueError(f"Invalid search cursor: {cursor}")
+            tier, before_id = names.index(tier_name), int(before_text) if before_text else None
+
+        results = []
+        next_cursor = None
+        while tier < len(queries):
+            wanted = limit - len(results)
+            tier_name, match = queries[tier]
+            rows = self.db.search_reports(match, before_id=before_id, limit=wanted + 1)
+            results.extend((tier_name, row) for row in rows[:wanted])
+            if len(rows) > wanted:
+                # The page ends inside this tier
+                next_cursor = f"{tier_name}.{rows[wanted - 1][0]}"
+                break
+            tier, before_id = tier + 1, None
+            if len(results) == limit:
+                # The page ends at a tier boundary; point the cursor at the next tier with a match
+                for tier_name, match in queries[tier:]:
+                    if self.db.search_reports(match, limit=1):
+                        next_cursor = f"{tier_name}."
+                        break
+                break
+
+        return {'results': results, 'next_cursor': next_cursor, 'corrections': corrections}
@@ -0,0 +1,58 @@
+import re
+from typing import Optional
+
+# Severity levels of a report, stored as these integers; higher is worse
+SAFE, CAUTION, WARNING, DANGER, EMERGENCY = range(5)
+LEVELS = ('Safe', 'Caution', 'Warning', 'Danger', 'Emergency')
+EMOJI = ('🟢', '🟡', '🟠', '🔴', '🆘')
+
+# Level of a status the classifier finds no keywords in
+DEFAULT = CAUTION
+
+# Keywords per level, worst first: a status naming several gets the worst
+KEYWORDS = (
+    (EMERGENCY, ('emergency', 'explosions?', 'bomb(?:ing)?s?', 'shootings?', 'gun ?fire', 'gunshots?',
+                 'attacks?', 'evacuat\\w*', 'killed', 'casualt\\w+', 'hostages?', 'riots?', 'massacre')),
+    (DANGER, ('danger(?:ous)?', 'unsafe', 'not safe', 'violen\\w+', 'armed', 'clash\\w*', 'robber\\w*',
+              'kidnap\\w*', 'looting', 'fighting', 'injur\\w+')),
+    (WARNING, ('warning', 'protests?', 'demonstrations?', 'road ?blocks?', 'unrest', 'tensions?', 'tense',
+               'curfew', 'closed', 'strike')),
+    (CAUTION, ('caution', 'careful', 'suspicious', 'delays?', 'traffic', 'congest\\w+', 'crowd(?:ed|s)?',
+               'checkpoints?', 'police')),
+    (SAFE, ('safe', 'calm', 'clear', 'normal', 'peaceful', 'quiet', 'reopened', 'no incidents?')),
+)
+_PATTERNS = [(level, re.compile(r'\b(?:' + '|'.join(words) + r')\b', re.IGNORECASE)) for level, words in KEYWORDS]
+
+
+def classify(status: str, recommended_action: str = '') -> int:
+    """
+    Infer a severity level from a free-text status
+
+    The status decides when it names any level. Otherwise the recommended
+    action is tried, except for SAFE: "stay safe" says nothing about the area.
+    """
+    for text, allow_safe in ((status or '', True), (recommended_action or '', False)):
+        for level, pattern in _PATTERNS:
+            if level == SAFE and not allow_safe:
+                continue
+            if pattern.search(text):
+                return level
+    return DEFAULT
+
+
+def parse(value) -> Optional[int]:
+    """A severity level from its number or name ("3", 3, "danger"), or None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if SAFE <= value <= EMERGENCY else None
+    text = str(value or '').strip().lower()
+    if text.isdigit():
+        return parse(int(text))
+    names = [name.lower() for name in LEVELS]
+    return names.index(text) if text in names else None
+
+
+def label(level: int) -> str:
+    """Emoji and name of a level, e.g. "🔴 Danger" """
+    return f"{EMOJI[level]} {LEVELS[level]}"
@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+# Import this module before anything heavy so the "imports" phase covers them
+_IMPORTED_AT = time.perf_counter()
+
+
+class StartupProfile:
+    """Records how long each startup phase takes, for diagnosing slow cold starts"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = _IMPORTED_AT
+        self.phases: List[Tuple[str, float]] = []
+        self._last = _IMPORTED_AT
+
+    def mark(self, phase: str):
+        """Close the current phase, attributing the time since the previous mark to it"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def phase(self, phase: str):
+        """Time a block as its own phase"""
+        self._last = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(phase)
+
+    @property
+    def total(self) -> float:
+        """Seconds from the first import to the last mark"""
+        return self._last - self.started
+
+    def summary(self) -> str:
+        """One-line breakdown, e.g. 'bot startup 412ms: imports 380ms, database 4ms'"""
+        parts = ', '.join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases)
+        return f"{self.name} startup {self.total * 1000:.0f}ms: {parts}"
@@ -1,29 +1,53 @@
 #!/usr/bin/env python
 """
-Quick script to manually subscribe a user to security alert notifications
+Quick script to manually subscribe users to security alert notifications
+
+Usage:
+    python subscribe_user.py <user_id> <name>
+    python subscribe_user.py --file subscribers.csv   (CSV or JSONL with user_id and name)
 """
+import argparse
+import os
 import sys
 from database import SecurityDatabase
+import bulk_io
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('user_id', nargs='?', type=int, help='Telegram user ID')
+parser.add_argument('name', nargs='?', help='subscriber name')
+parser.add_argument('--file', help='CSV or JSONL file of subscribers to import')
+args = parser.parse_args()
+
+if args.file is None and (args.user_id is None or not args.name):
+    parser.error('give a user ID and name, or --file')
 
 # Initialize database
-db = SecurityDatabase('security_reports.db')
+db = SecurityDatabase(os.getenv('DATABASE_PATH', 'security_reports.db'))
 
-# Your user details
-user_id = 994550828  # Your Telegram user ID
-user_name = "Admin User"  # Your name
+if args.file:
+    fmt = bulk_io.detect_format(args.file)
+    if fmt is None:
+        parser.error('--file must end in .csv or .jsonl')
+    with open(args.file, 'rb') as f:
+        summary = bulk_io.import_roster(db, 'subscribers', bulk_io.text_lines(f), fmt)
+    print(f"✅ Subscribed {summary['imported']} of {summary['rows']} users from {args.file}")
+    for error in summary['errors']:
+        print(f"❌ Line {error['line']}: {error['error']}")
+    print(f"\n📋 Total subscribers: {len(db.get_all_subscribers())}")
+    sys.exit(1 if summary['failed'] else 0)
 
 # Add subscriber
-success = db.add_subscriber(user_id, user_name)
+success = db.add_subscriber(args.user_id, args.name)
 
 if success:
-    print(f"✅ Successfully subscribed user {user_id} ({user_name}) to notifications!")
-    
+    print(f"✅ Successfully subscribed user {args.user_id} ({args.name}) to notifications!")
+
     # Verify subscription
-    if db.is_subscriber(user_id):
+    if db.is_subscriber(args.user_id):
         print("✅ Subscription verified!")
     else:
         print("❌ Verification failed!")
-    
+
     # Show all subscribers
     subscribers = db.get_all_subscribers()
     print(f"\n📋 Total subscribers: {len(subscribers)}")
@@ -32,4 +56,3 @@ if success:
 else:
     print("❌ Failed to subscribe user!")
     sys.exit(1)
-
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Trace spans for report delivery, exported as JSON lines
+
+Each report gets one trace: report.submit from the bot's /report handler or
+POST /api/reports, the database calls made under it, notify.enqueue when
+the web service hands alerts to a background fanout, and notify.fanout per
+alert kind with one notify.send_batch span per batch of recipients. Spans
+are appended to TRACE_FILE as they end, one JSON object per line. Tracing is
+off unless TRACE_FILE is set; the file is never rotated, so turn it on while
+investigating delivery times rather than leaving it on indefinitely.
+
+Usage:
+    python tracing.py [--file traces.jsonl] [--since 2026-01-01T00:00] [--reports 20]
+
+Summarizes, per report, the time from submission to the last subscriber
+delivery, and its p50/p95/p99 across reports.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+# Recipients sent to sequentially under one notify.send_batch span
+SEND_BATCH_SIZE = 25
+
+# The span new spans are parented to, per thread and per asyncio task
+_current: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def current_span() -> Optional['Span']:
+    return _current.get()
+
+
+class Span:
+    """One timed operation in a trace; ends and is exported when its with block exits."""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'start', 'attributes',
+                 '_started', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = parent.trace_id if parent is not None else _new_id(16)
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.attributes = attributes
+        # Wall clock to line up spans from different processes, monotonic for the duration
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None):
+        self.tracer.export(self, time.perf_counter() - self._started, error)
+
+    def __enter__(self) -> 'Span':
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.end(exc)
+        return False
+
+
+class JsonlExporter:
+    """Appends finished spans to a file, one JSON object per line.
+
+    Lines are short and written with a single append, so the bot and every
+    web worker can share one file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+            self._file.write(line)
+
+
+class Tracer:
+    """Creates spans and hands finished ones to an exporter; without one, spans are dropped."""
+
+    def __init__(self, exporter: Optional[JsonlExporter] = None):
+        self.exporter = exporter
+
+    def span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """A span under parent, or under the current span when no parent is given"""
+        return Span(self, name, parent if parent is not None else _current.get(), attributes)
+
+    @contextmanager
+    def activate(self, span: Optional[Span]) -> Iterator[Optional[Span]]:
+        """Make span the current parent in another thread or task, without ending it"""
+        token = _current.set(span)
+        try:
+            yield span
+        finally:
+            _current.reset(token)
+
+    def record(self, name: str, parent: Span, start: float, duration: float, **attributes):
+        """Export a span for work that was already timed elsewhere"""
+        span = Span(self, name, parent, attributes)
+        span.start = start
+        self.export(span, duration)
+
+    def export(self, span: Span, duration: float, error: Optional[BaseException] = None):
+        if self.exporter is None:
+            return
+        record = {
+            'trace_id': span.trace_id,
+            'span_id': span.span_id,
+            'parent_id': span.parent_id,
+            'name': span.name,
+            'start': round(span.start, 6),
+            'end': round(span.start + duration, 6),
+            'duration_ms': round(duration * 1000, 3),
+            'attributes': span.attributes,
+        }
+        if error is not None:
+            record['error'] = f"{type(error).__name__}: {error}"
+        try:
+            self.exporter.export(record)
+        except OSError:
+            pass  # Tracing must never break delivery
+
+
+def tracer_from_env() -> Tracer:
+    path = os.getenv('TRACE_FILE', '')
+    return Tracer(JsonlExporter(path) if path else None)
+
+
+# Shared by every module in this process
+TRACER = tracer_from_env()
+
+
+def read_spans(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # A line cut short by a crash
+
+
+def summarize(spans: Iterator[Dict[str, Any]], since: float = 0) -> List[Dict[str, Any]]:
+    """
+    One entry per submitted report that notified subscribers
+
+    time_to_deliver_ms runs from the start of report.submit to the last
+    successful subscriber delivery; time_to_first_ms to the first one.
+    """
+    traces: Dict[str, Dict[str, Any]] = {}
+    for span in spans:
+        trace = traces.setdefault(span['trace_id'], {'root': None, 'batches': []})
+        if span['name'] == 'report.submit':
+            trace['root'] = span
+        elif span['name'] == 'notify.send_batch' and span['attributes'].get('kind') == 'security':
+            trace['batches'].append(span)
+
+    reports = []
+    for trace_id, trace in traces.items():
+        root = trace['root']
+        if root is None or root['start'] < since or not trace['batches']:
+            continue
+        firsts = [b['attributes']['first_delivery_at'] for b in trace['batches'] if b['attributes'].get('first_delivery_at')]
+        lasts = [b['attributes']['last_delivery_at'] for b in trace['batches'] if b['attributes'].get('last_delivery_at')]
+        reports.append({
+            'trace_id': trace_id,
+            'submitted_at': root['start'],
+            'source': root['attributes'].get('source'),
+            'location': root['attributes'].get('location'),
+            'recipients': sum(b['attributes'].get('size', 0) for b in trace['batches']),
+            'delivered': sum(b['attributes'].get('sent', 0) for b in trace['batches']),
+            'failed': sum(b['attributes'].get('failed', 0) for b in trace['batches']),
+            'time_to_first_ms': round((min(firsts) - root['start']) * 1000, 1) if firsts else None,
+            'time_to_deliver_ms': round((max(lasts) - root['start']) * 1000, 1) if lasts else None,
+        })
+    reports.sort(key=lambda report: report['submitted_at'])
+    return reports
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default=os.getenv('TRACE_FILE') or 'traces.jsonl', help='span file to read')
+    parser.add_argument('--since', help='only reports submitted at or after this ISO time (local)')
+    parser.add_argument('--reports', type=int, default=20, help='most recent reports to list (0 for none)')
+    parser.add_argument('--json', action='store_true', help='print the per-report summary as JSON')
+    args = parser.parse_args()
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else 0
+    try:
+        reports = summarize(read_spans(args.file), since)
+    except FileNotFoundError:
+        parser.error(f"no trace file at {args.file}")
+
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+        return
+
+    if args.reports and reports:
+        print(f"{'submitted':19s}  {'source':6s}  {'delivered':>11s}  {'first ms':>9s}  {'last ms':>9s}  location")
+        for report in reports[-args.reports:]:
+            submitted = datetime.fromtimestamp(report['submitted_at']).strftime('%Y-%m-%d %H:%M:%S')
+            delivered = f"{report['delivered']}/{report['recipients']}"
+            first = report['time_to_first_ms'] if report['time_to_first_ms'] is not None else '-'
+            last = report['time_to_deliver_ms'] if report['time_to_deliver_ms'] is not None else '-'
+            print(f"{submitted:19s}  {report['source'] or '-':6s}  {delivered:>11s}  {first:>9}  {last:>9}  "
+                  f"{report['location'] or ''}")
+        print()
+
+    times = sorted(r['time_to_deliver_ms'] for r in reports if r['time_to_deliver_ms'] is not None)
+    if not times:
+        print(f"No delivered reports in {args.file}")
+        return
+    print(f"Time to deliver to the last subscriber over {len(times)} reports: "
+          f"p50 {percentile(times, 0.5):.0f} ms, p95 {percentile(times, 0.95):.0f} ms, "
+          f"p99 {percentile(times, 0.99):.0f} ms, max {times[-1]:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
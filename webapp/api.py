@@ -0,0 +1,860 @@
+"""
+Framework-independent handlers for the Mini App API
+
+The Flask app (app.py) and the ASGI app (asgi.py) are thin wrappers around
+these functions. Each handler takes plain request data and returns a
+JSON-serializable body together with an HTTP status code, optionally
+followed by a dict of response headers.
+"""
+import hmac
+import os
+import re
+import json
+import time
+import urllib.parse
+import zlib
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from dotenv import load_dotenv
+
+import bulk_io
+import metrics
+import profiling
+import severity
+import tracing
+from webapp.auth import InitDataVerifier, SessionTokens, SESSION_TTL, session_secret_key
+
+# Load environment variables
+load_dotenv()
+
+# Bot token for authentication
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+
+# Admin ID used when no Telegram init data is sent (development only)
+DEV_ADMIN_USER_ID = 994550828
+
+# Secrets are derived once; verified initData and tokens are cached in memory
+init_data_verifier = InitDataVerifier(BOT_TOKEN)
+session_tokens = SessionTokens(session_secret_key(BOT_TOKEN))
+
+# Bearer token required by GET /metrics; unset leaves it open, as on a private network
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# /health/ready answers 503 once any of these is exceeded, so the load balancer routes around the worker
+READY_DB_MS = float(os.getenv('READY_DB_MS', 500))
+# A delivery worker with work waiting and no progress for this long counts as stuck;
+# a deep but draining outbox is a large fanout, not a fault
+READY_STALL_SECONDS = float(os.getenv('READY_STALL_SECONDS', 120))
+READY_LOOP_LAG_MS = float(os.getenv('READY_LOOP_LAG_MS', 500))
+
+# Longest Idempotency-Key accepted on POST /api/reports
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Recorded by both web apps around every request, labelled by route endpoint name
+HTTP_REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    'http_request_seconds', 'Time to handle a web request', ['endpoint']
+)
+HTTP_RESPONSES = metrics.REGISTRY.counter(
+    'http_responses_total', 'Web responses sent', ['endpoint', 'status']
+)
+
+def validate_telegram_data(init_data):
+    """
+    Validate Telegram Mini App init data
+    """
+    return init_data_verifier.verify(init_data) is not None
+
+def extract_user_from_init_data(init_data):
+    """
+    Extract user information from Telegram init data
+    """
+    try:
+        parsed_data = urllib.parse.parse_qsl(init_data)
+        data_dict = dict(parsed_data)
+
+        if 'user' in data_dict:
+            user_data = json.loads(data_dict['user'])
+            return user_data
+        return None
+    except Exception as e:
+        print(f"Error extracting user data: {e}")
+        return None
+
+def request_user_id(init_data):
+    """
+    Get the requesting user's ID from init data, or the development admin ID
+    """
+    user_data = extract_user_from_init_data(init_data)
+    return user_data.get('id') if user_data else DEV_ADMIN_USER_ID
+
+def conditional_headers(etag, last_modified):
+    """
+    Validator headers for a response that clients should revalidate before reuse
+    """
+    return {
+        'ETag': etag,
+        'Last-Modified': formatdate(last_modified, usegmt=True),
+        'Cache-Control': 'private, no-cache'
+    }
+
+def is_not_modified(request_headers, etag, last_modified):
+    """
+    Check If-None-Match (preferred) or If-Modified-Since against the current validators
+    """
+    if request_headers is None:
+        return False
+
+    if_none_match = request_headers.get('If-None-Match')
+    if if_none_match:
+        if if_none_match.strip() == '*':
+            return True
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return etag in candidates or f'W/{etag}' in candidates
+
+    if_modified_since = request_headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+def is_admin_cached(db, versions, user_id):
+    """
+    Admin check served from memory until the admins table changes
+    """
+    if versions is None:
+        return db.is_admin(user_id)
+    return user_id in versions.cached('admins', lambda: set(db.get_all_admins()))
+
+def is_focal_person_cached(db, versions, user_id):
+    """
+    Focal person check served from memory until the focal_people table changes
+    """
+    if versions is None:
+        return db.is_focal_person(user_id)
+    return user_id in versions.cached('focal_people', lambda: {fp[0] for fp in db.get_all_focal_people()})
+
+def roles_generation(versions):
+    """
+    Changes whenever an admin or focal person is added or removed
+    """
+    if versions is None:
+        return None
+    return f"{versions.generation('admins')}.{versions.generation('focal_people')}"
+
+def identify_user(init_data, claimed_user_id=None):
+    """
+    User ID from verified init data; without a BOT_TOKEN, the claimed or development ID
+    """
+    if BOT_TOKEN:
+        fields = init_data_verifier.verify(init_data)
+        return fields['user'].get('id') if fields and isinstance(fields.get('user'), dict) else None
+    return claimed_user_id or request_user_id(init_data)
+
+def issue_session(user, versions=None):
+    """
+    Permissions body with a fresh session token for the given user and roles
+    """
+    return {
+        'is_admin': user['is_admin'],
+        'is_focal_person': user['is_focal_person'],
+        'session_token': session_tokens.issue(
+            user['user_id'], user['is_admin'], user['is_focal_person'], roles_generation(versions)
+        ),
+        'session_expires_in': SESSION_TTL
+    }
+
+def authenticate(db, init_data, session_token=None, versions=None, claimed_user_id=None):
+    """
+    Identify the caller and their roles
+
+    A valid session token is answered from its claims alone. Otherwise the
+    init data is verified and roles are looked up. Without a BOT_TOKEN
+    (development) init data cannot be verified, so the user ID claimed in
+    the request body or init data is trusted instead.
+
+    Returns:
+        dict with user_id, is_admin and is_focal_person, or None if not authenticated
+    """
+    claims = session_tokens.verify(session_token, roles_generation(versions))
+    if claims is not None:
+        return {'user_id': claims['uid'], 'is_admin': bool(claims['adm']), 'is_focal_person': bool(claims['fp'])}
+
+    user_id = identify_user(init_data, claimed_user_id)
+    if not user_id:
+        return None
+    return {
+        'user_id': user_id,
+        'is_admin': is_admin_cached(db, versions, user_id),
+        'is_focal_person': is_focal_person_cached(db, versions, user_id)
+    }
+
+def check_user_permissions(db, init_data, data, versions=None):
+    """
+    Check if user is admin or focal person
+
+    Also issues a session token carrying these roles, which the other
+    endpoints accept in place of init data until it expires.
+    """
+    # Always from init data: this is where roles are (re)established
+    user = authenticate(db, init_data, versions=versions, claimed_user_id=(data or {}).get('user_id'))
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    return issue_session(user, versions), 200
+
+# Field order of report rows from SecurityDatabase.get_reports_page and friends
+REPORT_FIELDS = ['id', 'location', 'status', 'recommended_action', 'reporter_name', 'timestamp', 'severity']
+
+FOCAL_PERSON_FIELDS = ['user_id', 'name', 'added_date']
+
+# Field order of SecurityDatabase.get_location_summaries rows
+LOCATION_FIELDS = ['last_report_id', 'location', 'status', 'timestamp', 'severity']
+
+def wants_columnar(args):
+    """
+    Whether the client asked for the compact ?format=columnar list encoding
+    """
+    return args is not None and args.get('format') == 'columnar'
+
+def columnar(fields, rows):
+    """
+    Compact list encoding: field names once, then one array of values per field
+    """
+    columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in fields]
+    return {'fields': fields, 'columns': columns}
+
+def report_to_dict(report):
+    """
+    Convert a report row (id, location, status, action, reporter, timestamp, severity) to its API form
+    """
+    return {
+        'id': report[0],
+        'location': report[1],
+        'status': report[2],
+        'recommended_action': report[3],
+        'reporter_name': report[4],
+        'timestamp': report[5],
+        'severity': report[6]
+    }
+
+def get_reports(db, args, request_headers=None, versions=None):
+    """
+    Get all security reports, or only what changed when since_id is given
+
+    ?severity= (a level number or name, see severity.py) keeps only reports
+    at that level or worse. With a DataVersions instance, responses carry an ETag derived from the
+    reports generation and the query, and a matching If-None-Match is
+    answered with 304 before any report query runs.
+    """
+    limit = args.get('limit', 20, type=int)
+    location = args.get('location')
+    since_id = args.get('since_id', type=int)
+    removals_since = args.get('removals_since', type=int)
+    compact = wants_columnar(args)
+    min_severity = None
+    if args.get('severity'):
+        min_severity = severity.parse(args.get('severity'))
+        if min_severity is None:
+            return {'error': 'Invalid severity'}, 400
+
+    headers = {}
+    if versions is not None:
+        variant = zlib.crc32(
+            f"{limit}|{location or ''}|{since_id}|{removals_since}|{compact}|{min_severity}".encode('utf-8')
+        )
+        etag = f'"reports-{versions.generation("reports")}-{variant:08x}"'
+        headers = conditional_headers(etag, versions.last_modified('reports'))
+        if is_not_modified(request_headers, etag, versions.last_modified('reports')):
+            return None, 304, headers
+
+    if since_id is not None:
+        return report_delta(db, since_id, removals_since, limit, location, compact, min_severity), 200, headers
+
+    reports_data = db.get_reports_page(limit=limit, location=location or None, min_severity=min_severity)
+    if compact:
+        return columnar(REPORT_FIELDS, reports_data), 200, headers
+    reports = [report_to_dict(report) for report in reports_data]
+
+    return reports, 200, headers
+
+def report_delta(db, since_id, removals_since, limit, location, compact=False, min_severity=None):
+    """
+    Delta sync body: reports newer than since_id and reports removed since removals_since
+
+    Clients store high_water_mark and removal_mark and send them back as
+    since_id and removals_since. When more than limit reports are new,
+    only the newest limit are sent and replace tells the client to drop
+    its cached list instead of merging.
+    """
+    delta = db.get_report_delta(since_id, removals_since, limit + 1, location or None, min_severity)
+    return delta_body(delta, limit, compact)
+
+def delta_body(delta, limit, compact=False):
+    """
+    Format a (rows, removed, high_water_mark, removal_mark) delta fetched with limit + 1 rows
+    """
+    rows, removed, high_water_mark, removal_mark = delta
+    replace = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'reports': columnar(REPORT_FIELDS, rows) if compact else [report_to_dict(row) for row in rows],
+        'removed': removed,
+        'replace': replace,
+        'high_water_mark': high_water_mark,
+        'removal_mark': removal_mark
+    }
+
+def search_reports(search, args):
+    """
+    Ranked, typo-tolerant report search for ?q=, paged with ?cursor=
+
+    Results are the report fields plus match: 'location' when every term
+    matched the location, 'exact' when they matched anywhere, 'fuzzy' when
+    some term only matched after correcting a typo.
+    """
+    query = (args.get('q') or '').strip()
+    if not query:
+        return {'error': 'Missing search query'}, 400
+    limit = max(1, min(args.get('limit', 20, type=int), 100))
+
+    try:
+        found = search.search(query, limit=limit, cursor=args.get('cursor') or None)
+    except ValueError:
+        return {'error': 'Invalid cursor'}, 400
+
+    if wants_columnar(args):
+        results = columnar(REPORT_FIELDS + ['match'], [row + (tier,) for tier, row in found['results']])
+    else:
+        results = [dict(report_to_dict(row), match=tier) for tier, row in found['results']]
+
+    return {
+        'results': results,
+        'next_cursor': found['next_cursor'],
+        'corrections': found['corrections']
+    }, 200
+
+def location_overview(db, location):
+    """
+    Where a location sits in the hierarchy and the worst current report under it
+
+    Reports for an area include everything under it: GET /api/reports?location=
+    rolls up the same way. Locations matched only by prefix have no ancestors
+    or areas listed.
+    """
+    hierarchy = db.get_location_hierarchy(location)
+    worst = db.get_worst_status(location)
+    if hierarchy is None and worst is None:
+        return {'error': 'Location not found'}, 404
+
+    hierarchy = hierarchy or {'location': location.strip(), 'ancestors': [], 'children': []}
+    return dict(hierarchy, worst=report_to_dict(worst) if worst else None), 200
+
+def bootstrap(db, init_data, args, session_token=None, versions=None):
+    """
+    Everything the Mini App needs on startup in one response
+
+    Returns permissions with a fresh session token, the report delta since
+    the client's cached marks (the first page when it has none), the latest
+    status per location and, for admins, focal people. The data is read
+    from one database connection in a single read transaction.
+    """
+    claims = session_tokens.verify(session_token, roles_generation(versions))
+    user_id = claims['uid'] if claims else identify_user(init_data, args.get('user_id', type=int))
+    if not user_id:
+        return {'error': 'Invalid request'}, 401
+
+    limit = args.get('limit', 20, type=int)
+    compact = wants_columnar(args)
+    snapshot = db.get_bootstrap_snapshot(
+        user_id,
+        since_id=args.get('since_id', 0, type=int),
+        removals_since=args.get('removals_since', type=int),
+        limit=limit + 1
+    )
+
+    def listing(fields, rows):
+        if compact:
+            return columnar(fields, rows)
+        return [dict(zip(fields, row)) for row in rows]
+
+    user = {
+        'user_id': user_id,
+        'is_admin': snapshot['is_admin'],
+        'is_focal_person': snapshot['is_focal_person']
+    }
+    focal_people = snapshot['focal_people']
+    return {
+        'permissions': issue_session(user, versions),
+        'reports': delta_body(snapshot['reports'], limit, compact),
+        'locations': listing(LOCATION_FIELDS, snapshot['locations']),
+        'focal_people': listing(FOCAL_PERSON_FIELDS, focal_people) if focal_people is not None else None
+    }, 200, {'Cache-Control': 'private, no-store'}
+
+def create_report(db, init_data, data, session_token=None, versions=None, request_headers=None):
+    """
+    Create a new security report
+
+    A client retrying a submission sends the same Idempotency-Key header.
+    A retry, or the same report sent again shortly after (see
+    SecurityDatabase.add_security_report), is answered with the original
+    report and 200 instead of 201, and no alert is sent for it.
+
+    Returns:
+        (body, status, alert) - alert holds the notification arguments
+        when a new report was saved, otherwise None
+    """
+    data = data or {}
+    user = authenticate(db, init_data, session_token, versions, claimed_user_id=data.get('user_id'))
+    if user is None:
+        return {'error': 'Invalid request'}, 401, None
+
+    user_id = user['user_id']
+    user_name = data.get('user_name', f'User{user_id}')
+    location = data.get('location', '').strip()
+    status = data.get('status', '').strip()
+    recommended_action = data.get('recommended_action', '').strip()
+
+    # Validate required fields
+    if not all([user_id, location, status, recommended_action]):
+        return {'error': 'All fields are required'}, 400, None
+
+    idempotency_key = (request_headers or {}).get('Idempotency-Key') or None
+    if idempotency_key is not None and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return {'error': 'Idempotency key too long'}, 400, None
+
+    # Optional: without it, the level is inferred from the status
+    if data.get('severity') is not None:
+        severity_level = severity.parse(data['severity'])
+        if severity_level is None:
+            return {'error': 'Invalid severity'}, 400, None
+    else:
+        severity_level = severity.classify(status, recommended_action)
+
+    # Validate user permissions
+    if not (user['is_admin'] or user['is_focal_person']):
+        return {'error': 'Unauthorized to submit reports'}, 403, None
+
+    # Validate location format (letters and spaces only)
+    if not re.match(r'^[a-zA-Z\s]+$', location):
+        return {'error': 'Location must contain only letters and spaces'}, 400, None
+
+    # Add report to database
+    saved = db.add_security_report(
+        location=location,
+        status=status,
+        recommended_action=recommended_action,
+        reporter_id=user_id,
+        reporter_name=user_name,
+        severity_level=severity_level,
+        idempotency_key=idempotency_key
+    )
+
+    if not saved:
+        return {'error': 'Failed to create report'}, 500, None
+
+    report_id, created = saved
+    report = report_to_dict(db.get_report(report_id))
+    if not created:
+        return {'message': 'Report already submitted', 'report': report}, 200, None
+
+    alert = {
+        'location': location,
+        'status': status,
+        'recommended_action': recommended_action,
+        'reporter_name': user_name,
+        'reporter_id': user_id,
+        'severity_level': severity_level
+    }
+    return {'message': 'Report created successfully', 'report': report}, 201, alert
+
+def report_recipients(db, alert):
+    """
+    Who to notify about a new report: its subscribers and the admins
+    """
+    return {
+        'subscribers': db.get_subscribers_for_location(alert['location']),
+        'admins': db.get_all_admins()
+    }
+
+async def send_report_notifications(notification_service, alert, trace=None, recipients=None):
+    """
+    Send push notifications for a new report to subscribers and admins
+
+    trace is the report's report.submit span, which the fanouts are traced under.
+    recipients is a report_recipients result; without one the notification
+    service looks them up itself, blocking the event loop while it does.
+    """
+    recipients = recipients or {}
+    with tracing.TRACER.activate(trace):
+        try:
+            # Send to subscribers
+            notification_result = await notification_service.send_security_alert(
+                location=alert['location'],
+                status=alert['status'],
+                recommended_action=alert['recommended_action'],
+                reporter_name=alert['reporter_name'],
+                severity_level=alert.get('severity_level'),
+                subscribers=recipients.get('subscribers')
+            )
+
+            # Send to admins
+            admin_result = await notification_service.send_admin_alert(**alert, admins=recipients.get('admins'))
+
+            print(f"Notifications sent: {notification_result['success']} subscribers, {admin_result['success']} admins")
+        except Exception as e:
+            print(f"Error sending notifications: {e}")
+
+def get_focal_people(db, init_data, request_headers=None, versions=None, args=None, session_token=None):
+    """
+    Get all focal people (admin only)
+
+    Like get_reports, answers a matching If-None-Match with 304 and supports
+    ?format=columnar; with DataVersions the admin check is also served from memory.
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    # Check admin permissions
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    compact = wants_columnar(args)
+
+    headers = {}
+    if versions is not None:
+        etag = f'"focal-people-{versions.generation("focal_people")}{"-columnar" if compact else ""}"'
+        headers = conditional_headers(etag, versions.last_modified('focal_people'))
+        if is_not_modified(request_headers, etag, versions.last_modified('focal_people')):
+            return None, 304, headers
+
+    focal_people_data = db.get_all_focal_people()
+    if compact:
+        return columnar(FOCAL_PERSON_FIELDS, focal_people_data), 200, headers
+
+    focal_people = []
+    for fp in focal_people_data:
+        focal_people.append({
+            'user_id': fp[0],
+            'name': fp[1],
+            'added_date': fp[2]
+        })
+
+    return focal_people, 200, headers
+
+def add_focal_person(db, init_data, data, session_token=None, versions=None):
+    """
+    Add a new focal person (admin only)
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    admin_user_id = user['user_id']
+
+    # Check admin permissions
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    data = data or {}
+    focal_user_id = data.get('user_id')
+    name = data.get('name', '').strip()
+
+    # Validate required fields
+    if not all([focal_user_id, name]):
+        return {'error': 'User ID and name are required'}, 400
+
+    # Validate name format (letters and spaces only)
+    if not re.match(r'^[a-zA-Z\s]+$', name):
+        return {'error': 'Name must contain only letters and spaces'}, 400
+
+    # Add focal person to database
+    success = db.add_focal_person(
+        telegram_user_id=focal_user_id,
+        name=name,
+        added_by=admin_user_id
+    )
+
+    if success:
+        return {'message': 'Focal person added successfully'}, 201
+    return {'error': 'Failed to add focal person or already exists'}, 500
+
+def remove_focal_person(db, init_data, focal_user_id, session_token=None, versions=None):
+    """
+    Remove a focal person (admin only)
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    # Check admin permissions
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    # Remove focal person from database
+    if db.remove_focal_person(focal_user_id):
+        return {'message': 'Focal person removed successfully'}, 200
+    return {'error': 'Failed to remove focal person or not found'}, 404
+
+def import_roster(db, init_data, roster, lines, args, content_type=None, session_token=None, versions=None):
+    """
+    Bulk import focal people or subscribers from a CSV or JSONL upload (admin only)
+
+    The format comes from ?format= or the Content-Type. Valid rows are
+    upserted in chunks; the response counts what was imported and lists
+    per-row errors by line number.
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    fmt = args.get('format') or bulk_io.detect_format(content_type)
+    if fmt not in bulk_io.FORMATS:
+        return {'error': 'Format must be csv or jsonl'}, 400
+
+    summary = bulk_io.import_roster(db, roster, lines, fmt, added_by=user['user_id'])
+    return summary, 200
+
+def export_roster(db, init_data, roster, args, session_token=None, versions=None):
+    """
+    Stream active focal people or subscribers as CSV or JSONL (admin only)
+
+    On success the body is an iterator of text chunks rather than JSON.
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    fmt = args.get('format', 'csv')
+    if fmt not in bulk_io.FORMATS:
+        return {'error': 'Format must be csv or jsonl'}, 400
+
+    return bulk_io.export_roster(db, roster, fmt), 200, {
+        'Content-Type': bulk_io.CONTENT_TYPES[fmt],
+        'Content-Disposition': f'attachment; filename="{roster}.{fmt}"',
+        'Cache-Control': 'private, no-store'
+    }
+
+def get_db_stats(db, init_data, args, session_token=None, versions=None):
+    """
+    Slowest database statements and recent slow calls in this worker since startup (admin only)
+
+    ?limit= caps both lists (default 10, at most 50); ?order= ranks statements
+    by their max (default), total or avg time.
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    order = args.get('order', 'max')
+    if order not in ('max', 'total', 'avg'):
+        return {'error': 'order must be max, total or avg'}, 400
+    try:
+        limit = min(max(int(args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return {'error': 'limit must be a number'}, 400
+
+    return db.query_log.stats(limit, order), 200, {'Cache-Control': 'private, no-store'}
+
+def profile_summary(result, limit):
+    """
+    A profile status or result with its function list cut to limit entries
+    """
+    if result is None:
+        return {'running': False}
+    if 'functions' in result:
+        result = dict(result, functions=result['functions'][:limit])
+    return result
+
+def get_profile(db, init_data, args, session_token=None, versions=None):
+    """
+    The profile running in this worker, or the top functions of its last one (admin only)
+
+    ?limit= caps the function list (default 10, at most 25).
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    try:
+        limit = min(max(int(args.get('limit', 10)), 1), profiling.SUMMARY_SIZE)
+    except ValueError:
+        return {'error': 'limit must be a number'}, 400
+
+    return profile_summary(profiling.PROFILER.status(), limit), 200, {'Cache-Control': 'private, no-store'}
+
+def start_profile(db, init_data, data, session_token=None, versions=None):
+    """
+    Start profiling the requests this worker handles (admin only)
+
+    The body may give mode (cprofile, the default, or sample), seconds
+    (default 30) and requests, to stop early after that many requests.
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    if profiling.PROFILER.session is not None:
+        return {'error': 'A profile is already running'}, 409
+
+    data = data or {}
+    try:
+        seconds = float(data.get('seconds', 30))
+        max_calls = int(data['requests']) if data.get('requests') is not None else None
+    except (TypeError, ValueError):
+        return {'error': 'seconds and requests must be numbers'}, 400
+
+    try:
+        status = profiling.PROFILER.start(data.get('mode', 'cprofile'), seconds, max_calls)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    return status, 201
+
+def stop_profile(db, init_data, session_token=None, versions=None):
+    """
+    Stop the running profile early and return its top functions (admin only)
+    """
+    user = authenticate(db, init_data, session_token, versions)
+    if user is None:
+        return {'error': 'Invalid request'}, 401
+
+    if not user['is_admin']:
+        return {'error': 'Admin access required'}, 403
+
+    result = profiling.PROFILER.stop()
+    if result is None:
+        return {'error': 'No profile is running'}, 404
+    return profile_summary(result, profiling.SUMMARY_SIZE), 200
+
+def health_check():
+    """
+    Health check endpoint
+    """
+    return {
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat()
+    }, 200
+
+def readiness_check(db, broadcaster, loop_lag=None):
+    """
+    Readiness endpoint: database latency, notification backlog and delivery worker heartbeats
+
+    Answers 503 when any check fails. loop_lag is the recent event loop lag in
+    seconds, from the ASGI app; the Flask app has no loop to check.
+    """
+    checks = {}
+    started = time.perf_counter()
+    try:
+        db.ping(timeout=READY_DB_MS / 1000)
+        latency_ms = (time.perf_counter() - started) * 1000
+        checks['database'] = {'ok': latency_ms <= READY_DB_MS, 'latency_ms': round(latency_ms, 2)}
+    except Exception as e:
+        checks['database'] = {'ok': False, 'error': str(e)}
+    checks['database']['threshold_ms'] = READY_DB_MS
+
+    # Registered by the notifications module, which is only imported once a report is sent
+    now = time.time()
+    outbox = metrics.REGISTRY.get('notification_outbox_depth')
+    progress = metrics.REGISTRY.get('notification_last_progress_timestamp_seconds')
+    depth = int(outbox.get()) if outbox is not None else 0
+    last_progress = progress.get() if progress is not None else 0
+    idle = now - last_progress if last_progress else None
+    checks['outbox'] = {
+        'ok': not (depth and idle is not None and idle > READY_STALL_SECONDS),
+        'depth': depth,
+        'last_progress_seconds_ago': round(idle, 1) if idle is not None else None,
+        'stall_seconds': READY_STALL_SECONDS,
+    }
+
+    # The live feed poller only runs while clients are connected
+    subscribers = broadcaster.subscriber_count
+    since_wake = now - broadcaster.last_wake if broadcaster.last_wake else None
+    checks['report_stream'] = {
+        'ok': not subscribers or (broadcaster.is_polling and since_wake is not None and since_wake <= READY_STALL_SECONDS),
+        'subscribers': subscribers,
+        'polling': broadcaster.is_polling,
+        'last_heartbeat_seconds_ago': round(since_wake, 1) if since_wake is not None else None,
+        'stall_seconds': READY_STALL_SECONDS,
+    }
+
+    if loop_lag is not None:
+        checks['event_loop'] = {
+            'ok': loop_lag * 1000 <= READY_LOOP_LAG_MS,
+            'lag_ms': round(loop_lag * 1000, 2),
+            'threshold_ms': READY_LOOP_LAG_MS,
+        }
+
+    ready = all(check['ok'] for check in checks.values())
+    return {
+        'status': 'ready' if ready else 'unavailable',
+        'timestamp': datetime.now().isoformat(),
+        'checks': checks,
+    }, 200 if ready else 503, {'Cache-Control': 'no-store'}
+
+def record_request(endpoint, status, seconds):
+    """
+    Record one handled request; endpoint is None for unmatched URLs
+    """
+    endpoint = endpoint or 'unmatched'
+    HTTP_REQUEST_SECONDS.labels(endpoint).observe(seconds)
+    HTTP_RESPONSES.labels(endpoint, status).inc()
+
+def metrics_page(authorization):
+    """
+    Prometheus text exposition of this process's metrics
+    """
+    if METRICS_TOKEN and not hmac.compare_digest(authorization or '', f'Bearer {METRICS_TOKEN}'):
+        return {'error': 'Unauthorized'}, 401
+    return metrics.REGISTRY.render(), 200, {
+        'Content-Type': metrics.CONTENT_TYPE,
+        'Cache-Control': 'no-store'
+    }
+
+def initialize_admins(db):
+    """
+    Initialize admin users from environment variables
+    This is used for first-time setup on deployed environments
+    """
+    # Get admin user IDs from environment
+    admin_user_ids = os.getenv('ADMIN_USER_IDS', '')
+
+    if not admin_user_ids:
+        return {'error': 'No admin user IDs configured'}, 400
+
+    # Parse admin IDs
+    admin_ids = [int(uid.strip()) for uid in admin_user_ids.split(',') if uid.strip()]
+
+    if not admin_ids:
+        return {'error': 'Invalid admin user IDs format'}, 400
+
+    # Add all configured admins
+    added_count = 0
+    for admin_id in admin_ids:
+        success = db.add_admin(admin_id)
+        if success:
+            added_count += 1
+
+    return {
+        'message': f'Admin initialization complete',
+        'admins_added': added_count,
+        'admin_ids': admin_ids
+    }, 200
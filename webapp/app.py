@@ -1,161 +1,178 @@
 import os
-import hashlib
-import hmac
-import json
-import urllib.parse
-import asyncio
-import threading
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify
-from flask_cors import CORS
 import sys
 
 # Add parent directory to path to import database module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database import SecurityDatabase
-from notifications import NotificationService
-from dotenv import load_dotenv
+from startup_profile import StartupProfile
+
+# Created before the heavy imports below so they show up in the profile
+startup_profile = StartupProfile('webapp')
+
+import asyncio
+import threading
+import time
+from flask import Flask, Response, g, request, jsonify
+from flask_cors import CORS
 
-# Load environment variables
-load_dotenv()
+import bulk_io
+import metrics
+import profiling
+import tracing
+from database import SecurityDatabase, parse_admin_ids
+from report_search import ReportSearch
+from data_version import DataVersions
+from webapp import api
+from webapp.api import BOT_TOKEN, validate_telegram_data, extract_user_from_init_data
+from webapp.assets import AssetBundle
+from webapp.encoding import FastJSONProvider, compressible, encode_response
+from webapp.report_stream import ReportBroadcaster, SSE_HEADERS, parse_last_event_id, stream_events
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
+startup_profile.mark('imports')
+
 # Initialize database
 db = SecurityDatabase(os.getenv('DATABASE_PATH', '../security_reports.db'))
+startup_profile.mark('database')
+
+# HTML shell and hashed CSS/JS, precompiled by `python -m webapp.assets`
+assets = AssetBundle.load()
+if assets.compiled_at_startup:
+    print("ℹ️  No current asset build; compiled the Mini App page at startup (run: python -m webapp.assets)")
+startup_profile.mark('assets')
 
-# Bot token for authentication
-BOT_TOKEN = os.getenv('BOT_TOKEN')
+# Change detection for ETags; usually answers without touching SQLite
+versions = DataVersions(db)
 
-# Initialize notification service
-notification_service = NotificationService(BOT_TOKEN, db) if BOT_TOKEN else None
+# Report search; its typo vocabulary is built on the first query
+search = ReportSearch(db)
 
-def validate_telegram_data(init_data):
+# Live report feed; each stream is closed after this long and the client resumes
+broadcaster = ReportBroadcaster(db, versions, api.report_to_dict)
+STREAM_MAX_SECONDS = int(os.getenv('STREAM_MAX_SECONDS', 300))
+metrics.REGISTRY.gauge(
+    'report_stream_subscribers', 'Open live report streams', function=lambda: broadcaster.subscriber_count
+)
+
+# Notification service is created on first use: importing telegram dominates cold start
+_notification_service = None
+
+def get_notification_service():
     """
-    Validate Telegram Mini App init data
+    Get the notification service, creating it on first call
     """
-    if not init_data or not BOT_TOKEN:
-        return False
-    
-    try:
-        # Parse the init data
-        parsed_data = urllib.parse.parse_qsl(init_data)
-        data_dict = dict(parsed_data)
-        
-        # Extract hash
-        received_hash = data_dict.get('hash', '')
-        if not received_hash:
-            return False
-        
-        # Remove hash from data
-        del data_dict['hash']
-        
-        # Create data check string
-        data_check_arr = []
-        for key, value in sorted(data_dict.items()):
-            data_check_arr.append(f"{key}={value}")
-        data_check_string = '\n'.join(data_check_arr)
-        
-        # Create secret key
-        secret_key = hmac.new(
-            "WebAppData".encode('utf-8'), 
-            BOT_TOKEN.encode('utf-8'), 
-            hashlib.sha256
-        ).digest()
-        
-        # Calculate hash
-        calculated_hash = hmac.new(
-            secret_key, 
-            data_check_string.encode('utf-8'), 
-            hashlib.sha256
-        ).hexdigest()
-        
-        return calculated_hash == received_hash
-    except Exception as e:
-        print(f"Telegram data validation error: {e}")
-        return False
+    global _notification_service
+    if _notification_service is None and BOT_TOKEN:
+        from notifications import NotificationService
+        _notification_service = NotificationService(BOT_TOKEN, db)
+    return _notification_service
 
-def extract_user_from_init_data(init_data):
+def respond(handler, *args):
     """
-    Extract user information from Telegram init data
+    Run an API handler and turn its (body, status[, headers]) result into a JSON response
     """
     try:
-        parsed_data = urllib.parse.parse_qsl(init_data)
-        data_dict = dict(parsed_data)
-        
-        if 'user' in data_dict:
-            user_data = json.loads(data_dict['user'])
-            return user_data
-        return None
+        body, status, *headers = handler(*args)
+        headers = headers[0] if headers else {}
+        if status == 304:
+            return '', 304, headers
+        return jsonify(body), status, headers
     except Exception as e:
-        print(f"Error extracting user data: {e}")
-        return None
+        return jsonify({'error': str(e)}), 500
+
+def init_data_header():
+    return request.headers.get('X-Telegram-Init-Data', '')
+
+def session_token_header():
+    return request.headers.get('X-Session-Token', '')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def begin_request_profile():
+    g.profile = profiling.PROFILER.begin()
+
+@app.teardown_request
+def end_request_profile(exc):
+    """
+    Stop profiling the request and count it towards the running profile, if any
+    """
+    profiling.PROFILER.end(g.pop('profile', None))
+
+# Registered before compress_response so it runs after it: compression is part of the cost
+@app.after_request
+def record_request(response):
+    """
+    Observe request latency and count the response by route and status
+
+    A streamed response is recorded when its headers are ready, not when the stream ends.
+    """
+    started = g.pop('request_started', None)
+    if started is not None:
+        api.record_request(request.endpoint, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """
+    Compress JSON and page responses for clients that accept it
+    """
+    if compressible(response) and not response.is_streamed:
+        body = encode_response(response, response.get_data(), request.headers.get('Accept-Encoding'))
+        if body is not None:
+            response.set_data(body)
+    return response
+
+def asset_response(result):
+    """
+    Turn an AssetBundle (body, status, headers) result into a response
+    """
+    if result is None:
+        return jsonify({'error': 'Not found'}), 404
+    body, status, headers = result
+    return Response(body, status=status, headers=headers)
 
 @app.route('/')
 def index():
     """
-    Serve the Mini App main page
+    Serve the Mini App shell from memory
     """
-    return render_template('index.html')
+    return asset_response(assets.page(request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match')))
+
+@app.route('/assets/<name>')
+def asset(name):
+    """
+    Serve a hashed, immutable Mini App asset from memory
+    """
+    return asset_response(
+        assets.asset(name, request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'))
+    )
 
 @app.route('/api/user/permissions', methods=['POST'])
 def check_user_permissions():
     """
     Check if user is admin or focal person
     """
-    try:
-        init_data = request.headers.get('X-Telegram-Init-Data', '')
-        
-        # For development, allow requests without validation
-        # In production, uncomment the validation below
-        # if not validate_telegram_data(init_data):
-        #     return jsonify({'error': 'Invalid request'}), 401
-        
-        data = request.json
-        user_id = data.get('user_id')
-        
-        if not user_id:
-            return jsonify({'error': 'User ID required'}), 400
-        
-        is_admin = db.is_admin(user_id)
-        is_focal_person = db.is_focal_person(user_id)
-        
-        return jsonify({
-            'is_admin': is_admin,
-            'is_focal_person': is_focal_person
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return respond(api.check_user_permissions, db, init_data_header(), request.json, versions)
+
+@app.route('/api/bootstrap', methods=['GET'])
+def bootstrap():
+    """
+    Permissions, reports, location status and focal people for Mini App startup
+    """
+    return respond(api.bootstrap, db, init_data_header(), request.args, session_token_header(), versions)
 
 @app.route('/api/reports', methods=['GET'])
 def get_reports():
     """
     Get all security reports
     """
-    try:
-        limit = request.args.get('limit', 20, type=int)
-        location = request.args.get('location')
-        
-        if location:
-            reports_data = db.get_reports_by_location(location, limit)
-        else:
-            reports_data = db.get_latest_reports(limit)
-        
-        reports = []
-        for report in reports_data:
-            reports.append({
-                'location': report[0],
-                'status': report[1],
-                'recommended_action': report[2],
-                'reporter_name': report[3],
-                'timestamp': report[4]
-            })
-        
-        return jsonify(reports)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return respond(api.get_reports, db, request.args, request.headers, versions)
 
 @app.route('/api/reports', methods=['POST'])
 def create_report():
@@ -163,217 +180,170 @@ def create_report():
     Create a new security report
     """
     try:
-        init_data = request.headers.get('X-Telegram-Init-Data', '')
-        
-        # For development, allow requests without validation
-        # In production, uncomment the validation below
-        # if not validate_telegram_data(init_data):
-        #     return jsonify({'error': 'Invalid request'}), 401
-        
-        data = request.json
-        user_id = data.get('user_id')
-        user_name = data.get('user_name', f'User{user_id}')
-        location = data.get('location', '').strip()
-        status = data.get('status', '').strip()
-        recommended_action = data.get('recommended_action', '').strip()
-        
-        # Validate required fields
-        if not all([user_id, location, status, recommended_action]):
-            return jsonify({'error': 'All fields are required'}), 400
-        
-        # Validate user permissions
-        if not (db.is_admin(user_id) or db.is_focal_person(user_id)):
-            return jsonify({'error': 'Unauthorized to submit reports'}), 403
-        
-        # Validate location format (letters and spaces only)
-        import re
-        if not re.match(r'^[a-zA-Z\s]+$', location):
-            return jsonify({'error': 'Location must contain only letters and spaces'}), 400
-        
-        # Add report to database
-        success = db.add_security_report(
-            location=location,
-            status=status,
-            recommended_action=recommended_action,
-            reporter_id=user_id,
-            reporter_name=user_name
-        )
-        
-        if success:
+        # One trace per report, continued by the notification thread
+        with tracing.TRACER.span('report.submit', source='webapp') as trace:
+            body, status, alert = api.create_report(
+                db, init_data_header(), request.json, session_token_header(), versions, request.headers
+            )
+            trace.set('status_code', status)
+            
+            # Push the new report to live streams without waiting for the next poll
+            if alert:
+                trace.set('location', alert['location'])
+                broadcaster.notify()
+            
             # Send push notifications asynchronously in a separate thread
-            if notification_service:
+            notification_service = get_notification_service()
+            if alert and notification_service:
                 def send_notifications():
                     """Send notifications in a separate thread with its own event loop"""
+                    loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(loop)
                     try:
-                        # Create new event loop for this thread
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        
-                        try:
-                            # Send to subscribers
-                            notification_result = loop.run_until_complete(
-                                notification_service.send_security_alert(
-                                    location=location,
-                                    status=status,
-                                    recommended_action=recommended_action,
-                                    reporter_name=user_name
-                                )
-                            )
-                            
-                            # Send to admins
-                            admin_result = loop.run_until_complete(
-                                notification_service.send_admin_alert(
-                                    location=location,
-                                    status=status,
-                                    recommended_action=recommended_action,
-                                    reporter_name=user_name,
-                                    reporter_id=user_id
-                                )
-                            )
-                            
-                            print(f"Notifications sent: {notification_result['success']} subscribers, {admin_result['success']} admins")
-                        finally:
-                            loop.close()
-                    except Exception as e:
-                        print(f"Error sending notifications: {e}")
+                        loop.run_until_complete(api.send_report_notifications(notification_service, alert, trace))
+                    finally:
+                        loop.close()
                 
                 # Start notification thread (non-blocking)
-                notification_thread = threading.Thread(target=send_notifications)
-                notification_thread.daemon = True
-                notification_thread.start()
-            
-            return jsonify({'message': 'Report created successfully'}), 201
-        else:
-            return jsonify({'error': 'Failed to create report'}), 500
-            
+                with tracing.TRACER.span('notify.enqueue'):
+                    notification_thread = threading.Thread(target=send_notifications)
+                    notification_thread.daemon = True
+                    notification_thread.start()
+        
+        return jsonify(body), status
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/reports/stream', methods=['GET'])
+def stream_reports():
+    """
+    Stream newly inserted reports as Server-Sent Events
+    """
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    )
+    return Response(
+        stream_events(broadcaster, last_event_id, STREAM_MAX_SECONDS),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+@app.route('/api/search', methods=['GET'])
+def search_reports():
+    """
+    Search reports by location, status and recommended action
+    """
+    return respond(api.search_reports, search, request.args)
+
+@app.route('/api/locations/<path:location>', methods=['GET'])
+def location_overview(location):
+    """
+    A location's place in the hierarchy and its worst current report
+    """
+    return respond(api.location_overview, db, location)
+
 @app.route('/api/admin/focal-people', methods=['GET'])
 def get_focal_people():
     """
     Get all focal people (admin only)
     """
-    try:
-        init_data = request.headers.get('X-Telegram-Init-Data', '')
-        
-        # For development, allow requests without validation
-        # In production, uncomment the validation below
-        # if not validate_telegram_data(init_data):
-        #     return jsonify({'error': 'Invalid request'}), 401
-        
-        # Extract user from init data or use a default for development
-        user_data = extract_user_from_init_data(init_data)
-        user_id = user_data.get('id') if user_data else 994550828  # Your admin ID for development
-        
-        # Check admin permissions
-        if not db.is_admin(user_id):
-            return jsonify({'error': 'Admin access required'}), 403
-        
-        focal_people_data = db.get_all_focal_people()
-        focal_people = []
-        
-        for fp in focal_people_data:
-            focal_people.append({
-                'user_id': fp[0],
-                'name': fp[1],
-                'added_date': fp[2]
-            })
-        
-        return jsonify(focal_people)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return respond(
+        api.get_focal_people, db, init_data_header(), request.headers, versions, request.args, session_token_header()
+    )
 
 @app.route('/api/admin/focal-people', methods=['POST'])
 def add_focal_person():
     """
     Add a new focal person (admin only)
     """
-    try:
-        init_data = request.headers.get('X-Telegram-Init-Data', '')
-        
-        # For development, allow requests without validation
-        # In production, uncomment the validation below
-        # if not validate_telegram_data(init_data):
-        #     return jsonify({'error': 'Invalid request'}), 401
-        
-        # Extract user from init data or use a default for development
-        user_data = extract_user_from_init_data(init_data)
-        admin_user_id = user_data.get('id') if user_data else 994550828  # Your admin ID for development
-        
-        # Check admin permissions
-        if not db.is_admin(admin_user_id):
-            return jsonify({'error': 'Admin access required'}), 403
-        
-        data = request.json
-        focal_user_id = data.get('user_id')
-        name = data.get('name', '').strip()
-        
-        # Validate required fields
-        if not all([focal_user_id, name]):
-            return jsonify({'error': 'User ID and name are required'}), 400
-        
-        # Validate name format (letters and spaces only)
-        import re
-        if not re.match(r'^[a-zA-Z\s]+$', name):
-            return jsonify({'error': 'Name must contain only letters and spaces'}), 400
-        
-        # Add focal person to database
-        success = db.add_focal_person(
-            telegram_user_id=focal_user_id,
-            name=name,
-            added_by=admin_user_id
-        )
-        
-        if success:
-            return jsonify({'message': 'Focal person added successfully'}), 201
-        else:
-            return jsonify({'error': 'Failed to add focal person or already exists'}), 500
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return respond(api.add_focal_person, db, init_data_header(), request.json, session_token_header(), versions)
 
 @app.route('/api/admin/focal-people/<int:focal_user_id>', methods=['DELETE'])
 def remove_focal_person(focal_user_id):
     """
     Remove a focal person (admin only)
     """
+    return respond(api.remove_focal_person, db, init_data_header(), focal_user_id, session_token_header(), versions)
+
+@app.route('/api/admin/<any("focal-people", "subscribers"):roster>/import', methods=['POST'])
+def import_roster(roster):
+    """
+    Bulk import focal people or subscribers from CSV or JSONL (admin only)
+    """
+    return respond(
+        api.import_roster, db, init_data_header(), roster.replace('-', '_'), bulk_io.text_lines(request.stream),
+        request.args, request.content_type, session_token_header(), versions
+    )
+
+@app.route('/api/admin/<any("focal-people", "subscribers"):roster>/export', methods=['GET'])
+def export_roster(roster):
+    """
+    Export focal people or subscribers as CSV or JSONL (admin only)
+    """
     try:
-        init_data = request.headers.get('X-Telegram-Init-Data', '')
-        
-        # For development, allow requests without validation
-        # In production, uncomment the validation below
-        # if not validate_telegram_data(init_data):
-        #     return jsonify({'error': 'Invalid request'}), 401
-        
-        # Extract user from init data or use a default for development
-        user_data = extract_user_from_init_data(init_data)
-        admin_user_id = user_data.get('id') if user_data else 994550828  # Your admin ID for development
-        
-        # Check admin permissions
-        if not db.is_admin(admin_user_id):
-            return jsonify({'error': 'Admin access required'}), 403
-        
-        # Remove focal person from database
-        success = db.remove_focal_person(focal_user_id)
-        
-        if success:
-            return jsonify({'message': 'Focal person removed successfully'}), 200
-        else:
-            return jsonify({'error': 'Failed to remove focal person or not found'}), 404
-            
+        body, status, *headers = api.export_roster(
+            db, init_data_header(), roster.replace('-', '_'), request.args, session_token_header(), versions
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    if status != 200:
+        return jsonify(body), status
+    # Each chunk is one short query, so rows are never all in memory
+    return Response(body, headers=headers[0])
+
+@app.route('/api/admin/dbstats', methods=['GET'])
+def get_db_stats():
+    """
+    Slowest database statements in this worker (admin only)
+    """
+    return respond(api.get_db_stats, db, init_data_header(), request.args, session_token_header(), versions)
+
+@app.route('/api/admin/profile', methods=['GET'])
+def get_profile():
+    """
+    Running profile or the last profile's top functions in this worker (admin only)
+    """
+    return respond(api.get_profile, db, init_data_header(), request.args, session_token_header(), versions)
+
+@app.route('/api/admin/profile', methods=['POST'])
+def start_profile():
+    """
+    Start profiling this worker's requests (admin only)
+    """
+    return respond(
+        api.start_profile, db, init_data_header(), request.get_json(silent=True), session_token_header(), versions
+    )
+
+@app.route('/api/admin/profile', methods=['DELETE'])
+def stop_profile():
+    """
+    Stop the running profile in this worker (admin only)
+    """
+    return respond(api.stop_profile, db, init_data_header(), session_token_header(), versions)
 
 @app.route('/health')
 def health_check():
     """
     Health check endpoint
     """
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
-    })
+    return respond(api.health_check)
+
+@app.route('/health/ready')
+def readiness_check():
+    """
+    Readiness probe: 503 when the database, notification backlog or live feed poller is unhealthy
+    """
+    return respond(api.readiness_check, db, broadcaster)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus metrics for this worker process
+    """
+    body, status, *headers = api.metrics_page(request.headers.get('Authorization'))
+    if status != 200:
+        return jsonify(body), status
+    return Response(body, headers=headers[0])
 
 @app.route('/api/admin/initialize', methods=['POST'])
 def initialize_admin():
@@ -381,58 +351,30 @@ def initialize_admin():
     Initialize admin users from environment variables
     This is used for first-time setup on deployed environments
     """
-    try:
-        # Get admin user IDs from environment
-        admin_user_ids = os.getenv('ADMIN_USER_IDS', '')
-        
-        if not admin_user_ids:
-            return jsonify({'error': 'No admin user IDs configured'}), 400
-        
-        # Parse admin IDs
-        admin_ids = [int(uid.strip()) for uid in admin_user_ids.split(',') if uid.strip()]
-        
-        if not admin_ids:
-            return jsonify({'error': 'Invalid admin user IDs format'}), 400
-        
-        # Add all configured admins
-        added_count = 0
-        for admin_id in admin_ids:
-            success = db.add_admin(admin_id)
-            if success:
-                added_count += 1
-        
-        return jsonify({
-            'message': f'Admin initialization complete',
-            'admins_added': added_count,
-            'admin_ids': admin_ids
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return respond(api.initialize_admins, db)
 
 def auto_initialize_admins():
     """
     Automatically initialize admin users from environment variables on startup
     """
     try:
-        admin_user_ids = os.getenv('ADMIN_USER_IDS', '')
-        if admin_user_ids:
-            admin_ids = [int(uid.strip()) for uid in admin_user_ids.split(',') if uid.strip()]
-            for admin_id in admin_ids:
-                db.add_admin(admin_id)
-            print(f"✅ Auto-initialized admins: {admin_ids}")
+        admin_ids = parse_admin_ids(os.getenv('ADMIN_USER_IDS', ''))
+        if admin_ids:
+            # Only writes when the configured admins changed since the last boot
+            added = db.ensure_admins(admin_ids)
+            print(f"✅ Auto-initialized admins: {admin_ids} ({added} new)")
     except Exception as e:
         print(f"⚠️ Error auto-initializing admins: {e}")
 
+startup_profile.mark('routes')
+print(startup_profile.summary())
+
 if __name__ == '__main__':
     # Production configuration
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', 5000))
     debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
-    # Initialize database on startup
-    db.init_database()
-    
     # Auto-initialize admins from environment variables
     auto_initialize_admins()
     
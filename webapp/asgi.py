@@ -0,0 +1,450 @@
+"""
+ASGI version of the Mini App API
+
+Serves the same routes as app.py on a single event loop. Database calls run in
+a thread pool executor so they never block the loop, and notifications are
+scheduled as tasks on the app's own loop instead of a new thread and event
+loop per report.
+
+Run with:
+    uvicorn webapp.asgi:app --host 0.0.0.0 --port 10000
+    hypercorn webapp.asgi:app --bind 0.0.0.0:10000
+"""
+import os
+import sys
+
+# Add parent directory to path to import database module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from startup_profile import StartupProfile
+
+# Created before the heavy imports below so they show up in the profile
+startup_profile = StartupProfile('webapp-asgi')
+
+import asyncio
+import contextvars
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+
+import bulk_io
+import metrics
+import profiling
+import tracing
+from database import SecurityDatabase, parse_admin_ids
+from report_search import ReportSearch
+from data_version import DataVersions
+from webapp import api
+from webapp.api import BOT_TOKEN
+from webapp.assets import AssetBundle
+from webapp.encoding import FastJSONProvider, compressible, encode_response
+from webapp.report_stream import ReportBroadcaster, SSE_HEADERS, async_stream_events, parse_last_event_id
+
+app = cors(Quart(__name__), allow_origin='*')
+app.json = FastJSONProvider(app)
+
+startup_profile.mark('imports')
+
+# Initialize database
+db = SecurityDatabase(os.getenv('DATABASE_PATH', '../security_reports.db'))
+startup_profile.mark('database')
+
+# HTML shell and hashed CSS/JS, precompiled by `python -m webapp.assets`
+assets = AssetBundle.load()
+if assets.compiled_at_startup:
+    print("ℹ️  No current asset build; compiled the Mini App page at startup (run: python -m webapp.assets)")
+startup_profile.mark('assets')
+
+# Change detection for ETags; usually answers without touching SQLite
+versions = DataVersions(db)
+
+# SQLite calls are short; a small pool keeps them off the event loop
+db_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('DB_EXECUTOR_WORKERS', 8)),
+    thread_name_prefix='db'
+)
+
+# Report search; its typo vocabulary is built on the first query
+search = ReportSearch(db)
+
+# Live report feed; each stream is closed after this long and the client resumes
+broadcaster = ReportBroadcaster(db, versions, api.report_to_dict)
+STREAM_MAX_SECONDS = int(os.getenv('STREAM_MAX_SECONDS', 300))
+metrics.REGISTRY.gauge(
+    'report_stream_subscribers', 'Open live report streams', function=lambda: broadcaster.subscriber_count
+)
+
+# Bulk imports are buffered in memory up to this many bytes, then on disk
+IMPORT_SPOOL_SIZE = 1024 * 1024
+
+notification_service = None
+notification_tasks = set()
+
+# Event loop lag: how late a short sleep wakes up; /health/ready checks the worst recent sample
+LOOP_LAG_INTERVAL = 0.5
+loop_lag = deque(maxlen=10)
+lag_monitor = None
+metrics.REGISTRY.gauge(
+    'event_loop_lag_seconds', 'Worst event loop lag over the last few seconds', function=lambda: max(loop_lag, default=0)
+)
+
+async def run_db(handler, *args):
+    """
+    Run a blocking API handler in the database executor
+    """
+    loop = asyncio.get_running_loop()
+    # Carry the current trace span into the worker thread, and profile the handler there while a profile runs
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, partial(context.run, profiling.PROFILER.run, handler, *args))
+
+async def monitor_loop_lag():
+    """
+    Sample event loop lag until the app stops; anything blocking the loop makes the sleep wake late
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag.append(max(0.0, loop.time() - started - LOOP_LAG_INTERVAL))
+
+async def respond(handler, *args):
+    """
+    Run an API handler off the loop and turn its (body, status[, headers]) result into a JSON response
+    """
+    try:
+        body, status, *headers = await run_db(handler, *args)
+        headers = headers[0] if headers else {}
+        if status == 304:
+            return '', 304, headers
+        return jsonify(body), status, headers
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+async def iterate_in_executor(iterator):
+    """
+    Async generator over a blocking iterator, advancing it in the database executor
+    """
+    done = object()
+    while True:
+        item = await run_db(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+async def spooled_body_lines():
+    """
+    Request body as text lines, spooled to a temporary file once it passes IMPORT_SPOOL_SIZE
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE)
+    async for chunk in request.body:
+        spool.write(chunk)
+    spool.seek(0)
+    return bulk_io.text_lines(spool)
+
+def init_data_header():
+    return request.headers.get('X-Telegram-Init-Data', '')
+
+def session_token_header():
+    return request.headers.get('X-Session-Token', '')
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.teardown_request
+async def count_profiled_request(exc):
+    """
+    Count the request towards the running profile, if any; its handler work was profiled in run_db
+    """
+    profiling.PROFILER.count_call()
+
+# Registered before compress_response so it runs after it: compression is part of the cost
+@app.after_request
+async def record_request(response):
+    """
+    Observe request latency and count the response by route and status
+
+    A streamed response is recorded when its headers are ready, not when the stream ends.
+    """
+    started = g.pop('request_started', None)
+    if started is not None:
+        api.record_request(request.endpoint, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.after_request
+async def compress_response(response):
+    """
+    Compress JSON and page responses for clients that accept it
+    """
+    if compressible(response):
+        data = await response.get_data()
+        body = await run_db(encode_response, response, data, request.headers.get('Accept-Encoding'))
+        if body is not None:
+            response.set_data(body)
+    return response
+
+@app.before_serving
+async def startup():
+    """
+    Create the notification service and seed admins once the loop is running
+    """
+    global notification_service, lag_monitor
+    lag_monitor = asyncio.create_task(monitor_loop_lag())
+    if BOT_TOKEN:
+        from notifications import NotificationService
+        notification_service = NotificationService(BOT_TOKEN, db)
+
+    admin_ids = parse_admin_ids(os.getenv('ADMIN_USER_IDS', ''))
+    if admin_ids:
+        added = await run_db(db.ensure_admins, admin_ids)
+        print(f"✅ Auto-initialized admins: {admin_ids} ({added} new)")
+
+    startup_profile.mark('startup')
+    print(startup_profile.summary())
+
+@app.after_serving
+async def shutdown():
+    """
+    Let in-flight notifications finish, then stop the executor
+    """
+    if lag_monitor is not None:
+        lag_monitor.cancel()
+    if notification_tasks:
+        await asyncio.gather(*notification_tasks, return_exceptions=True)
+    db_executor.shutdown(wait=True)
+
+def asset_response(result):
+    """
+    Turn an AssetBundle (body, status, headers) result into a response
+    """
+    if result is None:
+        return jsonify({'error': 'Not found'}), 404
+    body, status, headers = result
+    return Response(body, status=status, headers=headers)
+
+@app.route('/')
+async def index():
+    """
+    Serve the Mini App shell from memory
+    """
+    return asset_response(assets.page(request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match')))
+
+@app.route('/assets/<name>')
+async def asset(name):
+    """
+    Serve a hashed, immutable Mini App asset from memory
+    """
+    return asset_response(
+        assets.asset(name, request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'))
+    )
+
+@app.route('/api/user/permissions', methods=['POST'])
+async def check_user_permissions():
+    """
+    Check if user is admin or focal person
+    """
+    return await respond(api.check_user_permissions, db, init_data_header(), await request.get_json(), versions)
+
+@app.route('/api/bootstrap', methods=['GET'])
+async def bootstrap():
+    """
+    Permissions, reports, location status and focal people for Mini App startup
+    """
+    return await respond(api.bootstrap, db, init_data_header(), request.args, session_token_header(), versions)
+
+@app.route('/api/reports', methods=['GET'])
+async def get_reports():
+    """
+    Get all security reports
+    """
+    return await respond(api.get_reports, db, request.args, request.headers, versions)
+
+async def notify_report(alert, trace):
+    """
+    Fan out a new report's notifications, looking up the recipients in the database executor
+    """
+    with tracing.TRACER.activate(trace):
+        recipients = await run_db(api.report_recipients, db, alert)
+    await api.send_report_notifications(notification_service, alert, trace, recipients)
+
+@app.route('/api/reports', methods=['POST'])
+async def create_report():
+    """
+    Create a new security report
+    """
+    try:
+        # One trace per report, continued by the notification task
+        with tracing.TRACER.span('report.submit', source='webapp') as trace:
+            body, status, alert = await run_db(
+                api.create_report, db, init_data_header(), await request.get_json(), session_token_header(), versions,
+                request.headers
+            )
+            trace.set('status_code', status)
+
+            # Push the new report to live streams without waiting for the next poll
+            if alert:
+                trace.set('location', alert['location'])
+                broadcaster.notify()
+
+            # Fan out on this loop; keep a reference so the task isn't garbage collected
+            if alert and notification_service:
+                with tracing.TRACER.span('notify.enqueue'):
+                    task = asyncio.create_task(notify_report(alert, trace))
+                    notification_tasks.add(task)
+                    task.add_done_callback(notification_tasks.discard)
+
+        return jsonify(body), status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reports/stream', methods=['GET'])
+async def stream_reports():
+    """
+    Stream newly inserted reports as Server-Sent Events
+    """
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    )
+    response = Response(
+        async_stream_events(broadcaster, last_event_id, STREAM_MAX_SECONDS, run_db),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+    # Streams end on their own after STREAM_MAX_SECONDS
+    response.timeout = None
+    return response
+
+@app.route('/api/search', methods=['GET'])
+async def search_reports():
+    """
+    Search reports by location, status and recommended action
+    """
+    return await respond(api.search_reports, search, request.args)
+
+@app.route('/api/locations/<path:location>', methods=['GET'])
+async def location_overview(location):
+    """
+    A location's place in the hierarchy and its worst current report
+    """
+    return await respond(api.location_overview, db, location)
+
+@app.route('/api/admin/focal-people', methods=['GET'])
+async def get_focal_people():
+    """
+    Get all focal people (admin only)
+    """
+    return await respond(
+        api.get_focal_people, db, init_data_header(), request.headers, versions, request.args, session_token_header()
+    )
+
+@app.route('/api/admin/focal-people', methods=['POST'])
+async def add_focal_person():
+    """
+    Add a new focal person (admin only)
+    """
+    return await respond(
+        api.add_focal_person, db, init_data_header(), await request.get_json(), session_token_header(), versions
+    )
+
+@app.route('/api/admin/focal-people/<int:focal_user_id>', methods=['DELETE'])
+async def remove_focal_person(focal_user_id):
+    """
+    Remove a focal person (admin only)
+    """
+    return await respond(api.remove_focal_person, db, init_data_header(), focal_user_id, session_token_header(), versions)
+
+@app.route('/api/admin/<any("focal-people", "subscribers"):roster>/import', methods=['POST'])
+async def import_roster(roster):
+    """
+    Bulk import focal people or subscribers from CSV or JSONL (admin only)
+    """
+    return await respond(
+        api.import_roster, db, init_data_header(), roster.replace('-', '_'), await spooled_body_lines(),
+        request.args, request.content_type, session_token_header(), versions
+    )
+
+@app.route('/api/admin/<any("focal-people", "subscribers"):roster>/export', methods=['GET'])
+async def export_roster(roster):
+    """
+    Export focal people or subscribers as CSV or JSONL (admin only)
+    """
+    try:
+        body, status, *headers = await run_db(
+            api.export_roster, db, init_data_header(), roster.replace('-', '_'), request.args,
+            session_token_header(), versions
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if status != 200:
+        return jsonify(body), status
+    return Response(iterate_in_executor(body), headers=headers[0])
+
+@app.route('/api/admin/dbstats', methods=['GET'])
+async def get_db_stats():
+    """
+    Slowest database statements in this worker (admin only)
+    """
+    return await respond(
+        api.get_db_stats, db, init_data_header(), request.args, session_token_header(), versions
+    )
+
+@app.route('/api/admin/profile', methods=['GET'])
+async def get_profile():
+    """
+    Running profile or the last profile's top functions in this worker (admin only)
+    """
+    return await respond(api.get_profile, db, init_data_header(), request.args, session_token_header(), versions)
+
+@app.route('/api/admin/profile', methods=['POST'])
+async def start_profile():
+    """
+    Start profiling this worker's requests (admin only)
+    """
+    return await respond(
+        api.start_profile, db, init_data_header(), await request.get_json(silent=True), session_token_header(), versions
+    )
+
+@app.route('/api/admin/profile', methods=['DELETE'])
+async def stop_profile():
+    """
+    Stop the running profile in this worker (admin only)
+    """
+    return await respond(api.stop_profile, db, init_data_header(), session_token_header(), versions)
+
+@app.route('/health')
+async def health_check():
+    """
+    Health check endpoint
+    """
+    body, status = api.health_check()
+    return jsonify(body), status
+
+@app.route('/health/ready')
+async def readiness_check():
+    """
+    Readiness probe: 503 when the database, notification backlog, live feed poller or event loop is unhealthy
+    """
+    return await respond(api.readiness_check, db, broadcaster, max(loop_lag, default=0.0))
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    """
+    Prometheus metrics for this worker process
+    """
+    body, status, *headers = api.metrics_page(request.headers.get('Authorization'))
+    if status != 200:
+        return jsonify(body), status
+    return Response(body, headers=headers[0])
+
+@app.route('/api/admin/initialize', methods=['POST'])
+async def initialize_admin():
+    """
+    Initialize admin users from environment variables
+    This is used for first-time setup on deployed environments
+    """
+    return await respond(api.initialize_admins, db)
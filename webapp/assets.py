@@ -0,0 +1,252 @@
+"""
+Precompiled Mini App assets
+
+`python -m webapp.assets` splits the inline CSS and JavaScript out of
+templates/index.html, minifies them and names each file after a hash of
+its content. It writes them, with gzip and (when brotli is installed)
+brotli variants, to static/dist along with the rewritten HTML shell and a
+manifest. The web apps load the build into memory at startup and serve
+hashed files as immutable, so after the first open the browser only
+revalidates the HTML shell. Without a build, or when the template has
+changed since, the same build runs in memory at startup instead.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from webapp.encoding import brotli, choose_encoding
+
+WEBAPP_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(WEBAPP_DIR, 'templates', 'index.html')
+DIST_DIR = os.path.join(WEBAPP_DIR, 'static', 'dist')
+MANIFEST_NAME = 'manifest.json'
+
+# URL prefix of hashed assets
+ASSETS_URL = '/assets/'
+
+# Hashed names change with their content, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# The shell names the current assets: always revalidate it
+SHELL_CACHE_CONTROL = 'no-cache'
+
+CONTENT_TYPES = {
+    '.css': 'text/css; charset=utf-8',
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+}
+
+# Precompressed variants, best first, and their file suffixes
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+_INLINE_STYLE = re.compile(r'[ \t]*<style>(.*?)</style>\n?', re.S)
+_INLINE_SCRIPT = re.compile(r'[ \t]*<script>(.*?)</script>\n?', re.S)
+
+def minify_css(css):
+    """
+    Drop comments and insignificant whitespace from a stylesheet
+    """
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+def minify_js(js):
+    """
+    Drop indentation, blank lines and whole-line comments from a script
+
+    Line breaks are kept, so automatic semicolon insertion behaves as before
+    and no tokenizer is needed; the hashed file is gzipped anyway.
+    """
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+def minify_html(html):
+    """
+    Drop comments, indentation and blank lines from the HTML shell
+    """
+    html = re.sub(r'<!--.*?-->', '', html, flags=re.S)
+    return '\n'.join(line.strip() for line in html.splitlines() if line.strip())
+
+def hashed_name(stem, extension, data):
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+def source_hash(template_path=TEMPLATE_PATH):
+    with open(template_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def compile_page(html):
+    """
+    Split a page into a shell and hashed assets
+
+    Returns:
+        (shell bytes, {file name: bytes}) with the inline style and script
+        replaced by links to the named files
+    """
+    files = {}
+
+    def extract(pattern, stem, extension, minify, tag):
+        nonlocal html
+        match = pattern.search(html)
+        if match is None:
+            return
+        data = minify(match.group(1)).encode('utf-8')
+        name = hashed_name(stem, extension, data)
+        files[name] = data
+        html = html[:match.start()] + tag.format(url=ASSETS_URL + name) + '\n' + html[match.end():]
+
+    extract(_INLINE_STYLE, 'app', '.css', minify_css, '<link rel="stylesheet" href="{url}">')
+    extract(_INLINE_SCRIPT, 'app', '.js', minify_js, '<script src="{url}"></script>')
+    return minify_html(html).encode('utf-8'), files
+
+def encode_variants(data):
+    """
+    The identity body plus every precompressed variant this process can produce
+    """
+    variants = {None: data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return variants
+
+class Asset:
+    """
+    One file held in memory with its precompressed variants
+    """
+
+    def __init__(self, name, variants, cache_control):
+        self.name = name
+        self.variants = variants
+        self.cache_control = cache_control
+        self.content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        self.etag = hashlib.sha256(variants[None]).hexdigest()[:16]
+
+    def respond(self, accept_encoding, if_none_match=None):
+        """
+        (body, status, headers) for a request, picking the best precompressed variant
+        """
+        encodings = [encoding for encoding in ENCODING_SUFFIXES if encoding in self.variants]
+        encoding = choose_encoding(accept_encoding, encodings)
+        # Each encoding is a different representation, so it gets its own validator
+        etag = f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+        headers = {
+            'Cache-Control': self.cache_control,
+            'ETag': etag,
+            'Vary': 'Accept-Encoding',
+        }
+
+        if if_none_match and (if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]):
+            return b'', 304, headers
+
+        headers['Content-Type'] = self.content_type
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return self.variants[encoding], 200, headers
+
+class AssetBundle:
+    """
+    The HTML shell and hashed assets, served from memory
+    """
+
+    def __init__(self, shell, files, compiled_at_startup=False):
+        self.shell = Asset('index.html', shell, SHELL_CACHE_CONTROL)
+        self.files = {name: Asset(name, variants, IMMUTABLE_CACHE_CONTROL) for name, variants in files.items()}
+        self.compiled_at_startup = compiled_at_startup
+
+    @classmethod
+    def load(cls, template_path=TEMPLATE_PATH, dist_dir=DIST_DIR):
+        """
+        Load the build from dist_dir, or compile the template in memory if there is no current build
+        """
+        try:
+            with open(os.path.join(dist_dir, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+            if manifest['source'] != source_hash(template_path):
+                raise ValueError('build is older than the template')
+            shell = cls._read_variants(dist_dir, manifest['shell'])
+            files = {name: cls._read_variants(dist_dir, name) for name in manifest['files']}
+            return cls(shell, files)
+        except (OSError, KeyError, ValueError):
+            with open(template_path, encoding='utf-8') as f:
+                shell, files = compile_page(f.read())
+            return cls(
+                encode_variants(shell),
+                {name: encode_variants(data) for name, data in files.items()},
+                compiled_at_startup=True
+            )
+
+    @staticmethod
+    def _read_variants(dist_dir, name):
+        with open(os.path.join(dist_dir, name), 'rb') as f:
+            variants = {None: f.read()}
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            path = os.path.join(dist_dir, name + suffix)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    variants[encoding] = f.read()
+        return variants
+
+    def page(self, accept_encoding, if_none_match=None):
+        """
+        (body, status, headers) for the HTML shell
+        """
+        return self.shell.respond(accept_encoding, if_none_match)
+
+    def asset(self, name, accept_encoding, if_none_match=None):
+        """
+        (body, status, headers) for a hashed asset, or None if there is no such file
+        """
+        asset = self.files.get(name)
+        if asset is None:
+            return None
+        return asset.respond(accept_encoding, if_none_match)
+
+def build(template_path=TEMPLATE_PATH, dist_dir=DIST_DIR):
+    """
+    Compile the template into dist_dir, removing files from earlier builds
+
+    Returns:
+        The manifest that was written
+    """
+    with open(template_path, encoding='utf-8') as f:
+        shell, files = compile_page(f.read())
+
+    os.makedirs(dist_dir, exist_ok=True)
+    written = set()
+    for name, data in [('index.html', shell)] + sorted(files.items()):
+        for encoding, body in encode_variants(data).items():
+            path = os.path.join(dist_dir, name + ENCODING_SUFFIXES.get(encoding, ''))
+            with open(path, 'wb') as f:
+                f.write(body)
+            written.add(os.path.basename(path))
+
+    manifest = {'source': source_hash(template_path), 'shell': 'index.html', 'files': sorted(files)}
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    written.add(MANIFEST_NAME)
+
+    for stale in set(os.listdir(dist_dir)) - written:
+        os.remove(os.path.join(dist_dir, stale))
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--template', default=TEMPLATE_PATH, help='page to compile')
+    parser.add_argument('--output', default=DIST_DIR, help='build directory')
+    args = parser.parse_args()
+
+    manifest = build(args.template, args.output)
+    for name in [manifest['shell']] + manifest['files']:
+        sizes = []
+        for encoding, suffix in [(None, '')] + list(ENCODING_SUFFIXES.items()):
+            path = os.path.join(args.output, name + suffix)
+            if os.path.exists(path):
+                sizes.append(f"{encoding or 'raw'} {os.path.getsize(path) / 1024:.1f} KiB")
+        print(f"{name:28s} {', '.join(sizes)}")
+    if brotli is None:
+        print('brotli not installed: only gzip variants were written')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Authentication for the Mini App API
+
+Telegram initData is verified with an HMAC secret derived once from the bot
+token, and verified payloads are cached until their auth_date expires, so a
+client resending the same initData costs a dict lookup. After verification,
+/api/user/permissions issues a short-lived session token carrying the user's
+roles; later requests present it and are authorized without re-deriving any
+key or querying the database.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import urllib.parse
+
+# How long initData stays valid after Telegram's auth_date
+INIT_DATA_MAX_AGE = int(os.getenv('INIT_DATA_MAX_AGE', 86400))
+
+# Lifetime of session tokens; roles changes also invalidate them immediately
+SESSION_TTL = int(os.getenv('SESSION_TTL', 900))
+
+# Verified initData and session tokens kept in memory per process
+AUTH_CACHE_SIZE = 4096
+
+def webapp_secret_key(bot_token):
+    """
+    HMAC key for initData signatures, as specified by Telegram
+    """
+    return hmac.new(b"WebAppData", bot_token.encode('utf-8'), hashlib.sha256).digest()
+
+def session_secret_key(bot_token):
+    """
+    HMAC key for session tokens: SESSION_SECRET, else derived from the bot token
+    """
+    configured = os.getenv('SESSION_SECRET')
+    if configured:
+        return configured.encode('utf-8')
+    if bot_token:
+        return hmac.new(b"MiniAppSession", bot_token.encode('utf-8'), hashlib.sha256).digest()
+    # Development without a bot token: tokens only last as long as this process
+    return secrets.token_bytes(32)
+
+class ExpiringCache:
+    """
+    Bounded dict of values with an absolute expiry time
+    """
+
+    def __init__(self, max_size=AUTH_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            self._entries.pop(key, None)
+            return None
+        return entry[0]
+
+    def set(self, key, value, expires_at, now):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                for stale in [k for k, (_, expiry) in self._entries.items() if expiry <= now]:
+                    del self._entries[stale]
+                # Still full: drop the oldest insertions
+                while len(self._entries) >= self.max_size:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (value, expires_at)
+
+    def __len__(self):
+        return len(self._entries)
+
+class InitDataVerifier:
+    """
+    Verifies Telegram Mini App initData and caches the result until auth_date expires
+    """
+
+    def __init__(self, bot_token, max_age=INIT_DATA_MAX_AGE):
+        self.secret_key = webapp_secret_key(bot_token) if bot_token else None
+        self.max_age = max_age
+        self.cache = ExpiringCache()
+
+    def verify(self, init_data):
+        """
+        Return the parsed initData fields (with 'user' decoded) if valid and unexpired, else None
+        """
+        if not init_data or self.secret_key is None:
+            return None
+
+        now = time.time()
+        fields = self.cache.get(init_data, now)
+        if fields is not None:
+            return fields
+
+        try:
+            fields = dict(urllib.parse.parse_qsl(init_data))
+            received_hash = fields.pop('hash', '')
+            if not received_hash:
+                return None
+
+            data_check_string = '\n'.join(f"{key}={value}" for key, value in sorted(fields.items()))
+            calculated_hash = hmac.new(
+                self.secret_key,
+                data_check_string.encode('utf-8'),
+                hashlib.sha256
+            ).hexdigest()
+            if not hmac.compare_digest(calculated_hash, received_hash):
+                return None
+
+            expires_at = int(fields.get('auth_date', 0)) + self.max_age
+            if expires_at <= now:
+                return None
+
+            if 'user' in fields:
+                fields['user'] = json.loads(fields['user'])
+        except (ValueError, TypeError) as e:
+            print(f"Telegram data validation error: {e}")
+            return None
+
+        self.cache.set(init_data, fields, expires_at, now)
+        return fields
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+class SessionTokens:
+    """
+    Issues and checks signed, short-lived tokens carrying a user's roles
+
+    A token is base64url(JSON claims) + '.' + base64url(HMAC-SHA256). Claims
+    include a roles generation, so adding or removing an admin or focal
+    person invalidates outstanding tokens rather than waiting for expiry.
+    """
+
+    def __init__(self, secret_key, ttl=SESSION_TTL):
+        self.secret_key = secret_key
+        self.ttl = ttl
+        self.cache = ExpiringCache()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.secret_key, payload.encode('ascii'), hashlib.sha256).digest())
+
+    def issue(self, user_id, is_admin, is_focal_person, roles_generation=None):
+        claims = {
+            'uid': user_id,
+            'adm': int(bool(is_admin)),
+            'fp': int(bool(is_focal_person)),
+            'gen': roles_generation,
+            'exp': int(time.time()) + self.ttl
+        }
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token, roles_generation=None):
+        """
+        Return the token's claims if the signature, expiry and roles generation check out, else None
+        """
+        if not token:
+            return None
+
+        now = time.time()
+        claims = self.cache.get(token, now)
+        if claims is None:
+            payload, _, signature = token.partition('.')
+            try:
+                if not signature or not hmac.compare_digest(self._sign(payload), signature):
+                    return None
+                claims = json.loads(_b64decode(payload))
+            except (ValueError, TypeError):
+                return None
+            if claims.get('exp', 0) <= now:
+                return None
+            self.cache.set(token, claims, claims['exp'], now)
+
+        if roles_generation is not None and claims.get('gen') != roles_generation:
+            return None
+        return claims
@@ -0,0 +1,123 @@
+"""
+Response encoding for the Mini App API
+
+A JSON provider that serializes with orjson when it is installed, and
+Accept-Encoding negotiation that compresses JSON, HTML and script
+responses with brotli (when installed) or gzip. Both the Flask app and the
+ASGI app use these; the apps only differ in how they read a response body.
+"""
+import gzip
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies are sent as is; headers and CPU cost outweigh the savings
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+}
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that uses orjson when available, with the default provider's output
+    """
+
+    def dumps(self, obj, **kwargs):
+        # Formatting options such as indent are only understood by the standard encoder
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.dumps(obj, default=self.default, option=orjson.OPT_SORT_KEYS).decode('utf-8')
+            except TypeError:
+                pass  # e.g. integers beyond 64 bits; the standard encoder copes
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def choose_encoding(accept_encoding, candidates=None):
+    """
+    Pick the best supported Content-Encoding from an Accept-Encoding header, or None
+
+    candidates, best first, defaults to what this process can compress with.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    if candidates is None:
+        candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda name: accepted.get(name, accepted.get('*', 0.0)))
+    return best if accepted.get(best, accepted.get('*', 0.0)) > 0 else None
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+def compressible(response):
+    """
+    Whether a response may be compressed, judged from its status and headers only
+    """
+    return (
+        response.status_code == 200
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+        and 'Content-Encoding' not in response.headers
+        and not getattr(response, 'direct_passthrough', False)
+    )
+
+def encode_response(response, data, accept_encoding):
+    """
+    Compress a response body for the client's Accept-Encoding
+
+    Updates the response headers and returns the encoded body, or None when
+    the body should be sent unchanged.
+    """
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None or len(data) < MIN_COMPRESS_SIZE:
+        return None
+
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ from the identity ones, so the validator becomes weak
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        response.headers['ETag'] = f'W/{etag}'
+    return compress(data, encoding)
@@ -0,0 +1,281 @@
+"""
+Live report feed for the Mini App, delivered as Server-Sent Events
+
+One ReportBroadcaster per process polls for newly inserted reports (only when
+the reports generation changed) and fans them out to every connected client.
+Each client has a bounded queue: a client too slow to keep up is disconnected
+rather than buffered without limit, and resumes from the database using
+Last-Event-ID, which is the report ID.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+
+# Events a client may fall behind by before it is disconnected
+CLIENT_QUEUE_SIZE = 100
+
+# Most reports replayed on resume; further behind, the client is told to reload
+CATCH_UP_LIMIT = 100
+
+# Comment line sent when idle so proxies keep the connection open
+KEEPALIVE_INTERVAL = 15
+
+# Response headers for event streams; X-Accel-Buffering stops proxy buffering
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+def report_event(report):
+    """
+    Format a report dict as an SSE event whose ID is the report ID
+    """
+    data = json.dumps(report, separators=(',', ':'))
+    return f"id: {report['id']}\nevent: report\ndata: {data}\n\n"
+
+def reset_event():
+    """
+    Tell the client it fell too far behind and should reload the list
+    """
+    return "event: reset\ndata: {}\n\n"
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+class Subscription:
+    """
+    A connected client's bounded event queue
+    """
+
+    def __init__(self, max_size=CLIENT_QUEUE_SIZE):
+        self.max_size = max_size
+        self.dropped = False
+
+    def offer(self, event):
+        """Queue an event without blocking; returns False if the client is full"""
+        raise NotImplementedError
+
+class ThreadSubscription(Subscription):
+    """
+    Subscription consumed by a blocking (WSGI) response generator
+    """
+
+    def __init__(self, max_size=CLIENT_QUEUE_SIZE):
+        super().__init__(max_size)
+        self.queue = queue.Queue(maxsize=max_size)
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class AsyncSubscription(Subscription):
+    """
+    Subscription consumed by an async (ASGI) response generator on a given loop
+    """
+
+    def __init__(self, loop, max_size=CLIENT_QUEUE_SIZE):
+        super().__init__(max_size)
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        # Tracked here because asyncio.Queue.qsize is not safe to read from the poller thread
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def offer(self, event):
+        with self._lock:
+            if self.pending >= self.max_size:
+                return False
+            self.pending += 1
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        return True
+
+    async def get(self, timeout):
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        with self._lock:
+            self.pending -= 1
+        return event
+
+class ReportBroadcaster:
+    """
+    Polls for new reports once per process and fans them out to subscribers
+    """
+
+    def __init__(self, db, versions, report_to_dict, poll_interval=1.0):
+        self.db = db
+        self.versions = versions
+        self.report_to_dict = report_to_dict
+        self.poll_interval = poll_interval
+
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._generation = None
+        self.last_id = None
+        # Wall-clock time the poller last woke up, for readiness checks
+        self.last_wake = None
+
+    def _latest_id(self):
+        rows = self.db.get_reports_page(limit=1)
+        return rows[0][0] if rows else 0
+
+    def prime(self):
+        """Read the newest report ID to poll from, unless known already; queries the database"""
+        if self.last_id is None:
+            self.last_id = self._latest_id()
+
+    def subscribe(self, subscription):
+        self.prime()
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self.last_wake = time.time()
+                self._thread = threading.Thread(target=self._run, name='report-broadcaster', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    @property
+    def is_polling(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def notify(self):
+        """Wake the poller now, e.g. right after this process inserted a report"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            self.last_wake = time.time()
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Report stream poll error: {e}")
+
+    def poll(self):
+        """Publish reports inserted since the last poll"""
+        generation = self.versions.generation('reports')
+        if generation == self._generation:
+            return
+        self._generation = generation
+
+        rows = self.db.get_reports_page(limit=CATCH_UP_LIMIT, after_id=self.last_id)
+        if not rows:
+            return
+        self.last_id = rows[0][0]
+        if len(rows) == CATCH_UP_LIMIT:
+            # There may be more; look again on the next poll even if nothing else changes
+            self._generation = None
+
+        # Rows come newest first; deliver oldest first
+        events = [report_event(self.report_to_dict(row)) for row in reversed(rows)]
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for event in events:
+                if not subscription.offer(event):
+                    # Too slow: drop it, it will resume from Last-Event-ID
+                    subscription.dropped = True
+                    self.unsubscribe(subscription)
+                    break
+
+    def catch_up(self, last_event_id):
+        """
+        Events a resuming client missed, oldest first, and the last ID they cover
+        """
+        if last_event_id is None:
+            return [], self.last_id
+
+        rows = self.db.get_reports_page(limit=CATCH_UP_LIMIT + 1, after_id=last_event_id)
+        if len(rows) > CATCH_UP_LIMIT:
+            return [reset_event()], self.last_id
+        if not rows:
+            return [], last_event_id
+        return [report_event(self.report_to_dict(row)) for row in reversed(rows)], rows[0][0]
+
+def event_id(event):
+    if event.startswith('id: '):
+        return int(event[4:event.index('\n')])
+    return None
+
+def stream_events(broadcaster, last_event_id, max_duration):
+    """
+    Blocking SSE generator for WSGI servers
+    """
+    subscription = broadcaster.subscribe(ThreadSubscription())
+    try:
+        yield "retry: 3000\n\n"
+        events, last_sent = broadcaster.catch_up(last_event_id)
+        yield from events
+
+        deadline = time.monotonic() + max_duration
+        while not subscription.dropped and time.monotonic() < deadline:
+            event = subscription.get(timeout=min(KEEPALIVE_INTERVAL, max(0.0, deadline - time.monotonic())))
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            # Skip anything already replayed during catch-up
+            report_id = event_id(event)
+            if report_id is not None and report_id <= last_sent:
+                continue
+            last_sent = report_id or last_sent
+            yield event
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+async def async_stream_events(broadcaster, last_event_id, max_duration, run_db):
+    """
+    Async SSE generator for ASGI servers; run_db runs blocking calls in the executor
+    """
+    # So that subscribe() has no query left to run on the event loop
+    await run_db(broadcaster.prime)
+    subscription = broadcaster.subscribe(AsyncSubscription(asyncio.get_running_loop()))
+    try:
+        yield "retry: 3000\n\n"
+        events, last_sent = await run_db(broadcaster.catch_up, last_event_id)
+        for event in events:
+            yield event
+
+        deadline = time.monotonic() + max_duration
+        while not subscription.dropped and time.monotonic() < deadline:
+            event = await subscription.get(timeout=min(KEEPALIVE_INTERVAL, max(0.0, deadline - time.monotonic())))
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            report_id = event_id(event)
+            if report_id is not None and report_id <= last_sent:
+                continue
+            last_sent = report_id or last_sent
+            yield event
+    finally:
+        broadcaster.unsubscribe(subscription)